@@ -1,19 +1,28 @@
-from flask import Flask, render_template, request, jsonify, redirect, session, send_file
+from flask import Flask, render_template, request, jsonify, redirect, session, send_file, send_from_directory, g, Response
 import uuid
-import qrcode
-from io import BytesIO
-import base64
 import os
 import requests
 import cloudinary
-import cloudinary.uploader
-import zipfile
-from database import init_db, add_pet, get_pet, get_user_by_email, make_user_admin, get_all_pets, delete_pet, update_user_session_token, clear_user_session_token, toggle_user_active_status, get_db_connection, is_token_valid, add_vaccine, get_vaccines_by_pet, get_deworming_by_pet, delete_vaccine
+import re
+from database import add_user, add_pet, get_pet, get_user_by_email, make_user_admin, delete_pet, update_user_session_token, clear_user_session_token, toggle_user_active_status, get_db_connection, is_token_valid, add_vaccine, get_vaccines_by_pet, get_deworming_by_pet, delete_vaccine, begin_request_scope, end_request_scope, get_pool_stats, get_session_user, invalidate_user_cache, get_job, fail_stale_jobs, get_pet_with_history, get_pet_version, get_users_page, get_pets_page, estimate_count, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, PAGE_SIZE_CHOICES
+from qr_bulk import create_placeholder_pets, stream_tags_zip, BULK_MAX
+from qr_sheets import stream_tags_pdf, stream_tags_svg_zip, PAGE_SIZES
+from migrate import ensure_schema
+from jobs import submit_qr_job, job_status, artifact_info, JobLimitError, JOBS_MAX_QUANTITY, JOBS_STALE_SECONDS
+from qr_images import get_qr_image, MIMETYPES as QR_MIMETYPES
+from sightings import record_sighting, get_sightings_stats, find_nearby, NEARBY_MAX_RADIUS_KM, NEARBY_MAX_LIMIT
+from search import search_pets, SEARCH_MAX_PER_PAGE
+from uploads import enqueue_photo, start_upload_worker, get_upload_stats, PHOTO_LOCAL_DIR, PHOTO_LOCAL_URL
+from blobs import blob_key
+from export_data import stream_export, export_filename, EXPORT_FORMATS
+from page_cache import get_cached_page, store_page, invalidate_pet, page_cache_enabled, get_page_cache_stats
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
 import secrets
 import time
-from datetime import datetime
+import json
+from datetime import datetime, timezone
+from urllib.parse import urlencode
 
 # -------------------------------------------------
 # CONFIGURACIÓN DE ENTORNO
@@ -25,13 +34,34 @@ if IS_PRODUCTION:
         api_key=os.environ.get("CLOUDINARY_API_KEY"),
         api_secret=os.environ.get("CLOUDINARY_API_SECRET")
     )
+# Forma parte de los ETag: un despliegue nuevo (plantillas nuevas) invalida lo guardado en navegadores
+DEPLOY_VERSION = os.environ.get("RENDER_GIT_COMMIT", "")[:12] or str(int(time.time()))
+MEDIA_MAX_AGE = 365 * 24 * 3600  # fotos locales con nombre por contenido (ver blobs.py)
 
 # -------------------------------------------------
 # INICIALIZAR APP
 # -------------------------------------------------
 app = Flask(__name__)
-app.secret_key = os.environ.get("FLASK_SECRET_KEY", secrets.token_hex(16))
-init_db()
+
+# Claves de sesión: FLASK_SECRET_KEYS="nueva,anterior,...". Se firma con la
+# primera y se aceptan todas, así rotar la clave no cierra las sesiones
+# abiertas (se quita la anterior cuando ya expiraron). Todos los workers
+# deben ver la misma lista. FLASK_SECRET_KEY sigue valiendo para una sola.
+def load_secret_keys():
+    keys = [k.strip() for k in os.environ.get("FLASK_SECRET_KEYS", "").split(",") if k.strip()]
+    if not keys and os.environ.get("FLASK_SECRET_KEY"):
+        keys = [os.environ["FLASK_SECRET_KEY"]]
+    if not keys:
+        if IS_PRODUCTION:
+            print("⚠️ FLASK_SECRET_KEYS no está definida: las sesiones se perderán en cada reinicio")
+        # Con gunicorn (preload_app) se genera antes del fork y la comparten los workers
+        keys = [secrets.token_hex(32)]
+    return keys
+
+_secret_keys = load_secret_keys()
+app.secret_key = _secret_keys[0]
+app.config["SECRET_KEY_FALLBACKS"] = _secret_keys[1:]
+ensure_schema()
 
 # -------------------------------------------------
 # FUNCIONES AUXILIARES
@@ -44,6 +74,105 @@ def clear_user_session():
         print(f"Error al limpiar sesión: {e}")
     finally:
         session.clear()
+        g.pop("current_user", None)
+
+# Dirección pública canónica (Render define RENDER_EXTERNAL_URL). Con ella
+# los QR y enlaces no dependen del encabezado Host que mande el cliente.
+PUBLIC_BASE_URL = (os.environ.get("PUBLIC_BASE_URL") or os.environ.get("RENDER_EXTERNAL_URL") or "").rstrip("/")
+
+def public_url(path):
+    """URL absoluta de una ruta de la app (siempre https en producción)."""
+    if PUBLIC_BASE_URL:
+        return f"{PUBLIC_BASE_URL}/{path}"
+    if IS_PRODUCTION:
+        return f"https://{request.host}/{path}"
+    return f"{request.url_root}{path}"
+
+def parse_db_timestamp(value):
+    """Marca de tiempo de la base (datetime en PostgreSQL, texto en SQLite) como datetime UTC."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S")
+    return value.replace(tzinfo=timezone.utc)
+
+def get_current_user():
+    """Usuario de la sesión actual. Se consulta una sola vez por petición."""
+    if "current_user" not in g:
+        email = session.get("user_email")
+        g.current_user = get_session_user(email) if session.get("logged_in") and email else None
+    return g.current_user
+
+def validate_user_session():
+    """Comprueba que la sesión siga siendo válida. Devuelve una redirección si no lo es."""
+    user = get_current_user()
+    if not user:
+        clear_user_session()
+        return redirect("/login?message=invalid_session")
+    if (user.get("session_token") != session.get("session_token") or
+        not is_token_valid(user) or
+        not user.get("is_active", True)):
+        clear_user_session()
+        return redirect("/login?message=account_disabled")
+    return None
+
+def queue_photo(pet_id, folder):
+    """Encola la foto del formulario, si trae una. Se sube en segundo plano (ver uploads.py)."""
+    photo = request.files.get("photo")
+    if not photo or not photo.filename:
+        return False
+    try:
+        enqueue_photo(pet_id, photo, folder)
+        return True
+    except Exception as e:
+        print("📷 Error al guardar la foto para subirla:", str(e))
+        return False
+
+def page_args(prefix="", cast=str):
+    """Cursor y tamaño de página de la URL para get_users_page / get_pets_page.
+
+    Con `prefix` una misma página puede tener varios listados paginados por
+    separado (p. ej. users_after y pets_after en el panel de administración).
+    """
+    def cursor(name):
+        value = request.args.get(prefix + name, "").strip()
+        try:
+            return cast(value) if value else None
+        except ValueError:
+            return None
+    per_page = request.args.get("per_page", PAGE_SIZE_DEFAULT, type=int)
+    return {"after": cursor("after"), "before": cursor("before"),
+            "per_page": max(1, min(per_page, PAGE_SIZE_MAX))}
+
+def photo_variants(pet):
+    """Versiones de la foto de una mascota ({} si la foto es anterior a ellas o no tiene)."""
+    raw = pet.get("photo_variants") if pet else None
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw) if isinstance(raw, str) else raw
+    except ValueError:
+        return {}
+
+def photo_variant(pet, name):
+    """URL de la versión `name` (thumb, card, hero) o, si no existe, de la foto original."""
+    variant = photo_variants(pet).get(name)
+    return variant["url"] if variant else pet.get("photo_url")
+
+def photo_srcset(pet):
+    """Atributo srcset con las versiones no recortadas de la foto, de menor a mayor ancho."""
+    variants = [v for name, v in photo_variants(pet).items() if name != "thumb"]
+    return ", ".join(f"{v['url']} {v['width']}w" for v in sorted(variants, key=lambda v: v["width"]))
+
+def page_url(**changes):
+    """URL actual con algunos parámetros cambiados (None los quita). Para los enlaces de paginación."""
+    args = request.args.to_dict()
+    for name, value in changes.items():
+        if value is None:
+            args.pop(name, None)
+        else:
+            args[name] = value
+    return f"{request.path}?{urlencode(args)}" if args else request.path
 
 # -------------------------------------------------
 # DECORADORES
@@ -66,15 +195,9 @@ def login_required(f):
     def decorated_function(*args, **kwargs):
         if not session.get("logged_in"):
             return redirect("/login")
-        user = get_user_by_email(session["user_email"])
-        if not user:
-            clear_user_session()
-            return redirect("/login?message=invalid_session")
-        if (user.get("session_token") != session.get("session_token") or
-            not is_token_valid(user) or
-            not user.get("is_active", True)):
-            clear_user_session()
-            return redirect("/login?message=account_disabled")
+        invalid = validate_user_session()
+        if invalid:
+            return invalid
         return f(*args, **kwargs)
     return decorated_function
 
@@ -83,16 +206,10 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if not session.get("logged_in"):
             return redirect("/login")
-        user = get_user_by_email(session["user_email"])
-        if not user:
-            clear_user_session()
-            return redirect("/login?message=invalid_session")
-        if (user.get("session_token") != session.get("session_token") or
-            not is_token_valid(user) or
-            not user.get("is_active", True)):
-            clear_user_session()
-            return redirect("/login?message=account_disabled")
-        if not user.get("is_admin"):
+        invalid = validate_user_session()
+        if invalid:
+            return invalid
+        if not get_current_user().get("is_admin"):
             return "<h2>Acceso denegado</h2>", 403
         return f(*args, **kwargs)
     return decorated_function
@@ -101,15 +218,9 @@ def check_inactivity(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if session.get("logged_in"):
-            user = get_user_by_email(session["user_email"])
-            if not user:
-                clear_user_session()
-                return redirect("/login?message=invalid_session")
-            if (user.get("session_token") != session.get("session_token") or
-                not is_token_valid(user) or
-                not user.get("is_active", True)):
-                clear_user_session()
-                return redirect("/login?message=account_disabled")
+            invalid = validate_user_session()
+            if invalid:
+                return invalid
             last_activity = session.get("last_activity", 0)
             if time.time() - last_activity > 900:
                 clear_user_session()
@@ -118,9 +229,60 @@ def check_inactivity(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def public_pet_page(route):
+    """Página pública de una mascota con GET condicional y caché de HTML.
+
+    Antes de cargar o renderizar nada consulta solo la versión de la mascota:
+    si coincide con el If-None-Match del navegador responde 304. Si no, sirve
+    la página desde page_cache.py (o la renderiza) con ETag y Last-Modified.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(pet_id):
+            row = get_pet_version(pet_id)
+            if not row:
+                return f(pet_id)
+            etag = f"{route}-{row['version']}-{DEPLOY_VERSION}"
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                # Con parámetros en la URL la plantilla podría cambiar: no cachear
+                use_cache = page_cache_enabled() and not request.args
+                html, generation = get_cached_page(pet_id, route, row["version"]) if use_cache else (None, None)
+                if html is None:
+                    result = f(pet_id)
+                    # Las vistas devuelven una tupla en los errores: esos no se cachean ni llevan ETag
+                    if not isinstance(result, str):
+                        return result
+                    html = result
+                    if use_cache:
+                        store_page(pet_id, route, row["version"], html, generation)
+                response = Response(html, mimetype="text/html")
+            response.set_etag(etag)
+            response.last_modified = parse_db_timestamp(row["updated_at"])
+            # Guardar, pero revalidar siempre: la respuesta típica es un 304 sin cuerpo
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return decorated_function
+    return decorator
+
 # -------------------------------------------------
 # MIDDLEWARE
 # -------------------------------------------------
+@app.before_request
+def open_db_scope():
+    # Todas las consultas de la petición comparten una conexión del pool
+    begin_request_scope()
+
+@app.teardown_request
+def close_db_scope(exc):
+    end_request_scope()
+
+@app.before_request
+def ensure_upload_worker():
+    # El hilo de subidas arranca una vez por proceso y retoma lo que haya quedado pendiente
+    start_upload_worker()
+
 @app.before_request
 def force_https():
     if IS_PRODUCTION:
@@ -134,6 +296,14 @@ def add_security_headers(response):
     response.headers["Referrer-Policy"] = "no-referrer-when-downgrade"
     return response
 
+@app.context_processor
+def pagination_helpers():
+    return {"page_url": page_url, "page_size_choices": PAGE_SIZE_CHOICES}
+
+@app.context_processor
+def photo_helpers():
+    return {"photo_variant": photo_variant, "photo_srcset": photo_srcset}
+
 # -------------------------------------------------
 # RUTAS DE LOGIN
 # -------------------------------------------------
@@ -183,7 +353,7 @@ def logout():
 @login_required
 @check_inactivity
 def home():
-    user = get_user_by_email(session["user_email"])
+    user = get_current_user()
     is_admin = user.get("is_admin", False) if user else False
     return render_template("dashboard.html", user_email=session["user_email"], is_admin=is_admin, year=datetime.now().year)
 
@@ -202,26 +372,12 @@ def register():
         address = request.form.get("address", "").strip()
         if not name or not owner_name:
             return render_template("register.html", error="El nombre de la mascota y del dueño son obligatorios.")
-        photo_url = None
-        if "photo" in request.files:
-            photo = request.files["photo"]
-            if photo and photo.filename:
-                try:
-                    upload_result = cloudinary.uploader.upload(photo, folder="pet_rescue_qr", resource_type="image")
-                    photo_url = upload_result.get("secure_url")
-                except Exception as e:
-                    print("📷 Error al subir foto:", str(e))
         pet_id = str(uuid.uuid4())[:8].upper()
-        add_pet(pet_id, name, breed, description, owner_name, owner_email, owner_phone, photo_url, city, address)
+        add_pet(pet_id, name, breed, description, owner_name, owner_email, owner_phone, None, city, address)
+        queue_photo(pet_id, "pet_rescue_qr")
         session['registration_success'] = f"¡Mascota '{name}' registrada! Usa el QR para ayudar a encontrarla."
-        if IS_PRODUCTION:
-            session['qr_url'] = f"https://{request.host}/pet/{pet_id}"
-        else:
-            session['qr_url'] = f"{request.url_root}pet/{pet_id}"
-        qr_img = qrcode.make(session['qr_url'])
-        buffered = BytesIO()
-        qr_img.save(buffered, format="PNG")
-        session['qr_base64'] = base64.b64encode(buffered.getvalue()).decode()
+        session['qr_url'] = public_url(f"pet/{pet_id}")
+        session['qr_pet_id'] = pet_id
         return redirect("/register/success")
     except Exception as e:
         print("❌ Error en /register:", repr(e))
@@ -232,11 +388,11 @@ def register():
 @check_inactivity
 def register_success():
     success = session.pop('registration_success', None)
-    qr = session.pop('qr_base64', None)
+    qr_pet_id = session.pop('qr_pet_id', None)
     qr_url = session.pop('qr_url', None)
     if not success:
         return redirect("/")
-    return render_template("register.html", success=success, qr=qr, qr_url=qr_url)
+    return render_template("register.html", success=success, qr_src=f"/qr/{qr_pet_id}.png", qr_url=qr_url)
 
 # -------------------------------------------------
 # RUTAS PÚBLICAS
@@ -256,15 +412,13 @@ def generate_qr():
     conn.commit()
     cur.close()
     conn.close()
-    if IS_PRODUCTION:
-        qr_url = f"https://{request.host}/activate/{pet_id}"
-    else:
-        qr_url = f"{request.url_root}activate/{pet_id}"
-    qr_img = qrcode.make(qr_url)
-    buffered = BytesIO()
-    qr_img.save(buffered, format="PNG")
-    qr_base64 = base64.b64encode(buffered.getvalue()).decode()
-    return render_template("generate_qr.html", qr=qr_base64, qr_url=qr_url, pet_id=pet_id)
+    qr_url = public_url(f"activate/{pet_id}")
+    return render_template("generate_qr.html", qr_src=f"/qr/{pet_id}.png?target=activate", qr_url=qr_url, pet_id=pet_id)
+
+BULK_OUTPUTS = ("zip", "pdf", "svg")
+
+def render_bulk_form(error=None):
+    return render_template("generate_qr_bulk.html", error=error, bulk_max=BULK_MAX, jobs_max=JOBS_MAX_QUANTITY)
 
 @app.route("/generate-qr-bulk", methods=["GET", "POST"])
 @login_required
@@ -273,59 +427,121 @@ def generate_qr_bulk():
     if request.method == "POST":
         try:
             quantity = int(request.form.get("quantity", 1))
-            if quantity < 1 or quantity > 50:
-                return render_template("generate_qr_bulk.html", error="Cantidad debe estar entre 1 y 50.")
-            zip_buffer = BytesIO()
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                qr_data = []
-                for i in range(quantity):
-                    pet_id = str(uuid.uuid4())[:8].upper()
-                    temp_email = "unregistered@petrescue.qr"
-                    conn = get_db_connection()
-                    cur = conn.cursor()
-                    if IS_PRODUCTION:
-                        cur.execute("INSERT INTO pets (id, name, owner_name, is_registered, owner_email) VALUES (%s, %s, %s, %s, %s)", (pet_id, "", "", False, temp_email))
-                    else:
-                        cur.execute("INSERT INTO pets (id, name, owner_name, is_registered, owner_email) VALUES (?, ?, ?, ?, ?)", (pet_id, "", "", False, temp_email))
-                    conn.commit()
-                    cur.close()
-                    conn.close()
-                    if IS_PRODUCTION:
-                        qr_url = f"https://{request.host}/activate/{pet_id}"
-                    else:
-                        qr_url = f"{request.url_root}activate/{pet_id}"
-                    qr_img = qrcode.make(qr_url)
-                    img_buffer = BytesIO()
-                    qr_img.save(img_buffer, format="PNG")
-                    img_buffer.seek(0)
-                    filename = f"QR_{pet_id}.png"
-                    zip_file.writestr(filename, img_buffer.getvalue())
-                    qr_data.append({"id": pet_id, "filename": filename})
-                ids_text = "\n".join([f"{item['id']} -> {item['filename']}" for item in qr_data])
-                zip_file.writestr("IDs_de_QR.txt", ids_text)
-            zip_buffer.seek(0)
-            return send_file(zip_buffer, mimetype='application/zip', as_attachment=True, download_name=f'QR_vacios_{quantity}_unidades.zip')
+            if quantity < 1 or quantity > JOBS_MAX_QUANTITY:
+                return render_bulk_form(f"Cantidad debe estar entre 1 y {JOBS_MAX_QUANTITY}.")
+            output = request.form.get("output", "zip")
+            page_size = request.form.get("page_size", "A4").upper()
+            columns = int(request.form.get("columns", 4))
+            rows = int(request.form.get("rows", 5))
+            if output not in BULK_OUTPUTS or page_size not in PAGE_SIZES or not (1 <= columns <= 10 and 1 <= rows <= 15):
+                return render_bulk_form("Opciones de salida inválidas.")
+            base_url = public_url("activate/")
+            # Las tiradas grandes no caben en el tiempo de una petición: van a un trabajo en segundo plano
+            if request.form.get("background") or quantity > BULK_MAX:
+                try:
+                    job_id = submit_qr_job(session["user_email"], quantity, output, base_url, page_size, columns, rows)
+                except JobLimitError as e:
+                    return render_bulk_form(str(e))
+                return redirect(f"/jobs/{job_id}")
+            pet_ids = create_placeholder_pets(quantity)
+            # La salida se transmite a medida que se dibujan los QR
+            if output == "pdf":
+                body = stream_tags_pdf(pet_ids, base_url, page_size, columns, rows)
+                mimetype, filename = 'application/pdf', f'QR_vacios_{quantity}_unidades.pdf'
+            elif output == "svg":
+                body = stream_tags_svg_zip(pet_ids, base_url, page_size, columns, rows)
+                mimetype, filename = 'application/zip', f'QR_vacios_{quantity}_unidades_hojas_svg.zip'
+            else:
+                body = stream_tags_zip(pet_ids, base_url)
+                mimetype, filename = 'application/zip', f'QR_vacios_{quantity}_unidades.zip'
+            return Response(body, mimetype=mimetype, headers={"Content-Disposition": f"attachment; filename={filename}"})
         except ValueError:
-            return render_template("generate_qr_bulk.html", error="Cantidad inválida.")
+            return render_bulk_form("Cantidad inválida.")
         except Exception as e:
             print(f"❌ Error en generación masiva: {repr(e)}")
-            return render_template("generate_qr_bulk.html", error="Error al generar QRs.")
-    return render_template("generate_qr_bulk.html")
+            return render_bulk_form("Error al generar QRs.")
+    return render_bulk_form()
+
+# -------------------------------------------------
+# TRABAJOS EN SEGUNDO PLANO
+# -------------------------------------------------
+def get_own_job(job_id):
+    """Obtiene un trabajo si pertenece al usuario actual (o si es administrador)."""
+    job = get_job(job_id)
+    if not job:
+        return None
+    user = get_current_user()
+    if job["owner_email"] != session["user_email"] and not user.get("is_admin"):
+        return None
+    return job
+
+@app.route("/jobs/<job_id>")
+@login_required
+@check_inactivity
+def view_job(job_id):
+    job = get_own_job(job_id)
+    if not job:
+        return "<h2>❌ Trabajo no encontrado.</h2>", 404
+    return render_template("job_status.html", job=job)
+
+@app.route("/jobs/<job_id>/status")
+@login_required
+def view_job_status(job_id):
+    # Sin check_inactivity: el sondeo automático no debe mantener viva la sesión
+    job = get_own_job(job_id)
+    if not job:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    if job["status"] in ("queued", "running"):
+        fail_stale_jobs(JOBS_STALE_SECONDS)
+        job = get_job(job_id)
+    return jsonify(job_status(job))
+
+@app.route("/jobs/<job_id>/download")
+@login_required
+@check_inactivity
+def download_job(job_id):
+    job = get_own_job(job_id)
+    if not job:
+        return "<h2>❌ Trabajo no encontrado.</h2>", 404
+    if job["status"] != "done" or not job["artifact_path"] or not os.path.exists(job["artifact_path"]):
+        return "<h2>❌ El archivo no está disponible.</h2>", 404
+    mimetype, filename = artifact_info(job)
+    return send_file(job["artifact_path"], mimetype=mimetype, as_attachment=True, download_name=filename)
 
 @app.route("/qr/<pet_id>")
+@public_pet_page("qr")
 def qr_only(pet_id):
     pet = get_pet(pet_id)
     if not pet:
         return "<h2>❌ Mascota no encontrada.</h2>", 404
-    if IS_PRODUCTION:
-        qr_url = f"https://{request.host}/pet/{pet_id}"
-    else:
-        qr_url = f"{request.url_root}pet/{pet_id}"
-    qr_img = qrcode.make(qr_url)
-    buffered = BytesIO()
-    qr_img.save(buffered, format="PNG")
-    qr_base64 = base64.b64encode(buffered.getvalue()).decode()
-    return render_template("qr_only.html", pet=pet, qr=qr_base64, qr_url=qr_url)
+    qr_url = public_url(f"pet/{pet_id}")
+    return render_template("qr_only.html", pet=pet, qr_src=f"/qr/{pet_id}.png", qr_url=qr_url)
+
+QR_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+QR_TARGETS = ("pet", "activate")
+
+@app.route("/qr/<pet_id>.<any(png, svg):fmt>")
+def qr_image(pet_id, fmt):
+    """Imagen QR de una mascota. El contenido es determinista, así que se cachea."""
+    if not QR_ID_PATTERN.match(pet_id):
+        return "ID inválido", 404
+    target = request.args.get("target", "pet")
+    if target not in QR_TARGETS:
+        return "Destino inválido", 400
+    try:
+        box_size = min(max(int(request.args.get("size", 10)), 1), 40)
+        border = min(max(int(request.args.get("border", 4)), 0), 10)
+    except ValueError:
+        return "Parámetros inválidos", 400
+    # Solo mascotas que existen (también las etiquetas vacías): así nadie llena
+    # la caché en disco pidiendo IDs inventados
+    if not get_pet_version(pet_id):
+        return "Mascota no encontrada", 404
+    image, etag = get_qr_image(public_url(f"{target}/{pet_id}"), fmt, box_size, border)
+    response = Response(image, mimetype=QR_MIMETYPES[fmt])
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "public, max-age=86400"
+    return response.make_conditional(request)
 
 @app.route("/activate/<pet_id>", methods=["GET", "POST"])
 def activate_pet(pet_id):
@@ -350,30 +566,23 @@ def activate_pet(pet_id):
             password = request.form.get("password", "")
             if not name or not owner_name or not password:
                 return render_template("activate_form.html", pet_id=pet_id, error="Nombre, dueño y contraseña son obligatorios.")
-            photo_url = None
-            if "photo" in request.files:
-                photo = request.files["photo"]
-                if photo and photo.filename:
-                    try:
-                        upload_result = cloudinary.uploader.upload(photo, folder="pet_rescue_qr/activated", resource_type="image")
-                        photo_url = upload_result.get("secure_url")
-                    except Exception as e:
-                        print("📷 Error al subir foto en activación:", str(e))
             conn = get_db_connection()
             cur = conn.cursor()
             if IS_PRODUCTION:
                 cur.execute("""
                     UPDATE pets SET name=%s, breed=%s, description=%s, owner_name=%s, owner_email=%s, owner_phone=%s,
-                    city=%s, address=%s, photo_url=%s, is_registered=TRUE, registration_password=%s WHERE id=%s
-                """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, photo_url, password, pet_id))
+                    city=%s, address=%s, is_registered=TRUE, registration_password=%s WHERE id=%s
+                """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, password, pet_id))
             else:
                 cur.execute("""
                     UPDATE pets SET name=?, breed=?, description=?, owner_name=?, owner_email=?, owner_phone=?,
-                    city=?, address=?, photo_url=?, is_registered=TRUE, registration_password=? WHERE id=?
-                """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, photo_url, password, pet_id))
+                    city=?, address=?, is_registered=TRUE, registration_password=? WHERE id=?
+                """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, password, pet_id))
             conn.commit()
             cur.close()
             conn.close()
+            invalidate_pet(pet_id)
+            queue_photo(pet_id, "pet_rescue_qr/activated")
             if IS_PRODUCTION:
                 return redirect(f"https://{request.host}/pet/{pet_id}")
             else:
@@ -404,15 +613,6 @@ def edit_pet_form(pet_id):
     if not pet:
         return "<h2>❌ Mascota no encontrada.</h2>", 404
     if request.method == "POST":
-        photo_url = pet.get("photo_url")
-        if "photo" in request.files:
-            photo = request.files["photo"]
-            if photo and photo.filename:
-                try:
-                    upload_result = cloudinary.uploader.upload(photo, folder="pet_rescue_qr/edited", resource_type="image")
-                    photo_url = upload_result.get("secure_url")
-                except Exception as e:
-                    print("📷 Error al subir foto en edición:", str(e))
         name = request.form.get("name", pet["name"]).strip()
         breed = request.form.get("breed", pet["breed"] or "").strip()
         description = request.form.get("description", pet["description"] or "").strip()
@@ -428,19 +628,21 @@ def edit_pet_form(pet_id):
         if IS_PRODUCTION:
             cur.execute("""
                 UPDATE pets SET name=%s, breed=%s, description=%s, owner_name=%s, owner_email=%s, owner_phone=%s,
-                city=%s, address=%s, photo_url=%s WHERE id=%s
-            """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, photo_url, pet_id))
+                city=%s, address=%s WHERE id=%s
+            """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, pet_id))
         else:
             cur.execute("""
                 UPDATE pets SET name=?, breed=?, description=?, owner_name=?, owner_email=?, owner_phone=?,
-                city=?, address=?, photo_url=? WHERE id=?
-            """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, photo_url, pet_id))
+                city=?, address=? WHERE id=?
+            """, (name, breed, description, owner_name, owner_email, owner_phone, city, address, pet_id))
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_pet(pet_id)
+        photo_note = " La foto nueva aparecerá en unos segundos." if queue_photo(pet_id, "pet_rescue_qr/edited") else ""
         return f"""
         <script>
-        alert('✅ Información actualizada exitosamente.');
+        alert('✅ Información actualizada exitosamente.{photo_note}');
         window.location.href='/pet/{pet_id}';
         </script>
         """
@@ -456,15 +658,6 @@ def edit_my_pet(pet_id):
     if pet["owner_email"] != session["user_email"]:
         return "<h2>❌ No tienes permiso para editar esta mascota.</h2>", 403
     if request.method == "POST":
-        photo_url = pet.get("photo_url")
-        if "photo" in request.files:
-            photo = request.files["photo"]
-            if photo and photo.filename:
-                try:
-                    upload_result = cloudinary.uploader.upload(photo, folder="pet_rescue_qr/edited", resource_type="image")
-                    photo_url = upload_result.get("secure_url")
-                except Exception as e:
-                    print("📷 Error al subir foto en edición:", str(e))
         name = request.form.get("name", pet["name"]).strip()
         breed = request.form.get("breed", pet["breed"] or "").strip()
         description = request.form.get("description", pet["description"] or "").strip()
@@ -479,19 +672,21 @@ def edit_my_pet(pet_id):
         if IS_PRODUCTION:
             cur.execute("""
                 UPDATE pets SET name=%s, breed=%s, description=%s, owner_name=%s, owner_phone=%s,
-                city=%s, address=%s, photo_url=%s WHERE id=%s
-            """, (name, breed, description, owner_name, owner_phone, city, address, photo_url, pet_id))
+                city=%s, address=%s WHERE id=%s
+            """, (name, breed, description, owner_name, owner_phone, city, address, pet_id))
         else:
             cur.execute("""
                 UPDATE pets SET name=?, breed=?, description=?, owner_name=?, owner_phone=?,
-                city=?, address=?, photo_url=? WHERE id=?
-            """, (name, breed, description, owner_name, owner_phone, city, address, photo_url, pet_id))
+                city=?, address=? WHERE id=?
+            """, (name, breed, description, owner_name, owner_phone, city, address, pet_id))
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_pet(pet_id)
+        photo_note = " La foto nueva aparecerá en unos segundos." if queue_photo(pet_id, "pet_rescue_qr/edited") else ""
         return f"""
         <script>
-        alert('✅ Información actualizada exitosamente.');
+        alert('✅ Información actualizada exitosamente.{photo_note}');
         window.location.href='/my-pets';
         </script>
         """
@@ -507,42 +702,18 @@ def show_register_form():
 @login_required
 @check_inactivity
 def my_pets():
-    pets = get_all_pets(owner_email=session["user_email"])
-    return render_template("my_pets.html", pets=pets)
+    page = get_pets_page(owner_email=session["user_email"], **page_args())
+    return render_template("my_pets.html", pets=page.items, page=page)
 
 @app.route("/pet/<pet_id>")
+@public_pet_page("pet")
 def pet_detail(pet_id):
-    pet = get_pet(pet_id)
-    if not pet:
+    record = get_pet_with_history(pet_id)
+    if not record:
         return "Mascota no encontrada", 404
-
-    # Cargar vacunas (tipo 'vaccine')
-    conn = get_db_connection()
-    cur = conn.cursor()
-    if IS_PRODUCTION:
-        cur.execute("SELECT * FROM vaccines WHERE pet_id = %s AND type = 'vaccine' ORDER BY date_administered DESC", (pet_id,))
-    else:
-        cur.execute("SELECT * FROM vaccines WHERE pet_id = ? AND type = 'vaccine' ORDER BY date_administered DESC", (pet_id,))
-    vaccines_records = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    # Cargar desparasitaciones (tipo 'deworming')
-    conn = get_db_connection()
-    cur = conn.cursor()
-    if IS_PRODUCTION:
-        cur.execute("SELECT * FROM vaccines WHERE pet_id = %s AND type = 'deworming' ORDER BY date_administered DESC", (pet_id,))
-    else:
-        cur.execute("SELECT * FROM vaccines WHERE pet_id = ? AND type = 'deworming' ORDER BY date_administered DESC", (pet_id,))
-    deworming_records = cur.fetchall()
-    cur.close()
-    conn.close()
-
-    # Asignar a pet (para que Jinja pueda acceder como pet.vaccines)
-    pet["vaccines"] = vaccines_records
-    pet["deworming"] = deworming_records
-
-    return render_template("pet.html", pet=pet)
+    # La ficha muestra solo los registros marcados como vacuna (los sin tipo, en /vaccines)
+    vaccines = [v for v in record.vaccines if v["type"] == "vaccine"]
+    return render_template("pet.html", pet=record.pet, vaccines=vaccines, deworming=record.deworming)
 
 @app.route("/report", methods=["POST"])
 def report_location():
@@ -555,9 +726,17 @@ def report_location():
         lng = data.get("lng")
         if not pet_id or lat is None or lng is None:
             return jsonify({"error": "Faltan datos requeridos"}), 400
+        try:
+            lat, lng = float(lat), float(lng)
+        except (TypeError, ValueError):
+            return jsonify({"error": "Coordenadas inválidas"}), 400
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({"error": "Coordenadas inválidas"}), 400
         pet = get_pet(pet_id)
         if not pet:
             return jsonify({"error": "Mascota no encontrada"}), 400
+        # Se guarda en segundo plano, por lotes (ver sightings.py)
+        record_sighting(pet_id, lat, lng)
         owner_phone = pet.get("owner_phone")
         if not owner_phone:
             return jsonify({"error": "Dueño no tiene número de teléfono registrado"}), 400
@@ -572,6 +751,88 @@ def report_location():
         print("❌ Error en /report:", repr(e))
         return jsonify({"error": "Error interno"}), 500
 
+@app.route("/api/sightings/nearby")
+def nearby_sightings():
+    """Mascotas perdidas vistas cerca de un punto: ?lat=&lng=&radius_km=2&limit=50[&hours=&city=&all=1]"""
+    try:
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        radius_km = float(request.args.get("radius_km", 2))
+        limit = int(request.args.get("limit", 50))
+        hours = float(request.args["hours"]) if request.args.get("hours") else None
+    except (KeyError, ValueError):
+        return jsonify({"error": "Parámetros inválidos: lat y lng son obligatorios"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius_km <= 0 or limit < 1:
+        return jsonify({"error": "Parámetros fuera de rango"}), 400
+    radius_km = min(radius_km, NEARBY_MAX_RADIUS_KM)
+    limit = min(limit, NEARBY_MAX_LIMIT)
+    # Por defecto solo mascotas aún perdidas (found = FALSE), un avistamiento por mascota
+    show_all = request.args.get("all") == "1"
+    results, truncated = find_nearby(lat, lng, radius_km, limit, hours=hours, lost_only=not show_all,
+                                     city=request.args.get("city") or None, per_pet=not show_all)
+    return jsonify({
+        "lat": lat,
+        "lng": lng,
+        "radius_km": radius_km,
+        # Zona con demasiados avistamientos: puede faltar alguno cercano (acotar con hours o city)
+        "truncated": truncated,
+        "results": [{
+            "pet_id": row["pet_id"],
+            "name": row["name"],
+            "photo_url": row["photo_url"],
+            "city": row["city"],
+            "lat": row["lat"],
+            "lng": row["lng"],
+            "distance_m": round(distance * 1000),
+            "reported_at": parse_db_timestamp(row["reported_at"]).isoformat(),
+            "pet_url": f"/pet/{row['pet_id']}",
+        } for distance, row in results],
+    })
+
+@app.route("/api/pets/search")
+@login_required
+@check_inactivity
+def search_pets_api():
+    """Búsqueda de mascotas para administradores y voluntarios: ?q=&offset=0&per_page=20"""
+    query = request.args.get("q", "").strip()
+    try:
+        offset = int(request.args.get("offset", 0))
+        per_page = int(request.args.get("per_page", 20))
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+    if not query:
+        return jsonify({"error": "Falta el texto a buscar (q)"}), 400
+    page = search_pets(query, offset=offset, per_page=min(per_page, SEARCH_MAX_PER_PAGE))
+    return jsonify({
+        "query": query,
+        "offset": max(offset, 0),
+        "next_offset": page.next_cursor,
+        "prev_offset": page.prev_cursor,
+        "results": [{
+            "id": row["id"],
+            "name": row["name"],
+            "breed": row["breed"],
+            "city": row["city"],
+            "owner_name": row["owner_name"],
+            "owner_email": row["owner_email"],
+            "photo_url": row["photo_url"],
+            "is_registered": bool(row["is_registered"]),
+            "found": bool(row["found"]),
+            "score": round(float(row["score"]), 4),
+            "pet_url": f"/pet/{row['id']}",
+        } for row in page.items],
+    })
+
+@app.route(f"{PHOTO_LOCAL_URL}<path:filename>")
+def local_media(filename):
+    """Fotos guardadas con PHOTO_STORAGE=local (en producción las sirve Cloudinary)."""
+    if not blob_key(filename):
+        return send_from_directory(PHOTO_LOCAL_DIR, filename)
+    # El nombre es el hash del contenido: nunca cambia, el navegador no necesita revalidar
+    response = send_from_directory(PHOTO_LOCAL_DIR, filename, max_age=MEDIA_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
 @app.route("/thanks")
 def thanks():
     return render_template("thanks.html")
@@ -606,6 +867,7 @@ def admin_panel():
                 deleted = cur.rowcount > 0
                 cur.close()
                 conn.close()
+                invalidate_user_cache(email)
                 if deleted:
                     message = f"✅ Usuario {email} eliminado."
                 else:
@@ -623,48 +885,76 @@ def admin_panel():
             pet_id = request.form.get("pet_id", "").strip()
             if pet_id:
                 if delete_pet(pet_id):
+                    invalidate_pet(pet_id)
                     message = f"✅ Mascota {pet_id} eliminada."
                 else:
                     message = f"⚠️ Mascota {pet_id} no encontrada."
-    conn = get_db_connection()
-    cur = conn.cursor()
-    if IS_PRODUCTION:
-        cur.execute("SELECT email, is_admin, is_active FROM users ORDER BY created_at DESC")
-    else:
-        cur.execute("SELECT email, is_admin, is_active FROM users ORDER BY rowid DESC")
-    users = cur.fetchall()
-    cur.close()
-    conn.close()
-    pets = get_all_pets()
-    return render_template("admin.html", users=users, pets=pets, message=message)
+    users_page = get_users_page(**page_args("users_", cast=int))
+    pets_page = get_pets_page(**page_args("pets_"))
+    totals = {
+        "users": estimate_count("users"),
+        "pets": estimate_count("pets"),
+        "registered": estimate_count("pets", "is_registered", True),
+        "inactive": estimate_count("users", "is_active", False),
+    }
+    return render_template("admin.html", users=users_page.items, pets=pets_page.items,
+                           users_page=users_page, pets_page=pets_page, totals=totals, message=message)
+
+@app.route("/admin/db-pool")
+@admin_required
+@check_inactivity
+def admin_db_pool_stats():
+    return jsonify(get_pool_stats())
+
+@app.route("/admin/page-cache")
+@admin_required
+@check_inactivity
+def admin_page_cache_stats():
+    return jsonify(get_page_cache_stats())
+
+@app.route("/admin/sightings-buffer")
+@admin_required
+@check_inactivity
+def admin_sightings_buffer_stats():
+    return jsonify(get_sightings_stats())
+
+@app.route("/admin/photo-uploads")
+@admin_required
+@check_inactivity
+def admin_photo_upload_stats():
+    return jsonify(get_upload_stats())
+
+@app.route("/admin/export.<fmt>")
+@admin_required
+@check_inactivity
+def admin_export(fmt):
+    """Descarga de todas las mascotas con su historial; ?gzip=1 la comprime."""
+    if fmt not in EXPORT_FORMATS:
+        return "Formato no soportado", 404
+    compress = request.args.get("gzip") == "1"
+    # El generador abre su propia conexión al empezar a transmitir, después
+    # de que la petición devolvió la suya al pool
+    body = stream_export(fmt, compress=compress)
+    mimetype = "application/gzip" if compress else EXPORT_FORMATS[fmt]
+    filename = export_filename(fmt, compress)
+    return Response(body, mimetype=mimetype, headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 @app.route("/pet/<pet_id>/vaccines")
+@public_pet_page("vaccines")
 def view_vaccines(pet_id):
-    pet = get_pet(pet_id)
-    if not pet:
+    record = get_pet_with_history(pet_id)
+    if not record:
         return "<h2>❌ Mascota no encontrada.</h2>", 404
-    vaccines = get_vaccines_by_pet(pet_id)
-    return render_template("vaccines.html", pet=pet, vaccines=vaccines, is_owner=False)
+    return render_template("vaccines.html", pet=record.pet, vaccines=record.vaccines, is_owner=False)
 
 @app.route("/pet/<pet_id>/deworming")
+@public_pet_page("deworming")
 def view_deworming(pet_id):
     """Muestra el historial de desparasitaciones de una mascota (público)."""
-    pet = get_pet(pet_id)
-    if not pet:
+    record = get_pet_with_history(pet_id)
+    if not record:
         return "<h2>❌ Mascota no encontrada.</h2>", 404
-    
-    # Obtener solo desparasitaciones
-    conn = get_db_connection()
-    cur = conn.cursor()
-    if IS_PRODUCTION:
-        cur.execute("SELECT * FROM vaccines WHERE pet_id = %s AND type = 'deworming' ORDER BY date_administered DESC", (pet_id,))
-    else:
-        cur.execute("SELECT * FROM vaccines WHERE pet_id = ? AND type = 'deworming' ORDER BY date_administered DESC", (pet_id,))
-    deworming_records = cur.fetchall()
-    cur.close()
-    conn.close()
-    
-    return render_template("deworming_public.html", pet=pet, deworming=deworming_records)
+    return render_template("deworming_public.html", pet=record.pet, deworming=record.deworming)
 
 @app.route("/my-pet/<pet_id>/vaccines")
 @login_required
@@ -692,6 +982,7 @@ def add_vaccine_record(pet_id):
         if not vaccine_name or not date_administered:
             return render_template("add_vaccine.html", pet=pet, error="Nombre de vacuna y fecha son obligatorios.")
         add_vaccine(pet_id, vaccine_name, date_administered, next_due_date, veterinarian, notes)
+        invalidate_pet(pet_id)
         return redirect(f"/my-pet/{pet_id}/vaccines")
     return render_template("add_vaccine.html", pet=pet)
 
@@ -715,6 +1006,7 @@ def delete_vaccine_record(vaccine_id):
     if not pet or pet["owner_email"] != session["user_email"]:
         return jsonify({"error": "No tienes permiso"}), 403
     if delete_vaccine(vaccine_id):
+        invalidate_pet(pet_id)
         return jsonify({"success": True})
     else:
         return jsonify({"error": "No se pudo eliminar"}), 400
@@ -755,6 +1047,7 @@ def delete_deworming_record_qr(deworming_id):
         return jsonify({"error": "No tienes permiso"}), 403
     
     if delete_vaccine(deworming_id):  # Reutilizamos la misma función de eliminación
+        invalidate_pet(pet_id)
         return jsonify({"success": True})
     else:
         return jsonify({"error": "No se pudo eliminar"}), 400
@@ -798,6 +1091,7 @@ def add_vaccine_password(pet_id):
         if not vaccine_name or not date_administered:
             return render_template("add_vaccine_simple.html", pet=pet, error="Nombre de vacuna y fecha son obligatorios.")
         add_vaccine(pet_id, vaccine_name, date_administered, next_due_date, veterinarian, notes)
+        invalidate_pet(pet_id)
         return redirect(f"/pet/{pet_id}/vaccines/edit")
     return render_template("add_vaccine_simple.html", pet=pet)
 
@@ -818,6 +1112,7 @@ def delete_vaccine_simple(vaccine_id):
     if not session.get(f"vaccine_access_{pet_id}"):
         return jsonify({"error": "Acceso no autorizado"}), 403
     if delete_vaccine(vaccine_id):
+        invalidate_pet(pet_id)
         return jsonify({"success": True})
     else:
         return jsonify({"error": "No se pudo eliminar"}), 400
@@ -856,16 +1151,8 @@ def qr_login():
 @qr_login_required
 def my_pets_qr():
     email = session["qr_email"]
-    conn = get_db_connection()
-    cur = conn.cursor()
-    if IS_PRODUCTION:
-        cur.execute("SELECT * FROM pets WHERE owner_email = %s AND is_registered = TRUE", (email,))
-    else:
-        cur.execute("SELECT * FROM pets WHERE owner_email = ? AND is_registered = TRUE", (email,))
-    pets = cur.fetchall()
-    cur.close()
-    conn.close()
-    return render_template("my_pets_qr.html", pets=pets, user_email=email)
+    page = get_pets_page(owner_email=email, registered_only=True, **page_args())
+    return render_template("my_pets_qr.html", pets=page.items, page=page, user_email=email)
 
 @app.route("/qr-logout")
 def qr_logout():
@@ -888,15 +1175,6 @@ def edit_my_pet_qr(pet_id):
     if not pet:
         return "<h2>❌ No tienes permiso para editar esta mascota.</h2>", 403
     if request.method == "POST":
-        photo_url = pet.get("photo_url")
-        if "photo" in request.files:
-            photo = request.files["photo"]
-            if photo and photo.filename:
-                try:
-                    upload_result = cloudinary.uploader.upload(photo, folder="pet_rescue_qr/edited", resource_type="image")
-                    photo_url = upload_result.get("secure_url")
-                except Exception as e:
-                    print("📷 Error al subir foto en edición:", str(e))
         name = request.form.get("name", pet["name"]).strip()
         breed = request.form.get("breed", pet["breed"] or "").strip()
         description = request.form.get("description", pet["description"] or "").strip()
@@ -911,19 +1189,21 @@ def edit_my_pet_qr(pet_id):
         if IS_PRODUCTION:
             cur.execute("""
                 UPDATE pets SET name=%s, breed=%s, description=%s, owner_name=%s, owner_phone=%s,
-                city=%s, address=%s, photo_url=%s WHERE id=%s
-            """, (name, breed, description, owner_name, owner_phone, city, address, photo_url, pet_id))
+                city=%s, address=%s WHERE id=%s
+            """, (name, breed, description, owner_name, owner_phone, city, address, pet_id))
         else:
             cur.execute("""
                 UPDATE pets SET name=?, breed=?, description=?, owner_name=?, owner_phone=?,
-                city=?, address=?, photo_url=? WHERE id=?
-            """, (name, breed, description, owner_name, owner_phone, city, address, photo_url, pet_id))
+                city=?, address=? WHERE id=?
+            """, (name, breed, description, owner_name, owner_phone, city, address, pet_id))
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_pet(pet_id)
+        photo_note = " La foto nueva aparecerá en unos segundos." if queue_photo(pet_id, "pet_rescue_qr/edited") else ""
         return f"""
         <script>
-        alert('✅ Información actualizada exitosamente.');
+        alert('✅ Información actualizada exitosamente.{photo_note}');
         window.location.href='/my-pets-qr';
         </script>
         """
@@ -979,6 +1259,7 @@ def add_vaccine_record_qr(pet_id):
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_pet(pet_id)
         return redirect(f"/my-pet-qr/{pet_id}/vaccines")
     return render_template("add_vaccine.html", pet=pet)
 
@@ -1017,6 +1298,7 @@ def delete_vaccine_qr(vaccine_id):  # ← Nombre único
         return jsonify({"error": "No tienes permiso"}), 403
     
     if delete_vaccine(vaccine_id):
+        invalidate_pet(pet_id)
         return jsonify({"success": True})
     else:
         return jsonify({"error": "No se pudo eliminar"}), 400
@@ -1062,6 +1344,7 @@ def add_deworming_record_qr(pet_id):
         conn.commit()
         cur.close()
         conn.close()
+        invalidate_pet(pet_id)
         return redirect(f"/my-pet-qr/{pet_id}/deworming")
 
     return render_template("add_deworming.html", pet=pet)
@@ -1086,6 +1369,7 @@ def view_my_deworming_qr(pet_id):
 # -------------------------------------------------
 # SERVIDOR
 # -------------------------------------------------
+# Solo para desarrollo. En producción: gunicorn app:app (ver gunicorn.conf.py)
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
     app.run(host="0.0.0.0", port=port, debug=not IS_PRODUCTION)
\ No newline at end of file
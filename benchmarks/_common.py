@@ -0,0 +1,92 @@
+"""
+Utilidades compartidas por los scripts de benchmarks/: base de datos
+temporal, carga de mascotas sintéticas y resumen de resultados.
+
+Los scripts se ejecutan como `python benchmarks/<script>.py`, así que este
+módulo se importa como `_common` y agrega la raíz del repositorio al path.
+"""
+
+import os
+import sys
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+OWNER_EMAIL = "bench-owner@petrescue.qr"
+NAMES = ["Firulais", "Luna", "Max", "Rocky", "Lola", "Toby", "Canela", "Simón", "Nala", "Coco"]
+BREEDS = ["Labrador", "Criollo", "Pastor Alemán", "Poodle", "Bulldog Francés", "Siamés", "Beagle"]
+CITIES = ["Bogotá", "Medellín", "Cali", "Barranquilla", "Bucaramanga", "Cartagena"]
+VACCINES = ["Rabia", "Parvovirus", "Moquillo", "Leptospirosis", "Triple felina"]
+BATCH = 20000
+
+
+def temp_database(prefix):
+    """Pasa a un directorio temporal nuevo y, con SQLite, crea ahí una base migrada.
+
+    database.py abre pets.db en el directorio actual, así que cada corrida
+    usa una base desechable. Con RENDER definida (PostgreSQL) no toca la
+    base. Devuelve el directorio.
+    """
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    os.chdir(workdir)
+    if os.environ.get("RENDER") is None:
+        from migrate import apply_migrations
+        apply_migrations()
+    return workdir
+
+
+def pet_id(i):
+    return f"BENCH{i:07d}"
+
+
+def insert_rows(cur, table, columns, rows):
+    """INSERT masivo que ignora filas ya existentes (p. ej. de una corrida anterior)."""
+    from database import IS_PRODUCTION
+    if IS_PRODUCTION:
+        from psycopg2.extras import execute_values
+        execute_values(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s ON CONFLICT DO NOTHING", rows)
+    else:
+        marks = ", ".join("?" for _ in columns)
+        cur.executemany(f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({marks})", rows)
+
+
+def seed_pets(start, end, owner_pets, history_per_pet, rng):
+    """Agrega las mascotas BENCH [start, end) con su historial; las primeras `owner_pets` son de OWNER_EMAIL."""
+    from database import get_db_connection, IS_PRODUCTION
+    true = True if IS_PRODUCTION else 1
+    conn = get_db_connection()
+    cur = conn.cursor()
+    for batch_start in range(start, end, BATCH):
+        pet_rows, history_rows = [], []
+        for i in range(batch_start, min(batch_start + BATCH, end)):
+            owner = OWNER_EMAIL if i < owner_pets else f"dueno{i % 5000}@correo.co"
+            pet_rows.append((pet_id(i), rng.choice(NAMES), rng.choice(BREEDS), "Collar rojo, muy juguetón",
+                             "Dueño de prueba", owner, "3001234567", rng.choice(CITIES), "Calle 1 # 2-3",
+                             true, not true))
+            for v in range(history_per_pet):
+                kind = "deworming" if v % 3 == 2 else "vaccine"
+                history_rows.append((pet_id(i), rng.choice(VACCINES), f"2025-{1 + v % 12:02d}-15",
+                                     f"2026-{1 + v % 12:02d}-15", "Dra. Pérez", "", kind))
+        insert_rows(cur, "pets", ("id", "name", "breed", "description", "owner_name", "owner_email", "owner_phone",
+                                  "city", "address", "is_registered", "found"), pet_rows)
+        if history_rows:
+            insert_rows(cur, "vaccines", ("pet_id", "vaccine_name", "date_administered", "next_due_date",
+                                          "veterinarian", "notes", "type"), history_rows)
+        conn.commit()
+    cur.close()
+    conn.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de las funciones de database.py, por motor y tamaño de tabla.
+
+Para cada tamaño (--sizes) completa la base con mascotas sintéticas y su
+historial, y llama cada función muchas veces fuera de cualquier petición
+HTTP (cada llamada toma y devuelve su conexión del pool, como en la app):
+
+    get_pet, get_all_pets(owner), get_all_pets(), get_user_by_email,
+    get_vaccines_by_pet, get_deworming_by_pet, add_pet, add_vaccine, delete_pet
+
+Informa el tiempo por llamada (media, p50, p95) y, en una segunda pasada
+con tracemalloc, la memoria asignada por llamada (pico y bloques vivos
+al terminar). get_all_pets() sin dueño trae la tabla entera: solo se
+mide hasta --full-scan-max filas.
+
+Guarda los resultados en JSON. Con --baseline compara contra una corrida
+anterior y con --max-regression termina con código 1 si alguna función
+empeora (p50 o memoria) más de ese porcentaje.
+
+--backend sqlite usa una base temporal. --backend postgres usa la base
+configurada en DB_HOST/DB_NAME/DB_USER/DB_PASS, que debe estar migrada y
+ser desechable. --backend both corre uno y otro en subprocesos (RENDER
+decide el motor al importar database.py) y junta los resultados.
+
+Uso:
+    python benchmarks/bench_database.py
+    python benchmarks/bench_database.py --sizes 1000,100000,1000000 --calls 500
+    python benchmarks/bench_database.py --baseline benchmarks/baselines/database_sqlite.json --max-regression 25
+    DB_HOST=localhost DB_NAME=bench DB_USER=... DB_PASS=... python benchmarks/bench_database.py --backend both
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime, timezone
+
+from _common import OWNER_EMAIL, temp_database, pet_id, insert_rows, seed_pets, git_commit
+
+
+def seed(start, end, owner_pets, history_per_pet, rng):
+    """Agrega las mascotas [start, end); las primeras `owner_pets` son del dueño de prueba."""
+    from database import get_db_connection
+    conn = get_db_connection()
+    cur = conn.cursor()
+    insert_rows(cur, "users", ("email", "password_hash"), [(OWNER_EMAIL, "bench")])
+    conn.commit()
+    cur.close()
+    conn.close()
+    seed_pets(start, end, owner_pets, history_per_pet, rng)
+
+
+def cases(size, args, rng):
+    """(nombre, función sin argumentos que hace una llamada) para cada caso medido."""
+    import database
+    new_ids = iter(f"BENCHNEW{size}_{n:06d}" for n in range(10 ** 6))
+    created = []
+
+    def add_pet():
+        new_id = next(new_ids)
+        database.add_pet(new_id, "Nueva", "Criollo", "", "Dueño", OWNER_EMAIL, "3001234567", None, "Cali", "")
+        created.append(new_id)
+
+    def delete_pet():
+        # Borra lo que creó add_pet (que se mide antes); si no hay, borra una inexistente
+        database.delete_pet(created.pop() if created else "BENCH-NO-EXISTE")
+
+    result = [
+        ("get_pet", lambda: database.get_pet(pet_id(rng.randrange(size)))),
+        ("get_all_pets(owner)", lambda: database.get_all_pets(owner_email=OWNER_EMAIL)),
+    ]
+    if size <= args.full_scan_max:
+        result.append(("get_all_pets()", lambda: database.get_all_pets()))
+    result += [
+        ("get_user_by_email", lambda: database.get_user_by_email(OWNER_EMAIL)),
+        ("get_vaccines_by_pet", lambda: database.get_vaccines_by_pet(pet_id(rng.randrange(size)))),
+        ("get_deworming_by_pet", lambda: database.get_deworming_by_pet(pet_id(rng.randrange(size)))),
+        ("add_pet", add_pet),
+        ("add_vaccine", lambda: database.add_vaccine(pet_id(rng.randrange(size)), "Rabia", "2026-01-15")),
+        ("delete_pet", delete_pet),
+    ]
+    return result
+
+
+def measure(name, call, calls, max_seconds):
+    """Tiempo por llamada y, aparte, memoria por llamada con tracemalloc (que hace todo más lento)."""
+    call()  # calentar: conexión del pool, sentencias, cachés de SQLite
+    timings = []
+    budget = time.perf_counter() + max_seconds
+    while len(timings) < calls and time.perf_counter() < budget:
+        started = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - started)
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(max(1, min(len(timings), 50))):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            call()
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    count = len(timings)
+    return {
+        "function": name,
+        "calls": count,
+        "mean_us": round(sum(timings) / count * 1e6, 1),
+        "p50_us": round(timings[count // 2] * 1e6, 1),
+        "p95_us": round(timings[min(count - 1, int(count * 0.95))] * 1e6, 1),
+        "peak_kib": round(sorted(peaks)[len(peaks) // 2] / 1024, 1),
+        "retained_kib": round(sorted(retained)[len(retained) // 2] / 1024, 1),
+    }
+
+
+def run_backend(args):
+    from database import IS_PRODUCTION
+    backend = "postgres" if IS_PRODUCTION else "sqlite"
+    temp_database("bench_database_")
+
+    rng = random.Random(args.seed)
+    results, seeded = [], 0
+    for size in sorted(args.sizes):
+        started = time.perf_counter()
+        seed(seeded, size, args.owner_pets, args.history_per_pet, rng)
+        seeded = size
+        print(f"\n[{backend}] {size:,} mascotas (carga {time.perf_counter() - started:.1f} s)")
+        print(f"{'Función':<24}{'llamadas':>9}{'media µs':>11}{'p50 µs':>10}{'p95 µs':>10}{'pico KiB':>10}{'vivos KiB':>11}")
+        for name, call in cases(size, args, rng):
+            r = measure(name, call, args.calls, args.max_seconds)
+            r.update(backend=backend, size=size)
+            results.append(r)
+            print(f"{name:<24}{r['calls']:>9}{r['mean_us']:>11.1f}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}"
+                  f"{r['peak_kib']:>10.1f}{r['retained_kib']:>11.1f}")
+    return results
+
+
+def run_subprocess(backend, argv):
+    env = dict(os.environ)
+    if backend == "postgres":
+        env["RENDER"] = "1"
+    else:
+        env.pop("RENDER", None)
+    fd, output = tempfile.mkstemp(prefix=f"bench_database_{backend}_", suffix=".json")
+    os.close(fd)
+    subprocess.run([sys.executable, os.path.abspath(__file__), *argv, "--backend", backend, "--output", output],
+                   env=env, check=True)
+    with open(output) as f:
+        return json.load(f)["results"]
+
+
+def compare(results, baseline_path, max_regression):
+    """Imprime la variación contra la línea base. Devuelve las regresiones que superan el umbral."""
+    with open(baseline_path) as f:
+        baseline = {(r["backend"], r["size"], r["function"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nComparación con {baseline_path}")
+    print(f"{'Motor':<10}{'Filas':>10}  {'Función':<24}{'p50 µs':>10}{'Δ':>9}{'pico KiB':>10}{'Δ':>9}")
+    for r in results:
+        base = baseline.get((r["backend"], r["size"], r["function"]))
+        if not base:
+            continue
+        time_change = (r["p50_us"] / base["p50_us"] - 1) * 100 if base["p50_us"] else 0.0
+        # Menos de 1 KiB de diferencia es ruido del propio tracemalloc
+        memory_change = ((r["peak_kib"] / base["peak_kib"] - 1) * 100
+                         if base["peak_kib"] and abs(r["peak_kib"] - base["peak_kib"]) >= 1 else 0.0)
+        print(f"{r['backend']:<10}{r['size']:>10,}  {r['function']:<24}{r['p50_us']:>10.1f}{time_change:>+8.1f}%"
+              f"{r['peak_kib']:>10.1f}{memory_change:>+8.1f}%")
+        if max_regression is not None and (time_change > max_regression or memory_change > max_regression):
+            regressions.append(f"{r['backend']} {r['size']:,} {r['function']}: p50 {time_change:+.1f}%, "
+                               f"memoria {memory_change:+.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de las funciones de database.py.")
+    parser.add_argument("--backend", choices=["sqlite", "postgres", "both"], default="sqlite")
+    parser.add_argument("--sizes", default="1000,100000", help="Tamaños de la tabla pets, separados por comas")
+    parser.add_argument("--calls", type=int, default=300, help="Llamadas medidas por función")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="Tope de tiempo por función")
+    parser.add_argument("--owner-pets", type=int, default=60, help="Mascotas del dueño de get_all_pets(owner)")
+    parser.add_argument("--history-per-pet", type=int, default=4, help="Vacunas y desparasitaciones por mascota")
+    parser.add_argument("--full-scan-max", type=int, default=100000,
+                        help="Tamaño máximo en el que se mide get_all_pets() sin dueño")
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto bench_database_<fecha>.json)")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Porcentaje de empeoramiento (p50 o memoria) que hace fallar la corrida")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+
+    output = os.path.abspath(args.output or f"bench_database_{datetime.now():%Y%m%d_%H%M%S}.json")
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    if args.backend == "both":
+        argv = ["--sizes", ",".join(map(str, args.sizes)), "--calls", str(args.calls),
+                "--max-seconds", str(args.max_seconds), "--owner-pets", str(args.owner_pets),
+                "--history-per-pet", str(args.history_per_pet), "--full-scan-max", str(args.full_scan_max),
+                "--seed", str(args.seed)]
+        results = run_subprocess("sqlite", argv) + run_subprocess("postgres", argv)
+    else:
+        if (args.backend == "postgres") != bool(os.environ.get("RENDER")):
+            parser.error("--backend postgres requiere RENDER=1 y las variables DB_*; sqlite, que RENDER no esté definida")
+        results = run_backend(args)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "backend": args.backend,
+            "sizes": args.sizes,
+            "calls": args.calls,
+            "history_per_pet": args.history_per_pet,
+            "owner_pets": args.owner_pets,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"\nResultados guardados en {output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Regresiones por encima del {args.max_regression:.0f}%:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
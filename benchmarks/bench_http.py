@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga HTTP de las rutas más usadas, con la app corriendo en gunicorn.
+
+Carga una base con mascotas sintéticas y su historial de vacunas y
+desparasitaciones, levanta gunicorn con gunicorn.conf.py y golpea cada ruta
+con distintos niveles de concurrencia durante un tiempo fijo:
+
+    pet        GET  /pet/<id>            (ficha pública que abre el QR)
+    report     POST /report              (avistamiento con ubicación)
+    qr         GET  /qr/<id>
+    my-pets    GET  /my-pets             (dueño con sesión iniciada)
+    admin      GET  /admin               (administrador)
+    qr-bulk    POST /generate-qr-bulk    (ZIP de --bulk-quantity etiquetas)
+
+Informa peticiones por segundo y latencias p50/p95/p99, y guarda todo en un
+JSON. Con --baseline compara contra una corrida anterior (p. ej. la de
+benchmarks/baselines/) y con --max-regression termina con código 1 si alguna
+ruta empeora más de ese porcentaje.
+
+Por defecto usa una base SQLite temporal. Con --backend postgres usa la base
+configurada en DB_HOST/DB_NAME/DB_USER/DB_PASS, que debe estar migrada y ser
+desechable: se le agregan filas de prueba que no se borran.
+
+El cliente corre en Python en la misma máquina: a concurrencias altas
+también mide sus propios límites. Comparar corridas hechas en la misma
+máquina.
+
+Uso:
+    python benchmarks/bench_http.py
+    python benchmarks/bench_http.py --pets 100000 --concurrency 1,8,32 --duration 20
+    python benchmarks/bench_http.py --routes pet,qr --baseline benchmarks/baselines/http_sqlite_1k.json
+    RENDER=1 DB_HOST=localhost ... python benchmarks/bench_http.py --backend postgres --pets 1000000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+
+import requests
+
+from _common import ROOT, OWNER_EMAIL, temp_database, pet_id, insert_rows, seed_pets, percentile, git_commit
+
+ROUTES = ("pet", "report", "qr", "my-pets", "admin", "qr-bulk")
+ADMIN_EMAIL = "bench-admin@petrescue.qr"
+PASSWORD = "bench-password"
+
+
+# -------------------------------------------------
+# DATOS DE PRUEBA
+# -------------------------------------------------
+def seed(pets, owner_pets, vaccines_per_pet, rng):
+    """Cuentas de dueño y administrador, y mascotas BENCH* con historial."""
+    from database import get_db_connection, IS_PRODUCTION
+    from werkzeug.security import generate_password_hash
+    true = True if IS_PRODUCTION else 1
+    conn = get_db_connection()
+    cur = conn.cursor()
+    password_hash = generate_password_hash(PASSWORD)
+    insert_rows(cur, "users", ("email", "password_hash", "is_admin"),
+                [(OWNER_EMAIL, password_hash, not true), (ADMIN_EMAIL, password_hash, true)])
+    # Una sola sesión por cuenta: liberar la de una corrida anterior
+    ph = "%s" if IS_PRODUCTION else "?"
+    cur.execute(f"UPDATE users SET session_token = NULL WHERE email IN ({ph}, {ph})", (OWNER_EMAIL, ADMIN_EMAIL))
+    conn.commit()
+    cur.close()
+    conn.close()
+    seed_pets(0, pets, owner_pets, vaccines_per_pet, rng)
+
+
+# -------------------------------------------------
+# SERVIDOR
+# -------------------------------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, port, workers, threads, max_requests):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_MAX_REQUESTS=str(max_requests), PYTHONPATH=ROOT, FLASK_SECRET_KEYS="bench-http-secret")
+    log = open(os.path.join(workdir, "gunicorn.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+         "--chdir", workdir, "--access-logfile", "/dev/null", "app:app"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó al arrancar, ver {log.name}")
+        try:
+            requests.get(f"{base_url}/login", timeout=1)
+            return process, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn no respondió en 60 s")
+
+
+def login(base_url, email):
+    session = requests.Session()
+    response = session.post(f"{base_url}/login", data={"email": email, "password": PASSWORD}, allow_redirects=False)
+    if response.status_code != 302 or "session" not in session.cookies:
+        raise RuntimeError(f"No se pudo iniciar sesión como {email}")
+    return session.cookies.get_dict()
+
+
+# -------------------------------------------------
+# CARGA
+# -------------------------------------------------
+def make_request(route, http, base_url, rng, args, cookies):
+    if route == "pet":
+        return http.get(f"{base_url}/pet/{pet_id(rng.randrange(args.pets))}")
+    if route == "report":
+        return http.post(f"{base_url}/report", json={"pet_id": pet_id(rng.randrange(args.pets)),
+                                                     "lat": 4.6 + rng.random() * 0.2,
+                                                     "lng": -74.2 + rng.random() * 0.2})
+    if route == "qr":
+        return http.get(f"{base_url}/qr/{pet_id(rng.randrange(args.pets))}")
+    if route == "my-pets":
+        return http.get(f"{base_url}/my-pets", cookies=cookies["owner"], allow_redirects=False)
+    if route == "admin":
+        return http.get(f"{base_url}/admin", cookies=cookies["admin"], allow_redirects=False)
+    if route == "qr-bulk":
+        return http.post(f"{base_url}/generate-qr-bulk", data={"quantity": args.bulk_quantity, "output": "zip"},
+                         cookies=cookies["admin"], allow_redirects=False)
+    raise ValueError(route)
+
+
+def run_level(route, concurrency, base_url, args, cookies):
+    """Golpea `route` con `concurrency` clientes durante args.duration segundos."""
+    latencies = [[] for _ in range(concurrency)]
+    errors = [Counter() for _ in range(concurrency)]
+    measuring = threading.Event()
+    stop = threading.Event()
+
+    def client(n):
+        rng = random.Random(args.seed * 1000 + n)
+        http = requests.Session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                response = make_request(route, http, base_url, rng, args, cookies)
+                response.content  # leer el cuerpo completo
+                error = None if response.status_code == 200 else str(response.status_code)
+            except requests.RequestException as e:
+                error = type(e).__name__
+            elapsed = time.perf_counter() - started
+            if measuring.is_set() and not stop.is_set():
+                latencies[n].append(elapsed)
+                if error:
+                    errors[n][error] += 1
+        # Cerrar las conexiones keep-alive: gunicorn las espera al apagarse
+        http.close()
+
+    clients = [threading.Thread(target=client, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in clients:
+        t.start()
+    time.sleep(args.warmup)
+    measuring.set()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for t in clients:
+        t.join()
+
+    values = sorted(v for per_client in latencies for v in per_client)
+    count = len(values)
+    error_kinds = sum(errors, Counter())
+
+    def pct(fraction):
+        return round(percentile(values, fraction) * 1000, 2) if count else None
+
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": count,
+        "errors": sum(error_kinds.values()),
+        "error_kinds": dict(error_kinds),
+        "rps": round(count / elapsed, 1),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(values[-1] * 1000, 2) if count else None,
+    }
+
+
+# -------------------------------------------------
+# COMPARACIÓN
+# -------------------------------------------------
+def compare(results, baseline_path, max_regression):
+    """Imprime la variación contra la línea base. Devuelve las regresiones que superan el umbral."""
+    with open(baseline_path) as f:
+        baseline = {(r["route"], r["concurrency"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nComparación con {baseline_path}")
+    print(f"{'Ruta':<10}{'Conc.':>6}{'req/s':>10}{'Δ':>9}{'p95 ms':>10}{'Δ':>9}")
+    for r in results:
+        base = baseline.get((r["route"], r["concurrency"]))
+        if not base or not base["rps"] or not base["p95_ms"] or r["p95_ms"] is None:
+            print(f"{r['route']:<10}{r['concurrency']:>6}{r['rps']:>10.1f}{'—':>9}{r['p95_ms'] or 0:>10.2f}{'—':>9}")
+            continue
+        rps_change = (r["rps"] / base["rps"] - 1) * 100
+        p95_change = (r["p95_ms"] / base["p95_ms"] - 1) * 100
+        print(f"{r['route']:<10}{r['concurrency']:>6}{r['rps']:>10.1f}{rps_change:>+8.1f}%"
+              f"{r['p95_ms']:>10.2f}{p95_change:>+8.1f}%")
+        if max_regression is not None and (p95_change > max_regression or -rps_change > max_regression):
+            regressions.append(f"{r['route']} x{r['concurrency']}: req/s {rps_change:+.1f}%, p95 {p95_change:+.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP de las rutas principales.")
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--pets", type=int, default=1000, help="Mascotas sintéticas (p. ej. 1000, 100000, 1000000)")
+    parser.add_argument("--owner-pets", type=int, default=60, help="Mascotas del dueño que abre /my-pets")
+    parser.add_argument("--vaccines-per-pet", type=int, default=4, help="Registros de historial por mascota")
+    parser.add_argument("--routes", default=",".join(ROUTES), help=f"Separadas por comas: {','.join(ROUTES)}")
+    parser.add_argument("--concurrency", default="1,8,32", help="Niveles de concurrencia, separados por comas")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos medidos por ruta y nivel")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Segundos sin medir antes de cada nivel")
+    parser.add_argument("--workers", type=int, default=2, help="Workers de gunicorn")
+    parser.add_argument("--threads", type=int, default=4, help="Hilos por worker")
+    parser.add_argument("--max-requests", type=int, default=0,
+                        help="Reciclado de workers de gunicorn (0: sin reciclar, para no medir reinicios)")
+    parser.add_argument("--bulk-quantity", type=int, default=10, help="Etiquetas por petición a /generate-qr-bulk")
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto bench_http_<fecha>.json)")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="Porcentaje de empeoramiento (p95 o req/s) que hace fallar la corrida")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"Rutas desconocidas: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    if args.backend == "postgres" and not os.environ.get("RENDER"):
+        parser.error("--backend postgres requiere RENDER=1 y las variables DB_*")
+    if args.backend == "sqlite" and os.environ.get("RENDER"):
+        parser.error("RENDER está definida: usa --backend postgres")
+    output = os.path.abspath(args.output or f"bench_http_{datetime.now():%Y%m%d_%H%M%S}.json")
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # gunicorn corre en el mismo directorio, así que usa la misma base
+    workdir = temp_database("bench_http_")
+
+    started = time.perf_counter()
+    seed(args.pets, min(args.owner_pets, args.pets), args.vaccines_per_pet, random.Random(args.seed))
+    print(f"Carga de {args.pets:,} mascotas con {args.vaccines_per_pet} registros de historial cada una: "
+          f"{time.perf_counter() - started:.1f} s")
+
+    process, base_url = start_server(workdir, free_port(), args.workers, args.threads, args.max_requests)
+    results = []
+    try:
+        cookies = {"owner": login(base_url, OWNER_EMAIL), "admin": login(base_url, ADMIN_EMAIL)}
+        print(f"gunicorn: {args.workers} workers x {args.threads} hilos, {args.duration:.0f} s por nivel")
+        print(f"{'Ruta':<10}{'Conc.':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+        for route in routes:
+            for concurrency in levels:
+                r = run_level(route, concurrency, base_url, args, cookies)
+                results.append(r)
+                print(f"{route:<10}{concurrency:>6}{r['rps']:>10.1f}{r['p50_ms'] or 0:>10.2f}"
+                      f"{r['p95_ms'] or 0:>10.2f}{r['p99_ms'] or 0:>10.2f}{r['errors']:>9}")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=40)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "backend": args.backend,
+            "pets": args.pets,
+            "vaccines_per_pet": args.vaccines_per_pet,
+            "owner_pets": args.owner_pets,
+            "workers": args.workers,
+            "threads": args.threads,
+            "max_requests": args.max_requests,
+            "duration_s": args.duration,
+            "bulk_quantity": args.bulk_quantity,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"Resultados guardados en {output}")
+
+    failed = [r for r in results if r["errors"]]
+    for r in failed:
+        print(f"⚠️ {r['route']} x{r['concurrency']}: {r['errors']} respuestas con error {r['error_kinds']}")
+    if baseline:
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Regresiones por encima del {args.max_regression:.0f}%:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark de /api/sightings/nearby sobre un millón de avistamientos sintéticos.
+
+Compara la búsqueda con índice de celdas (sightings.find_nearby) contra
+recorrer toda la tabla calculando haversine en Python. Los puntos se
+concentran alrededor de varias ciudades, como los reportes reales. Usa
+una base SQLite temporal.
+
+Uso:
+    python benchmarks/bench_nearby.py
+    python benchmarks/bench_nearby.py --points 200000 --queries 500 --radius-km 5
+"""
+
+import sys
+import time
+import random
+import argparse
+import statistics
+
+from _common import temp_database, percentile
+
+# Bogotá, Medellín, Cali, Barranquilla, Bucaramanga
+CITIES = [(4.711, -74.072), (6.244, -75.581), (3.451, -76.532), (10.964, -74.796), (7.119, -73.122)]
+BATCH = 50000
+
+
+def random_point(rng):
+    if rng.random() < 0.8:
+        lat, lng = rng.choice(CITIES)
+        return lat + rng.gauss(0, 0.08), lng + rng.gauss(0, 0.08)
+    return rng.uniform(-4.0, 12.0), rng.uniform(-79.0, -67.0)
+
+
+def seed(points, pets, rng):
+    from database import get_db_connection, add_sightings
+    conn = get_db_connection()
+    cur = conn.cursor()
+    # Como en producción: mitad registradas desde el panel (is_registered = 0)
+    # y una de cada diez ya encontrada, que la búsqueda debe descartar
+    cur.executemany(
+        "INSERT INTO pets (id, name, owner_email, city, is_registered, found) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"P{i:06d}", f"Mascota {i}", "bench@petrescue.qr", "Bogotá", i % 2, int(i % 10 == 0))
+         for i in range(pets)]
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+    for start in range(0, points, BATCH):
+        rows = []
+        for _ in range(min(BATCH, points - start)):
+            lat, lng = random_point(rng)
+            rows.append((f"P{rng.randrange(pets):06d}", lat, lng, "2026-01-01 00:00:00"))
+        add_sightings(rows)
+
+
+def naive_nearby(lat, lng, radius_km, limit):
+    from database import get_db_connection
+    from geo import haversine_km
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT s.pet_id, s.lat, s.lng FROM sightings s
+        JOIN pets p ON p.id = s.pet_id
+        WHERE p.found = 0
+    """)
+    results = []
+    for row in cur:
+        distance = haversine_km(lat, lng, row["lat"], row["lng"])
+        if distance <= radius_km:
+            results.append((distance, row))
+    cur.close()
+    conn.close()
+    results.sort(key=lambda item: item[0])
+    return results[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la búsqueda de avistamientos cercanos.")
+    parser.add_argument("--points", type=int, default=1000000, help="Avistamientos sintéticos")
+    parser.add_argument("--pets", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=200, help="Consultas con índice")
+    parser.add_argument("--naive-queries", type=int, default=3, help="Consultas recorriendo toda la tabla")
+    parser.add_argument("--radius-km", type=float, default=2.0)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    temp_database("bench_nearby_")
+    from sightings import find_nearby
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    seed(args.points, args.pets, rng)
+    print(f"Carga de {args.points:,} avistamientos: {time.perf_counter() - started:.1f} s")
+
+    centers = [random_point(rng) for _ in range(args.queries)]
+    indexed, found = [], []
+    for lat, lng in centers:
+        started = time.perf_counter()
+        results, _ = find_nearby(lat, lng, args.radius_km, args.limit, lost_only=True, per_pet=False)
+        indexed.append((time.perf_counter() - started) * 1000)
+        found.append(len(results))
+
+    naive = []
+    for lat, lng in centers[:args.naive_queries]:
+        started = time.perf_counter()
+        expected = naive_nearby(lat, lng, args.radius_km, args.limit)
+        naive.append((time.perf_counter() - started) * 1000)
+        got, _ = find_nearby(lat, lng, args.radius_km, args.limit, lost_only=True, per_pet=False)
+        if [round(d, 9) for d, _ in expected] != [round(d, 9) for d, _ in got]:
+            print("❌ Los resultados con índice no coinciden con el recorrido completo")
+            sys.exit(1)
+
+    print(f"Radio {args.radius_km} km, límite {args.limit}, resultados por consulta: "
+          f"mediana {statistics.median(found):.0f}, máximo {max(found)}")
+    print(f"{'Método':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print(f"{'Índice de celdas':<22}{percentile(indexed, 0.5):>10.2f}{percentile(indexed, 0.95):>10.2f}"
+          f"{percentile(indexed, 0.99):>10.2f}")
+    print(f"{'Recorrido completo':<22}{percentile(naive, 0.5):>10.0f}{percentile(naive, 0.95):>10.0f}"
+          f"{percentile(naive, 0.99):>10.0f}")
+    print(f"Resultados idénticos en {len(naive)} consultas comparadas.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compara el rasterizador propio (qr_render) con qrcode.make() + PIL.
+
+1. Equivalencia: decodifica ambos PNG y verifica que los píxeles sean
+   idénticos byte a byte para cada combinación de tamaño, borde y nivel de
+   corrección de errores.
+2. Benchmark: mide el tiempo por etiqueta de ambos caminos, completo y
+   solo la etapa de rasterizado (la matriz de módulos es la misma en ambos).
+
+Uso:
+    python benchmarks/bench_qr_render.py
+    python benchmarks/bench_qr_render.py --tags 2000
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+from io import BytesIO
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import qrcode
+from PIL import Image
+from qr_render import ERROR_CORRECTION, make_png, render_png
+
+
+def sample_urls(count):
+    return [f"https://petrescue.example.org/activate/{str(uuid.uuid4())[:8].upper()}" for _ in range(count)]
+
+
+def pil_png(data, box_size=10, border=4, error_correction="M"):
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECTION[error_correction], box_size=box_size, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    buffered = BytesIO()
+    qr.make_image().save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def decoded(png_bytes):
+    img = Image.open(BytesIO(png_bytes))
+    img.load()
+    return img.size, img.convert("1").tobytes()
+
+
+def check_equivalence(urls):
+    failures = 0
+    combos = [(box, border, ec) for box in (1, 3, 10) for border in (0, 4) for ec in ERROR_CORRECTION]
+    for data in urls:
+        for box_size, border, ec in combos:
+            if decoded(make_png(data, box_size, border, ec)) != decoded(pil_png(data, box_size, border, ec)):
+                failures += 1
+                print(f"❌ Diferencia: {data} box={box_size} border={border} ec={ec}")
+    print(f"✅ Equivalencia: {len(urls) * len(combos) - failures}/{len(urls) * len(combos)} imágenes idénticas")
+    return failures == 0
+
+
+def pil_raster(qr):
+    buffered = BytesIO()
+    qr.make_image().save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def timed(fn, urls):
+    started = time.perf_counter()
+    total_bytes = 0
+    for data in urls:
+        total_bytes += len(fn(data))
+    return time.perf_counter() - started, total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Equivalencia y rendimiento del rasterizador de QR.")
+    parser.add_argument("--tags", type=int, default=500, help="Cantidad de etiquetas para el benchmark")
+    parser.add_argument("--check", type=int, default=20, help="Cantidad de URLs para la prueba de equivalencia")
+    args = parser.parse_args()
+
+    ok = check_equivalence(sample_urls(args.check))
+
+    urls = sample_urls(args.tags)
+    pil_seconds, pil_bytes = timed(pil_png, urls)
+    fast_seconds, fast_bytes = timed(make_png, urls)
+    print(f"qrcode.make + PIL: {pil_seconds / args.tags * 1000:.3f} ms/etiqueta, {pil_bytes / args.tags:.0f} B/etiqueta")
+    print(f"qr_render:         {fast_seconds / args.tags * 1000:.3f} ms/etiqueta, {fast_bytes / args.tags:.0f} B/etiqueta")
+    print(f"Aceleración total: x{pil_seconds / fast_seconds:.2f}")
+
+    # Solo rasterizado: se construyen las matrices una vez y se mide la escritura del PNG
+    qrs = []
+    for data in urls:
+        qr = qrcode.QRCode()
+        qr.add_data(data)
+        qr.make(fit=True)
+        qrs.append(qr)
+    matrices = [qr.get_matrix() for qr in qrs]
+    pil_raster_seconds, _ = timed(pil_raster, qrs)
+    fast_raster_seconds, _ = timed(render_png, matrices)
+    print(f"Rasterizado PIL:       {pil_raster_seconds / args.tags * 1000:.3f} ms/etiqueta")
+    print(f"Rasterizado qr_render: {fast_raster_seconds / args.tags * 1000:.3f} ms/etiqueta")
+    print(f"Aceleración del rasterizado: x{pil_raster_seconds / fast_raster_seconds:.2f}")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
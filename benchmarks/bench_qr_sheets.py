@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Compara las salidas de /generate-qr-bulk: ZIP de PNG, hojas PDF y hojas SVG.
+
+Reporta segundos y bytes por cada 1.000 etiquetas. No toca la base de
+datos: usa IDs sintéticos y los mismos generadores que la ruta.
+
+Uso:
+    python benchmarks/bench_qr_sheets.py
+    python benchmarks/bench_qr_sheets.py --tags 5000 --columns 5 --rows 6
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qr_bulk import stream_tags_zip
+from qr_sheets import stream_tags_pdf, stream_tags_svg_zip
+
+BASE_URL = "https://petrescue.example.org/activate/"
+
+
+def measure(stream):
+    started = time.perf_counter()
+    total_bytes = sum(len(chunk) for chunk in stream)
+    return time.perf_counter() - started, total_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las salidas de generación masiva de QR.")
+    parser.add_argument("--tags", type=int, default=1000, help="Cantidad de etiquetas")
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--page-size", default="A4")
+    args = parser.parse_args()
+
+    pet_ids = [f"{i:08X}" for i in range(args.tags)]
+    outputs = [
+        ("ZIP de PNG", lambda: stream_tags_zip(pet_ids, BASE_URL)),
+        ("Hojas PDF", lambda: stream_tags_pdf(pet_ids, BASE_URL, args.page_size, args.columns, args.rows)),
+        ("Hojas SVG (ZIP)", lambda: stream_tags_svg_zip(pet_ids, BASE_URL, args.page_size, args.columns, args.rows)),
+    ]
+
+    scale = 1000 / args.tags
+    baseline = None
+    print(f"{'Salida':<18}{'s/1000 etiquetas':>18}{'KB/1000 etiquetas':>20}{'vs ZIP (bytes)':>16}")
+    for name, make_stream in outputs:
+        seconds, total_bytes = measure(make_stream())
+        if baseline is None:
+            baseline = total_bytes
+        print(f"{name:<18}{seconds * scale:>18.2f}{total_bytes * scale / 1024:>20.1f}{total_bytes / baseline:>15.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la búsqueda de mascotas (search.search_pets) sobre un millón de filas.
+
+Carga mascotas sintéticas (el índice FTS5 se llena con los triggers de la
+migración 0008, como en producción), mide la latencia de búsquedas típicas
+del panel de administración y la compara con un LIKE sobre toda la tabla.
+Comprueba además que cada resultado contenga todas las palabras buscadas.
+Usa una base SQLite temporal.
+
+Uso:
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --pets 200000 --queries 500
+"""
+
+import sys
+import time
+import random
+import argparse
+
+from _common import temp_database, percentile
+
+NAMES = ["Firulais", "Luna", "Max", "Rocky", "Lola", "Toby", "Canela", "Simón", "Nala", "Coco",
+         "Bruno", "Mía", "Zeus", "Kira", "Manchas", "Pelusa", "Tomás", "Chispa", "Oreo", "Sasha"]
+BREEDS = ["Labrador", "Criollo", "Pastor Alemán", "Poodle", "Bulldog Francés", "Siamés", "Beagle",
+          "Golden Retriever", "Schnauzer", "Pinscher"]
+CITIES = ["Bogotá", "Medellín", "Cali", "Barranquilla", "Bucaramanga", "Cartagena", "Pereira", "Manizales"]
+OWNERS = ["Juan", "María", "Carlos", "Ana", "Luis", "Sofía", "Andrés", "Camila", "Jorge", "Valentina"]
+SURNAMES = ["Gómez", "Rodríguez", "Martínez", "López", "García", "Pérez", "Sánchez", "Ramírez"]
+WORDS = ["juguetón", "tímido", "collar", "rojo", "azul", "manchas", "negro", "blanco", "cicatriz", "oreja"]
+BATCH = 50000
+
+
+def fake_pet(i, rng):
+    owner = rng.choice(OWNERS)
+    surname = rng.choice(SURNAMES)
+    return (
+        f"{rng.getrandbits(32):08x}",
+        rng.choice(NAMES),
+        rng.choice(BREEDS),
+        " ".join(rng.sample(WORDS, 3)),
+        f"{owner} {surname}",
+        f"{owner.lower()}.{i}@correo.co",
+        rng.choice(CITIES),
+    )
+
+
+def seed(pets, rng):
+    from database import get_db_connection
+    conn = get_db_connection()
+    cur = conn.cursor()
+    for start in range(0, pets, BATCH):
+        rows = [fake_pet(i, rng) for i in range(start, min(start + BATCH, pets))]
+        cur.executemany(
+            "INSERT OR IGNORE INTO pets (id, name, breed, description, owner_name, owner_email, city, is_registered) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+            rows
+        )
+        conn.commit()
+    cur.close()
+    conn.close()
+
+
+def sample_queries(count, pets, rng):
+    """Búsquedas como las del panel: nombre, prefijos, nombre + ciudad, dueño, correo, ID."""
+    from database import get_db_connection
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT id, owner_email FROM pets WHERE rowid IN (%s)" % ",".join(
+        str(rng.randrange(1, pets + 1)) for _ in range(count)))
+    known = cur.fetchall()
+    cur.close()
+    conn.close()
+    queries = []
+    for i in range(count):
+        kind = i % 6
+        if kind == 0:
+            queries.append(rng.choice(NAMES))
+        elif kind == 1:
+            queries.append(rng.choice(NAMES)[:3])
+        elif kind == 2:
+            queries.append(f"{rng.choice(NAMES)} {rng.choice(CITIES)}")
+        elif kind == 3:
+            queries.append(f"{rng.choice(OWNERS)} {rng.choice(SURNAMES)} {rng.choice(BREEDS)}")
+        elif kind == 4:
+            queries.append(known[i % len(known)]["owner_email"])
+        else:
+            queries.append(known[i % len(known)]["id"][:6])
+    return queries
+
+
+def naive_search(text):
+    from database import get_db_connection
+    from search import normalize_query
+    conn = get_db_connection()
+    cur = conn.cursor()
+    conditions, params = [], []
+    for token in normalize_query(text):
+        conditions.append("(name || ' ' || breed || ' ' || description || ' ' || owner_name || ' ' || "
+                          "owner_email || ' ' || city || ' ' || id) LIKE ?")
+        params.append(f"%{token}%")
+    cur.execute(f"SELECT id FROM pets WHERE {' AND '.join(conditions)} LIMIT 21", params)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+def matches_all_tokens(pet, tokens):
+    from search import normalize_query
+    text = " ".join(str(pet[c] or "") for c in ("id", "name", "breed", "description", "city", "owner_name", "owner_email"))
+    # normalize_query() se queda con las primeras palabras: normalizar de a una
+    words = [w for part in text.replace("@", " ").replace(".", " ").split() for w in normalize_query(part)]
+    return all(any(word.startswith(token) for word in words) for token in tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la búsqueda de mascotas.")
+    parser.add_argument("--pets", type=int, default=1000000, help="Mascotas sintéticas")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--naive-queries", type=int, default=3, help="Consultas con LIKE sobre toda la tabla")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    temp_database("bench_search_")
+    from search import search_pets, normalize_query
+    from database import get_pet
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    seed(args.pets, rng)
+    print(f"Carga de {args.pets:,} mascotas (con índice FTS): {time.perf_counter() - started:.1f} s")
+
+    queries = sample_queries(args.queries, args.pets, rng)
+    timings, empty = [], 0
+    for text in queries:
+        started = time.perf_counter()
+        page = search_pets(text, per_page=args.per_page)
+        timings.append((time.perf_counter() - started) * 1000)
+        if not page.items:
+            empty += 1
+        tokens = normalize_query(text)
+        for row in page.items:
+            if not matches_all_tokens(get_pet(row["id"]), tokens):
+                print(f"❌ '{text}' devolvió {row['id']}, que no contiene todas las palabras")
+                sys.exit(1)
+
+    naive = []
+    for text in queries[:args.naive_queries]:
+        started = time.perf_counter()
+        naive_search(text)
+        naive.append((time.perf_counter() - started) * 1000)
+
+    print(f"{len(queries)} búsquedas, {empty} sin resultados, {args.per_page} por página")
+    print(f"{'Método':<22}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print(f"{'FTS5':<22}{percentile(timings, 0.5):>10.2f}{percentile(timings, 0.95):>10.2f}"
+          f"{percentile(timings, 0.99):>10.2f}")
+    print(f"{'LIKE sin índice':<22}{percentile(naive, 0.5):>10.0f}{percentile(naive, 0.95):>10.0f}"
+          f"{percentile(naive, 0.99):>10.0f}")
+    slowest = sorted(zip(timings, queries), reverse=True)[:3]
+    print("Más lentas: " + ", ".join(f"'{q}' {t:.1f} ms" for t, q in slowest))
+
+
+if __name__ == "__main__":
+    main()
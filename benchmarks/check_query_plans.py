@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Verifica que ninguna consulta de database.py y app.py recorra una tabla entera.
+
+Extrae del código fuente cada SQL pasado a cur.execute(), le pide el plan
+a la base de datos (EXPLAIN QUERY PLAN en SQLite, EXPLAIN con
+enable_seqscan=off en PostgreSQL) y termina con código 1 si alguna cae en
+un recorrido secuencial. Las consultas sin WHERE (listados completos del
+panel de administración) se omiten: leer toda la tabla es su propósito.
+Las funciones que arman el SQL en tiempo de ejecución (DYNAMIC_CALLS) se
+llaman de verdad y se revisa el SQL exacto que generan, así una copia
+escrita a mano no puede quedar desactualizada.
+
+En SQLite usa una base temporal con todas las migraciones aplicadas. Con
+RENDER definido usa la base PostgreSQL configurada, que debe estar migrada.
+
+Uso:
+    python benchmarks/check_query_plans.py
+    python benchmarks/check_query_plans.py --verbose
+"""
+
+import os
+import re
+import ast
+import sys
+import json
+import argparse
+
+from _common import ROOT, temp_database
+
+SOURCES = ("database.py", "app.py")
+SQL_START = re.compile(r"^\s*(SELECT|UPDATE|DELETE|INSERT)\b", re.IGNORECASE)
+
+# Funciones que arman parte del SQL en tiempo de ejecución: en vez de leer su
+# código se ejecutan de verdad con una conexión que solo anota lo que recibe
+# execute() (ver record_queries). Cada una lleva las llamadas necesarias para
+# cubrir sus variantes; reciben el módulo database.
+DYNAMIC_CALLS = {
+    "get_pet_with_history": (lambda db: db.get_pet_with_history("ABC123"),),
+    "get_existing_pet_ids": (lambda db: db.get_existing_pet_ids(["A1", "B2", "C3"]),),
+    "update_job": (lambda db: db.update_job("job", progress=1),),
+    "get_sightings_in_box": (lambda db: _sightings_in_box(db),),
+    "fetch_page": (
+        lambda db: db.get_users_page(after=10),
+        lambda db: db.get_users_page(before=10),
+        lambda db: db.get_pets_page(after="ABC123"),
+        lambda db: db.get_pets_page(owner_email="dueno@example.com"),
+        lambda db: db.get_pets_page(owner_email="dueno@example.com", after="ABC123"),
+        lambda db: db.get_pets_page(owner_email="dueno@example.com", registered_only=True, before="ABC123"),
+    ),
+    "search_pets_index": (lambda db: db.search_pets_index(["luna", "criollo"], 20),),
+    "search_pets_similar": (lambda db: db.search_pets_similar("luna", 20),),
+}
+
+
+def _sightings_in_box(db):
+    from geo import bounding_box, cell_ranges
+    box = bounding_box(4.65, -74.08, 2.0)
+    db.get_sightings_in_box(cell_ranges(box), box, since="2024-01-01 00:00:00", lost_only=True, city="Bogotá")
+
+
+class _RecordingCursor:
+    """Cursor que anota (línea, sql, parámetros) de cada execute() sin ejecutar nada."""
+
+    def __init__(self, log):
+        self._log = log
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, sql, params=()):
+        self._log.append((sys._getframe(1).f_lineno, sql, params))
+
+    def fetchone(self):
+        return None
+
+    def fetchall(self):
+        return []
+
+    def fetchmany(self, size=None):
+        return []
+
+    def close(self):
+        pass
+
+
+class _RecordingConnection:
+    def __init__(self, log):
+        self._log = log
+
+    def cursor(self, *args, **kwargs):
+        return _RecordingCursor(self._log)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def record_queries():
+    """(función, línea, sql, parámetros) de las consultas de DYNAMIC_CALLS, tal como las arma database.py."""
+    import database
+    queries = []
+    original = database.get_db_connection
+    try:
+        for function, calls in DYNAMIC_CALLS.items():
+            log = []
+            database.get_db_connection = lambda: _RecordingConnection(log)
+            for call in calls:
+                call(database)
+            for line, sql, params in log:
+                if SQL_START.match(sql) and sql not in (q for f, _, q, _ in queries if f == function):
+                    queries.append((function, line, sql, params))
+    finally:
+        database.get_db_connection = original
+    return queries
+
+
+def extract_queries(filename, placeholder):
+    """(función, línea, sql) de cada llamada a execute() con SQL en el archivo."""
+    with open(os.path.join(ROOT, filename), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    queries = []
+    for function in ast.walk(tree):
+        if not isinstance(function, ast.FunctionDef):
+            continue
+        for node in ast.walk(function):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr == "execute" and node.args):
+                continue
+            for sql in _literal_sql(node.args[0], function.name, placeholder):
+                if SQL_START.match(sql):
+                    queries.append((function.name, node.lineno, sql, None))
+    return queries
+
+
+def _literal_sql(arg, function_name, placeholder):
+    """Lista con el SQL (o los SQL) que recibe execute(); vacía si no se puede saber."""
+    if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+        return [arg.value]
+    if function_name in DYNAMIC_CALLS:
+        return []  # las cubre record_queries()
+    if isinstance(arg, ast.JoinedStr):
+        parts = []
+        for value in arg.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            elif isinstance(value.value, ast.Name) and value.value.id == "ph":
+                parts.append(placeholder)
+            else:
+                return []  # SQL armado en tiempo de ejecución (p. ej. DDL de migrate.py)
+        return ["".join(parts)]
+    return []
+
+
+def dialect_queries(queries, is_postgres):
+    """Filtra las consultas de la rama del motor en uso (por su marcador de parámetros)."""
+    selected = []
+    for function, line, sql, params in queries:
+        if is_postgres and "?" in sql:
+            continue
+        if not is_postgres and "%s" in sql:
+            continue
+        if not re.search(r"\bWHERE\b", sql, re.IGNORECASE):
+            continue
+        selected.append((function, line, sql, params))
+    return selected
+
+
+def sqlite_scans(cur, sql, params=None):
+    if params is None:
+        params = ["0"] * sql.count("?")
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    details = [row["detail"] for row in cur.fetchall()]
+    # "SCAN tabla" es un recorrido completo; "SEARCH ... USING INDEX" no. Una
+    # tabla virtual (FTS5) aparece como SCAN pero la resuelve su propio índice.
+    # Recorrer el resultado de una subconsulta (CO-ROUTINE / MATERIALIZE) tampoco lo es,
+    # ni leer el catálogo (sqlite_master), que no tiene índices y ocupa unas pocas filas.
+    exempt = {d.split()[1] for d in details if d.startswith(("CO-ROUTINE ", "MATERIALIZE "))}
+    exempt.add("sqlite_master")
+    scans = [d for d in details if d.startswith("SCAN ") and "CONSTANT ROW" not in d
+             and "VIRTUAL TABLE INDEX" not in d and d.split()[1] not in exempt]
+    return scans, details
+
+
+def postgres_scans(cur, sql, params=None):
+    if params is None:
+        params = []
+        for match in re.finditer(r"(ANY\()?%s", sql):
+            params.append(["0"] if match.group(1) else "0")
+    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+    row = cur.fetchone()
+    plan = row["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = []
+    stack = [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        nodes.append(f"{node['Node Type']} {node.get('Relation Name', '')}".strip())
+        stack.extend(node.get("Plans", []))
+    scans = [n for n in nodes if n.startswith("Seq Scan")]
+    return scans, nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta consultas que recorren tablas completas.")
+    parser.add_argument("--verbose", action="store_true", help="Muestra el plan de cada consulta")
+    args = parser.parse_args()
+
+    is_postgres = os.environ.get("RENDER") is not None
+    temp_database("query_plans_")
+
+    from database import get_db_connection
+    from migrate import current_version, latest_version
+
+    if is_postgres and current_version() < latest_version():
+        print("❌ La base no está migrada. Ejecuta: python migrate.py")
+        sys.exit(1)
+
+    placeholder = "%s" if is_postgres else "?"
+    queries = []
+    for filename in SOURCES:
+        for function, line, sql, params in dialect_queries(extract_queries(filename, placeholder), is_postgres):
+            queries.append((f"{filename}:{line} {function}", sql, params))
+    for function, line, sql, params in dialect_queries(record_queries(), is_postgres):
+        queries.append((f"database.py:{line} {function}", sql, params))
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if is_postgres:
+        # Con tablas chicas el planificador prefiere recorrerlas; así solo lo hace si no hay índice
+        cur.execute("SET enable_seqscan = off")
+
+    failures = 0
+    for where, sql, params in queries:
+        scans, plan = postgres_scans(cur, sql, params) if is_postgres else sqlite_scans(cur, sql, params)
+        if scans:
+            failures += 1
+            print(f"❌ {where}: {'; '.join(scans)}")
+            print(f"   {' '.join(sql.split())}")
+        elif args.verbose:
+            print(f"✅ {where}: {'; '.join(plan)}")
+    cur.close()
+    conn.close()
+
+    print(f"{len(queries)} consultas revisadas, {failures} con recorrido secuencial.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
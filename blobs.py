@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+from collections import Counter
+
+from database import iter_photo_references
+
+# Almacenamiento local direccionado por contenido. Cada archivo se guarda con
+# el SHA-256 de sus bytes como nombre, repartido en dos niveles de carpetas
+# (ab/cd/abcd...webp) para no tener cientos de miles de archivos juntos.
+# Subir dos veces la misma foto (o volver a guardar la ficha con la foto de
+# siempre) no ocupa más espacio: el segundo guardado encuentra el blob ya
+# escrito. Como un nombre nunca cambia de contenido, se sirven con caché
+# "immutable".
+#
+# Los blobs no se borran al reemplazar una foto porque otra mascota puede
+# estar usando el mismo. gc_blobs() cuenta las referencias desde
+# pets.photo_url y pets.photo_variants y borra los que quedaron en cero.
+BLOB_HASH_CHUNK = 1024 * 1024
+BLOB_GC_GRACE_HOURS = float(os.environ.get("BLOB_GC_GRACE_HOURS", "24"))
+
+_BLOB_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})(\.[a-z0-9]{1,5})?$")
+
+
+def blob_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(BLOB_HASH_CHUNK), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def blob_key(name):
+    """Hash del blob si `name` (ruta o URL) tiene la forma ab/cd/<sha256>.ext; si no, None."""
+    match = _BLOB_NAME.search(name or "")
+    if not match or not match.group(3).startswith(match.group(1) + match.group(2)):
+        return None
+    return match.group(3)
+
+
+class BlobStorage:
+    """Guarda en un directorio local servido en /media/, un archivo por contenido distinto."""
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url
+        self.written = 0
+        self.deduplicated = 0
+
+    def save(self, path, folder):
+        # `folder` solo tiene sentido en Cloudinary: aquí el nombre es el contenido
+        digest = blob_digest(path)
+        extension = os.path.splitext(path)[1].lower()
+        name = f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+        target = os.path.join(self.root, name)
+        if os.path.exists(target):
+            # Renovar la fecha para que gc_blobs() no lo borre mientras se
+            # termina de registrar la nueva referencia
+            os.utime(target)
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as out, open(path, "rb") as src:
+                    for chunk in iter(lambda: src.read(BLOB_HASH_CHUNK), b""):
+                        out.write(chunk)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, target)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+            self.written += 1
+        return f"{self.base_url}{name}"
+
+
+def count_blob_references():
+    """Counter {hash: cantidad de referencias} según las URLs guardadas en pets."""
+    references = Counter()
+    for row in iter_photo_references():
+        urls = [row["photo_url"]]
+        if row["photo_variants"]:
+            try:
+                urls.extend(v.get("url") for v in json.loads(row["photo_variants"]).values())
+            except (ValueError, AttributeError):
+                pass
+        for url in urls:
+            key = blob_key(url)
+            if key:
+                references[key] += 1
+    return references
+
+
+def _walk_blobs(root):
+    """(hash, ruta) de cada blob; hash None para temporales que dejó un guardado interrumpido."""
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            key = blob_key(os.path.relpath(path, root).replace(os.sep, "/"))
+            if key or filename.startswith(".tmp-"):
+                yield key, path
+
+
+def gc_blobs(root, grace_hours=BLOB_GC_GRACE_HOURS, dry_run=False):
+    """Borra los blobs sin referencias modificados hace más de `grace_hours`.
+
+    El margen cubre las subidas en curso: el worker guarda el blob antes de
+    escribir su URL en pets. Devuelve un resumen con lo encontrado y lo borrado.
+    """
+    references = count_blob_references()
+    cutoff = time.time() - grace_hours * 3600
+    summary = {"blobs": 0, "bytes": 0, "referenced": 0, "shared": 0, "references": sum(references.values()),
+               "removed": 0, "reclaimed_bytes": 0, "kept_recent": 0}
+    for key, path in _walk_blobs(root):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if key is not None:
+            summary["blobs"] += 1
+            summary["bytes"] += stat.st_size
+        if key is not None and references[key]:
+            summary["referenced"] += 1
+            if references[key] > 1:
+                summary["shared"] += 1
+            continue
+        if stat.st_mtime > cutoff:
+            summary["kept_recent"] += 1
+            continue
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        summary["removed"] += 1
+        summary["reclaimed_bytes"] += stat.st_size
+    return summary
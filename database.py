@@ -1,210 +1,141 @@
 import os
+import contextvars
+import threading
+import time
+from dataclasses import dataclass, field
+from db_pool import ConnectionPool
+from geo import grid_cell
 
 # Detectar entorno
 IS_PRODUCTION = os.environ.get("RENDER") is not None
+# Dueño de las etiquetas QR generadas en blanco, hasta que alguien las registre
+UNREGISTERED_EMAIL = "unregistered@petrescue.qr"
 
-def get_db_connection():
+# -------------------------------------------------
+# POOL DE CONEXIONES
+# -------------------------------------------------
+_pool = None
+_pool_lock = threading.Lock()
+
+# Conexión compartida por todo el código que se ejecuta dentro de una misma
+# petición HTTP (ver begin_request_scope / end_request_scope).
+_request_scope = contextvars.ContextVar("db_request_scope", default=None)
+
+def _dict_factory(cursor, row):
+    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+def _connect():
+    """Abre una conexión nueva contra la base de datos configurada."""
     if IS_PRODUCTION:
         import psycopg2
         from psycopg2.extras import RealDictCursor
-        conn = psycopg2.connect(
+        return psycopg2.connect(
             host=os.environ["DB_HOST"],
             database=os.environ["DB_NAME"],
             user=os.environ["DB_USER"],
             password=os.environ["DB_PASS"],
             port=os.environ.get("DB_PORT", "5432"),
-            cursor_factory=RealDictCursor
+            cursor_factory=RealDictCursor,
+            connect_timeout=int(os.environ.get("DB_CONNECT_TIMEOUT", "10")),
+            # CURRENT_TIMESTAMP en UTC, igual que SQLite y que las marcas
+            # calculadas en Python (parse_db_timestamp, _utc_timestamp)
+            options="-c timezone=UTC"
         )
-    else:
-        import sqlite3
-        conn = sqlite3.connect("pets.db")
-        conn.row_factory = sqlite3.Row
+    import sqlite3
+    conn = sqlite3.connect("pets.db", check_same_thread=False)
+    # Filas como diccionarios, igual que RealDictCursor en PostgreSQL
+    conn.row_factory = _dict_factory
     return conn
 
-def init_users_table():
-    """Crea la tabla de usuarios si no existe, con soporte para administradores y estado activo."""
-    conn = get_db_connection()
+def _ping(conn):
     cur = conn.cursor()
-    
-    if IS_PRODUCTION:
-        # PostgreSQL
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                is_admin BOOLEAN DEFAULT FALSE,
-                is_active BOOLEAN DEFAULT TRUE,
-                session_token TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        # Asegurar que todas las columnas existan
-        columns_to_add = [
-            ("session_token", "TEXT"),
-            ("is_active", "BOOLEAN DEFAULT TRUE")
-        ]
-        for col_name, col_type in columns_to_add:
-            try:
-                cur.execute(f"ALTER TABLE users ADD COLUMN IF NOT EXISTS {col_name} {col_type}")
-            except Exception as e:
-                print(f"⚠️ Advertencia al agregar {col_name} en users:", e)
-    else:
-        # SQLite
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                is_admin BOOLEAN DEFAULT 0,
-                is_active BOOLEAN DEFAULT 1,
-                session_token TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        # Asegurar que todas las columnas existan
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN session_token TEXT")
-        except Exception as e:
-            # Columna ya existe
-            pass
-        
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN is_active BOOLEAN DEFAULT 1")
-        except Exception as e:
-            # Columna ya existe
-            pass
-    
-    conn.commit()
+    cur.execute("SELECT 1")
     cur.close()
-    conn.close()
+    conn.rollback()
 
-def init_vaccines_table():
-    """Crea la tabla de vacunas y desparasitaciones si no existe."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
+def _reset(conn):
+    if IS_PRODUCTION and conn.closed:
+        raise RuntimeError("la conexión está cerrada")
+    conn.rollback()
+
+def _recover_if_failed(conn):
+    """Si una consulta anterior falló en PostgreSQL, limpia la transacción abortada."""
     if IS_PRODUCTION:
-        # PostgreSQL
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS vaccines (
-                id SERIAL PRIMARY KEY,
-                pet_id TEXT NOT NULL,
-                vaccine_name TEXT NOT NULL,
-                date_administered DATE NOT NULL,
-                next_due_date DATE,
-                veterinarian TEXT,
-                notes TEXT,
-                type TEXT DEFAULT 'vaccine'
-            )
-        """)
-        # Asegurar que la columna 'type' exista
-        try:
-            cur.execute("ALTER TABLE vaccines ADD COLUMN IF NOT EXISTS type TEXT DEFAULT 'vaccine'")
-        except Exception as e:
-            print(f"⚠️ Advertencia al agregar 'type' en vaccines:", e)
+        from psycopg2.extensions import TRANSACTION_STATUS_INERROR
+        if conn.get_transaction_status() == TRANSACTION_STATUS_INERROR:
+            conn.rollback()
+
+def get_pool():
+    """Devuelve el pool de conexiones del proceso (se crea al primer uso)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect, _ping, _reset,
+                    max_size=int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                    timeout=float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                    healthcheck_interval=float(os.environ.get("DB_POOL_HEALTHCHECK_INTERVAL", "30")),
+                    max_lifetime=float(os.environ.get("DB_POOL_MAX_LIFETIME", "3600"))
+                )
+    return _pool
+
+def get_pool_stats():
+    """Estadísticas del pool: conexiones en uso, en espera y latencia de checkout."""
+    return get_pool().stats()
+
+class PooledConnection:
+    """Conexión prestada por el pool. `close()` la devuelve en lugar de cerrarla."""
+
+    def __init__(self, conn, scoped=False):
+        self._conn = conn
+        self._scoped = scoped
+        self._released = False
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        if self._scoped:
+            # La conexión pertenece a la petición; se libera en end_request_scope()
+            _recover_if_failed(self._conn)
+        else:
+            get_pool().putconn(self._conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+class _RequestScope:
+    def __init__(self):
+        self.conn = None
+
+def begin_request_scope():
+    """Inicia un ámbito de petición: todas las llamadas a get_db_connection() comparten una conexión."""
+    _request_scope.set(_RequestScope())
+
+def end_request_scope():
+    """Devuelve al pool la conexión usada por la petición, si la hubo."""
+    scope = _request_scope.get()
+    if scope is None:
+        return
+    _request_scope.set(None)
+    if scope.conn is not None:
+        get_pool().putconn(scope.conn)
+
+def get_db_connection():
+    scope = _request_scope.get()
+    if scope is None:
+        return PooledConnection(get_pool().getconn())
+    if scope.conn is None:
+        scope.conn = get_pool().getconn()
     else:
-        # SQLite
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS vaccines (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pet_id TEXT NOT NULL,
-                vaccine_name TEXT NOT NULL,
-                date_administered TEXT NOT NULL,
-                next_due_date TEXT,
-                veterinarian TEXT,
-                notes TEXT,
-                type TEXT DEFAULT 'vaccine'
-            )
-        """)
-        # Asegurar que la columna 'type' exista
-        try:
-            cur.execute("ALTER TABLE vaccines ADD COLUMN type TEXT DEFAULT 'vaccine'")
-        except Exception as e:
-            # Columna ya existe
-            pass
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+        _recover_if_failed(scope.conn)
+    return PooledConnection(scope.conn, scoped=True)
 
 def init_db():
-    """Inicializa todas las tablas de la base de datos."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Tabla de mascotas
-    if IS_PRODUCTION:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS pets (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                breed TEXT,
-                description TEXT,
-                owner_name TEXT,
-                owner_email TEXT NOT NULL,
-                owner_phone TEXT,
-                photo_url TEXT,
-                city TEXT,
-                address TEXT,
-                found BOOLEAN DEFAULT FALSE,
-                is_registered BOOLEAN DEFAULT FALSE,
-                registration_password TEXT
-            )
-        """)
-        # Asegurar columnas adicionales
-        columns_to_add = [
-            ("owner_name", "TEXT"),
-            ("owner_phone", "TEXT"),
-            ("photo_url", "TEXT"),
-            ("city", "TEXT"),
-            ("address", "TEXT"),
-            ("found", "BOOLEAN DEFAULT FALSE"),
-            ("is_registered", "BOOLEAN DEFAULT FALSE"),
-            ("registration_password", "TEXT")
-        ]
-        for col_name, col_type in columns_to_add:
-            try:
-                cur.execute(f"ALTER TABLE pets ADD COLUMN IF NOT EXISTS {col_name} {col_type}")
-            except Exception as e:
-                print(f"⚠️ Advertencia al agregar {col_name} en pets:", e)
-    else:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS pets (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                breed TEXT,
-                description TEXT,
-                owner_name TEXT,
-                owner_email TEXT NOT NULL,
-                owner_phone TEXT,
-                photo_url TEXT,
-                city TEXT,
-                address TEXT,
-                found BOOLEAN DEFAULT 0,
-                is_registered BOOLEAN DEFAULT 0,
-                registration_password TEXT
-            )
-        """)
-        # Asegurar columnas adicionales en SQLite
-        columns_to_add = ["owner_name", "owner_phone", "photo_url", "city", "address", "found", "is_registered", "registration_password"]
-        for col_name in columns_to_add:
-            try:
-                if col_name in ["found", "is_registered"]:
-                    cur.execute(f"ALTER TABLE pets ADD COLUMN {col_name} BOOLEAN DEFAULT 0")
-                else:
-                    cur.execute(f"ALTER TABLE pets ADD COLUMN {col_name} TEXT")
-            except Exception as e:
-                # Columna ya existe
-                pass
-    
-    conn.commit()
-    cur.close()
-    conn.close()
-    
-    # 👇 ¡Importante! Inicializar la tabla de usuarios con soporte de admin y tokens
-    init_users_table()
-    init_vaccines_table()
+    """Lleva el esquema a la última versión (ver migrate.py)."""
+    from migrate import apply_migrations
+    apply_migrations()
 
 def add_user(email, password_hash):
     """Agrega un nuevo usuario a la base de datos."""
@@ -237,6 +168,47 @@ def get_user_by_email(email):
     conn.close()
     return user
 
+# -------------------------------------------------
+# CACHÉ DE VALIDACIÓN DE SESIÓN
+# -------------------------------------------------
+# Opcional (USER_CACHE_TTL=0 la desactiva). La invalidación es local al
+# proceso, así que con varios workers el TTL debe ser corto: es la cota de
+# cuánto tarda en verse, p. ej., una cuenta desactivada en otro worker.
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", "0"))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", "1000"))
+_user_cache = {}
+_user_cache_lock = threading.Lock()
+_user_cache_generation = 0
+
+def get_session_user(email):
+    """Obtiene un usuario para validar su sesión, usando la caché de corta duración si está habilitada."""
+    if USER_CACHE_TTL <= 0:
+        return get_user_by_email(email)
+    now = time.monotonic()
+    with _user_cache_lock:
+        entry = _user_cache.get(email)
+        generation = _user_cache_generation
+    if entry and entry[0] > now:
+        return entry[1]
+    user = get_user_by_email(email)
+    with _user_cache_lock:
+        # Si hubo una invalidación mientras consultábamos, no guardar el dato viejo
+        if generation == _user_cache_generation:
+            if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+                for key in [k for k, v in _user_cache.items() if v[0] <= now]:
+                    del _user_cache[key]
+                if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+                    _user_cache.clear()
+            _user_cache[email] = (now + USER_CACHE_TTL, user)
+    return user
+
+def invalidate_user_cache(email):
+    """Descarta el usuario cacheado tras modificarlo."""
+    global _user_cache_generation
+    with _user_cache_lock:
+        _user_cache_generation += 1
+        _user_cache.pop(email, None)
+
 def make_user_admin(email):
     """Convierte un usuario en administrador."""
     conn = get_db_connection()
@@ -248,6 +220,7 @@ def make_user_admin(email):
     conn.commit()
     cur.close()
     conn.close()
+    invalidate_user_cache(email)
 
 def update_user_session_token(email, token):
     """Actualiza el token de sesión del usuario."""
@@ -260,6 +233,7 @@ def update_user_session_token(email, token):
     conn.commit()
     cur.close()
     conn.close()
+    invalidate_user_cache(email)
 
 def clear_user_session_token(email):
     """Limpia el token de sesión de un usuario."""
@@ -272,6 +246,7 @@ def clear_user_session_token(email):
     conn.commit()
     cur.close()
     conn.close()
+    invalidate_user_cache(email)
 
 def is_token_valid(user):
     """Verifica si el token del usuario es válido."""
@@ -308,6 +283,130 @@ def get_pet(pet_id):
     conn.close()
     return pet
 
+def get_pet_version(pet_id):
+    """Obtiene solo la versión y la fecha de modificación de una mascota (para ETag / 304)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if IS_PRODUCTION:
+        cur.execute("SELECT version, updated_at FROM pets WHERE id = %s", (pet_id,))
+    else:
+        cur.execute("SELECT version, updated_at FROM pets WHERE id = ?", (pet_id,))
+    row = cur.fetchone()
+    cur.close()
+    conn.close()
+    return row
+
+# Columnas de vaccines que se traen junto a la mascota, con prefijo para no chocar con las de pets
+HISTORY_COLUMNS = ("id", "pet_id", "vaccine_name", "date_administered", "next_due_date", "veterinarian", "notes", "type")
+
+@dataclass(frozen=True, slots=True)
+class PetWithHistory:
+    """Mascota junto con su historial de vacunas y desparasitaciones (más recientes primero)."""
+    pet: dict
+    vaccines: list = field(default_factory=list)
+    deworming: list = field(default_factory=list)
+
+def get_pet_with_history(pet_id):
+    """Obtiene una mascota y todo su historial sanitario en una sola consulta.
+
+    Devuelve un PetWithHistory, o None si la mascota no existe.
+    """
+    history = ", ".join(f"v.{col} AS h_{col}" for col in HISTORY_COLUMNS)
+    ph = "%s" if IS_PRODUCTION else "?"
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT p.*, {history}
+        FROM pets p
+        LEFT JOIN vaccines v ON v.pet_id = p.id
+        WHERE p.id = {ph}
+        ORDER BY v.date_administered DESC, v.id DESC
+    """, (pet_id,))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    if not rows:
+        return None
+
+    prefixed = [f"h_{col}" for col in HISTORY_COLUMNS]
+    pet = {key: value for key, value in rows[0].items() if key not in prefixed}
+    result = PetWithHistory(pet=pet)
+    for row in rows:
+        if row["h_id"] is None:
+            continue  # LEFT JOIN sin registros
+        record = {col: row[f"h_{col}"] for col in HISTORY_COLUMNS}
+        # Igual que get_vaccines_by_pet y get_deworming_by_pet: sin tipo cuenta
+        # como vacuna y un tipo desconocido no va a ninguna de las dos listas
+        if record["type"] in ("vaccine", None):
+            result.vaccines.append(record)
+        elif record["type"] == "deworming":
+            result.deworming.append(record)
+    return result
+
+# ---- Lecturas completas por partes ----
+STREAM_BATCH_SIZE = int(os.environ.get("DB_STREAM_BATCH_SIZE", "2000"))
+
+def iter_query(sql, params=(), batch_size=STREAM_BATCH_SIZE):
+    """Genera las filas de una consulta de a lotes, sin tener el resultado entero en memoria.
+
+    En PostgreSQL usa un cursor con nombre (del lado del servidor): un cursor
+    normal de psycopg2 descarga todas las filas al ejecutar la consulta. En
+    SQLite el cursor ya avanza fila por fila. La conexión queda ocupada hasta
+    que el generador se agota o se cierra.
+    """
+    conn = get_db_connection()
+    if IS_PRODUCTION:
+        cur = conn.cursor(name=f"stream_{threading.get_ident()}_{time.monotonic_ns()}")
+        cur.itersize = batch_size
+    else:
+        cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cur.close()
+        conn.close()
+
+# Columnas de pets que salen en una exportación (nunca registration_password)
+EXPORT_PET_COLUMNS = ("id", "name", "breed", "description", "owner_name", "owner_email", "owner_phone",
+                      "photo_url", "city", "address", "found", "is_registered", "version", "updated_at")
+
+def iter_pets_with_history(batch_size=STREAM_BATCH_SIZE):
+    """Todas las mascotas en orden de id, cada una como PetWithHistory.
+
+    Una sola consulta con LEFT JOIN a vaccines, recorrida con iter_query():
+    las filas de una misma mascota llegan juntas y se agrupan al vuelo, así
+    que en memoria solo hay un lote y la mascota en curso.
+    """
+    pet_columns = ", ".join(f"p.{col}" for col in EXPORT_PET_COLUMNS)
+    history = ", ".join(f"v.{col} AS h_{col}" for col in HISTORY_COLUMNS)
+    current = None
+    for row in iter_query(f"""
+        SELECT {pet_columns}, {history}
+        FROM pets p
+        LEFT JOIN vaccines v ON v.pet_id = p.id
+        ORDER BY p.id, v.date_administered DESC, v.id DESC
+    """, batch_size=batch_size):
+        if current is None or current.pet["id"] != row["id"]:
+            if current is not None:
+                yield current
+            current = PetWithHistory(pet={col: row[col] for col in EXPORT_PET_COLUMNS})
+        if row["h_id"] is None:
+            continue  # LEFT JOIN sin registros
+        record = {col: row[f"h_{col}"] for col in HISTORY_COLUMNS}
+        # Igual que get_vaccines_by_pet y get_deworming_by_pet: sin tipo cuenta
+        # como vacuna y un tipo desconocido no va a ninguna de las dos listas
+        if record["type"] in ("vaccine", None):
+            current.vaccines.append(record)
+        elif record["type"] == "deworming":
+            current.deworming.append(record)
+    if current is not None:
+        yield current
+
 def get_all_pets(owner_email=None):
     """Obtiene todas las mascotas o solo las de un usuario específico."""
     conn = get_db_connection()
@@ -327,6 +426,225 @@ def get_all_pets(owner_email=None):
     conn.close()
     return pets
 
+# ---- Listados paginados por clave (keyset) ----
+# En vez de OFFSET, cada página pide las filas con clave menor (o mayor) que
+# la última mostrada: el costo no crece con el número de página y una
+# inserción concurrente no duplica ni salta filas. La clave es la primary key,
+# así que el orden es estable y el índice resuelve el filtro y el orden.
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX = 200
+PAGE_SIZE_CHOICES = (25, 50, 100, 200)
+
+@dataclass(frozen=True, slots=True)
+class Page:
+    """Una página de un listado ordenado por clave descendente.
+
+    Para users (id autoincremental) son los más recientes primero; los id de
+    pets son hexadecimales al azar, así que ahí el orden es estable pero no
+    cronológico.
+    """
+    items: list
+    per_page: int
+    next_cursor: object = None  # clave a pasar como `after` para ver la página siguiente
+    prev_cursor: object = None  # clave a pasar como `before` para volver a la anterior
+
+def fetch_page(table, key, columns="*", where=None, params=(), after=None, before=None, per_page=PAGE_SIZE_DEFAULT):
+    """Página de `table` ordenada por `key` descendente.
+
+    `after` trae las filas siguientes a esa clave y `before` las anteriores.
+    `table`, `key`, `columns` y `where` vienen del código, nunca del usuario.
+    """
+    ph = "%s" if IS_PRODUCTION else "?"
+    per_page = max(1, min(int(per_page), PAGE_SIZE_MAX))
+    conditions = [where] if where else []
+    params = list(params)
+    if before is not None:
+        conditions.append(f"{key} > {ph}")
+        params.append(before)
+        order = "ASC"
+    else:
+        if after is not None:
+            conditions.append(f"{key} < {ph}")
+            params.append(after)
+        order = "DESC"
+    sql = f"SELECT {columns} FROM {table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {key} {order} LIMIT {ph}"
+    # Una fila de más indica si hay otra página en esa dirección
+    params.append(per_page + 1)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+
+    if not rows and (after is not None or before is not None):
+        # Cursor vencido (filas borradas o URL editada): volver a la primera página
+        return fetch_page(table, key, columns, where, params[:-2], per_page=per_page)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before is not None:
+        rows.reverse()
+        next_cursor = rows[-1][key]
+        prev_cursor = rows[0][key] if has_more else None
+    else:
+        next_cursor = rows[-1][key] if has_more else None
+        prev_cursor = rows[0][key] if rows and after is not None else None
+    return Page(items=rows, per_page=per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+def get_users_page(after=None, before=None, per_page=PAGE_SIZE_DEFAULT):
+    """Usuarios del panel de administración, los más nuevos primero."""
+    return fetch_page("users", "id", "id, email, is_admin, is_active",
+                      after=after, before=before, per_page=per_page)
+
+def get_pets_page(owner_email=None, registered_only=False, after=None, before=None, per_page=PAGE_SIZE_DEFAULT):
+    """Mascotas (todas o las de un dueño), ordenadas por id descendente (no por fecha de alta)."""
+    ph = "%s" if IS_PRODUCTION else "?"
+    conditions, params = [], []
+    if owner_email:
+        conditions.append(f"owner_email = {ph}")
+        params.append(owner_email)
+    if registered_only:
+        conditions.append("is_registered = TRUE")
+    return fetch_page("pets", "id", where=" AND ".join(conditions) or None, params=params,
+                      after=after, before=before, per_page=per_page)
+
+COUNTABLE_COLUMNS = {("users", None), ("users", "is_active"), ("pets", None), ("pets", "is_registered")}
+
+def estimate_count(table, column=None, value=True):
+    """Cantidad aproximada de filas de `table` (con `column` = `value` si se indica).
+
+    En PostgreSQL sale de las estadísticas del planificador (pg_class y
+    pg_stats, que mantiene autovacuum) sin recorrer la tabla. Si la tabla aún
+    no fue analizada, o en SQLite, se cuenta de verdad.
+    """
+    if (table, column) not in COUNTABLE_COLUMNS:
+        raise ValueError(f"Conteo no permitido: {table}.{column}")
+    conn = get_db_connection()
+    cur = conn.cursor()
+    estimate = None
+    if IS_PRODUCTION:
+        cur.execute("SELECT reltuples::BIGINT AS estimate FROM pg_class WHERE oid = %s::regclass", (table,))
+        row = cur.fetchone()
+        total = row["estimate"] if row else -1
+        if total >= 0 and column is None:
+            estimate = total
+        elif total >= 0:
+            cur.execute(
+                "SELECT most_common_vals::TEXT AS vals, most_common_freqs AS freqs "
+                "FROM pg_stats WHERE schemaname = current_schema() AND tablename = %s AND attname = %s",
+                (table, column)
+            )
+            stats = cur.fetchone()
+            if stats:
+                # Para un booleano los valores vienen como '{f,t}'
+                values = (stats["vals"] or "{}").strip("{}").split(",")
+                wanted = "t" if value else "f"
+                freqs = dict(zip(values, stats["freqs"] or []))
+                estimate = round(total * freqs.get(wanted, 0.0))
+    if estimate is None:
+        ph = "%s" if IS_PRODUCTION else "?"
+        if column is None:
+            cur.execute(f"SELECT COUNT(*) AS total FROM {table}")
+        else:
+            cur.execute(f"SELECT COUNT(*) AS total FROM {table} WHERE {column} = {ph}", (value,))
+        estimate = cur.fetchone()["total"]
+    cur.close()
+    conn.close()
+    return int(estimate)
+
+# ---- Búsqueda de texto (índices de la migración 0008) ----
+SEARCH_COLUMNS = "p.id, p.name, p.breed, p.city, p.owner_name, p.owner_email, p.photo_url, p.is_registered, p.found"
+
+def search_pets_index(tokens, limit, offset=0, max_candidates=2000):
+    """Mascotas que contienen todas las palabras (como prefijo), de la más relevante a la menos.
+
+    `tokens` ya viene normalizado por search.py (minúsculas, sin tildes,
+    solo letras y números), así que se puede armar la consulta de texto.
+    Solo se puntúan `max_candidates` coincidencias: una palabra muy común
+    ("luna") puede aparecer en decenas de miles de filas y ordenarlas todas
+    por relevancia costaría cientos de milisegundos. En SQLite son las más
+    recientes (mayor rowid); en PostgreSQL, las primeras que entrega el
+    índice GIN, sin un orden definido: ordenarlas obligaría a leer todas.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if IS_PRODUCTION:
+        query = " & ".join(f"{token}:*" for token in tokens)
+        cur.execute(f"""
+            SELECT {SEARCH_COLUMNS},
+                   ts_rank_cd(pets_search_document(p.id, p.name, p.breed, p.description, p.city, p.owner_name, p.owner_email), q) AS score
+            FROM (
+                SELECT c.*
+                FROM pets c
+                WHERE pets_search_document(c.id, c.name, c.breed, c.description, c.city, c.owner_name, c.owner_email)
+                      @@ to_tsquery('simple', %s)
+                LIMIT %s
+            ) p, to_tsquery('simple', %s) q
+            ORDER BY score DESC, p.id DESC
+            LIMIT %s OFFSET %s
+        """, (query, max_candidates, query, limit, offset))
+    else:
+        query = " ".join(f'"{token}"*' for token in tokens)
+        # bm25 es negativo (menor = mejor); pesos en el orden de las columnas de pets_fts.
+        # FTS5 recorre sus listas por rowid, así que "las más recientes" sale sin ordenar.
+        cur.execute(f"""
+            SELECT {SEARCH_COLUMNS}, f.score
+            FROM (
+                SELECT rowid, -bm25(pets_fts, 10.0, 10.0, 4.0, 1.0, 4.0, 2.0, 2.0) AS score
+                FROM pets_fts
+                WHERE pets_fts MATCH ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            ) f
+            JOIN pets p ON p.rowid = f.rowid
+            ORDER BY f.score DESC, p.id DESC
+            LIMIT ? OFFSET ?
+        """, (query, max_candidates, limit, offset))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+def search_pets_by_owner(owner_email, limit, offset=0):
+    """Mascotas de un dueño para la búsqueda por correo, por posición (idx_pets_owner_id)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    cur.execute(f"""
+        SELECT p.id, p.name, p.breed, p.city, p.owner_name, p.owner_email, p.photo_url, p.is_registered, p.found,
+               1.0 AS score
+        FROM pets p
+        WHERE p.owner_email = {ph}
+        ORDER BY p.id DESC
+        LIMIT {ph} OFFSET {ph}
+    """, (owner_email, limit, offset))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+def search_pets_similar(term, limit):
+    """Mascotas con nombre parecido a `term` (trigramas). Solo PostgreSQL; en SQLite devuelve []."""
+    if not IS_PRODUCTION:
+        return []
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT {SEARCH_COLUMNS}, similarity(pets_search_unaccent(p.name), %s) AS score
+        FROM pets p
+        WHERE pets_search_unaccent(p.name) %% %s
+        ORDER BY score DESC, p.id DESC
+        LIMIT %s
+    """, (term, term, limit))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
 def delete_pet(pet_id):
     """Elimina una mascota por su ID."""
     conn = get_db_connection()
@@ -362,6 +680,7 @@ def toggle_user_active_status(email, is_active):
     conn.commit()
     cur.close()
     conn.close()
+    invalidate_user_cache(email)
 
 def get_user_by_email_full(email):
     """Obtiene un usuario completo por su correo (incluyendo is_active)."""
@@ -432,4 +751,493 @@ def delete_vaccine(vaccine_id):
     deleted = cur.rowcount > 0
     cur.close()
     conn.close()
-    return deleted
\ No newline at end of file
+    return deleted
+
+def get_existing_pet_ids(pet_ids):
+    """Devuelve cuáles de los IDs dados ya existen en la tabla de mascotas."""
+    pet_ids = list(pet_ids)
+    existing = set()
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if IS_PRODUCTION:
+        cur.execute("SELECT id FROM pets WHERE id = ANY(%s)", (pet_ids,))
+        existing.update(row["id"] for row in cur.fetchall())
+    else:
+        # SQLite limita la cantidad de parámetros por consulta
+        for start in range(0, len(pet_ids), 500):
+            chunk = pet_ids[start:start + 500]
+            cur.execute(f"SELECT id FROM pets WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            existing.update(row["id"] for row in cur.fetchall())
+    cur.close()
+    conn.close()
+    return existing
+
+def add_placeholder_pets(pet_ids, owner_email):
+    """Inserta mascotas vacías (QR sin activar) en una sola transacción."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if IS_PRODUCTION:
+            # COPY es mucho más rápido que INSERTs individuales en PostgreSQL
+            from io import StringIO
+            buffer = StringIO("".join(f"{pet_id}\t\t\tf\t{owner_email}\n" for pet_id in pet_ids))
+            cur.copy_expert("COPY pets (id, name, owner_name, is_registered, owner_email) FROM STDIN", buffer)
+        else:
+            cur.executemany(
+                "INSERT INTO pets (id, name, owner_name, is_registered, owner_email) VALUES (?, ?, ?, ?, ?)",
+                [(pet_id, "", "", False, owner_email) for pet_id in pet_ids]
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+def add_sightings(rows):
+    """Inserta un lote de avistamientos (pet_id, lat, lng, reported_at) en una sola transacción."""
+    rows = [(pet_id, lat, lng, reported_at, grid_cell(lat, lng)) for pet_id, lat, lng, reported_at in rows]
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if IS_PRODUCTION:
+            # Un único INSERT con muchas filas en lugar de una ida y vuelta por fila
+            from psycopg2.extras import execute_values
+            execute_values(cur, "INSERT INTO sightings (pet_id, lat, lng, reported_at, cell) VALUES %s", rows, page_size=500)
+        else:
+            cur.executemany("INSERT INTO sightings (pet_id, lat, lng, reported_at, cell) VALUES (?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+def get_sightings_in_box(cell_ranges, box, since=None, lost_only=False, city=None, max_rows=20000):
+    """Avistamientos dentro de un rectángulo, con los datos públicos de su mascota.
+
+    `cell_ranges` viene de geo.cell_ranges(box): cada rango se resuelve con el
+    índice de celdas y lat/lng recortan el borde. El orden por distancia lo
+    hace quien llama.
+    """
+    ph = "%s" if IS_PRODUCTION else "?"
+    lat_min, lat_max, lng_min, lng_max = box
+    conditions = ["(" + " OR ".join(f"s.cell BETWEEN {ph} AND {ph}" for _ in cell_ranges) + ")",
+                  f"s.lat BETWEEN {ph} AND {ph}", f"s.lng BETWEEN {ph} AND {ph}"]
+    params = [value for cell_range in cell_ranges for value in cell_range] + [lat_min, lat_max, lng_min, lng_max]
+    if since:
+        conditions.append(f"s.reported_at >= {ph}")
+        params.append(since)
+    if lost_only:
+        # Perdida = aún no encontrada. is_registered no sirve: /register guarda
+        # las mascotas con FALSE. Las etiquetas vacías (correo de reemplazo)
+        # no tienen dueño a quien avisar
+        conditions.append(f"p.found = FALSE AND p.owner_email <> {ph}")
+        params.append(UNREGISTERED_EMAIL)
+    if city:
+        conditions.append(f"LOWER(p.city) = LOWER({ph})")
+        params.append(city)
+    params.append(max_rows)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT s.pet_id, s.lat, s.lng, s.reported_at, p.name, p.photo_url, p.city
+        FROM sightings s
+        JOIN pets p ON p.id = s.pet_id
+        WHERE {" AND ".join(conditions)}
+        LIMIT {ph}
+    """, params)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+# ---- Importación masiva (ver import_data.py) ----
+# Tabla -> columna única por la que se saltan las filas que ya existen
+BULK_CONFLICT_KEYS = {"users": "email", "pets": "id", "vaccines": None}
+
+def bulk_insert(table, columns, rows):
+    """Inserta un lote en una sola transacción y devuelve cuántas filas entraron.
+
+    Las filas cuya clave (BULK_CONFLICT_KEYS) ya existe se saltan en silencio.
+    En PostgreSQL se cargan con COPY; si hay clave, a una tabla temporal desde
+    la que se insertan con ON CONFLICT DO NOTHING.
+    """
+    if table not in BULK_CONFLICT_KEYS:
+        raise ValueError(f"Tabla no permitida para importar: {table}")
+    conflict_key = BULK_CONFLICT_KEYS[table]
+    column_list = ", ".join(columns)
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        if IS_PRODUCTION:
+            import csv
+            from io import StringIO
+            buffer = StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            if conflict_key:
+                cur.execute(f"CREATE TEMP TABLE import_staging (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+                cur.copy_expert(f"COPY import_staging ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+                cur.execute(f"""
+                    INSERT INTO {table} ({column_list})
+                    SELECT {column_list} FROM import_staging
+                    ON CONFLICT ({conflict_key}) DO NOTHING
+                """)
+                inserted = cur.rowcount
+            else:
+                cur.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+                inserted = len(rows)
+        else:
+            verb = "INSERT OR IGNORE" if conflict_key else "INSERT"
+            fts_trigger = None
+            if table == "pets":
+                # El trigger de FTS indexa fila por fila y multiplica por diez el
+                # tiempo del lote: se quita dentro de la misma transacción y las
+                # filas nuevas se indexan de una vez al final
+                if not conn.in_transaction:
+                    cur.execute("BEGIN")
+                cur.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'pets_fts_insert'")
+                row = cur.fetchone()
+                fts_trigger = row["sql"] if row else None
+                cur.execute("SELECT COALESCE(MAX(rowid), 0) AS last_rowid FROM pets")
+                last_rowid = cur.fetchone()["last_rowid"]
+                if fts_trigger:
+                    cur.execute("DROP TRIGGER pets_fts_insert")
+            cur.executemany(
+                f"{verb} INTO {table} ({column_list}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+            # Suma de todo el lote, sin contar las filas que tocan los triggers
+            inserted = cur.rowcount
+            if fts_trigger:
+                cur.execute("""
+                    INSERT INTO pets_fts (rowid, id, name, breed, description, city, owner_name, owner_email)
+                    SELECT rowid, id, name, breed, description, city, owner_name, owner_email
+                    FROM pets WHERE rowid > ?
+                """, (last_rowid,))
+                cur.execute(fts_trigger)
+        conn.commit()
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+# -------------------------------------------------
+# TRABAJOS EN SEGUNDO PLANO
+# -------------------------------------------------
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+def create_job(job_id, owner_email, kind, params, total, max_per_owner, max_total):
+    """Registra un trabajo nuevo si no se superó ningún límite de trabajos activos.
+
+    `max_per_owner` limita los del usuario y `max_total` los de todo el
+    servidor. Devuelve None si el trabajo quedó registrado, o "owner" /
+    "total" según el límite que ya estaba alcanzado.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    if IS_PRODUCTION:
+        # En READ COMMITTED dos altas simultáneas ven el mismo conteo: se
+        # serializan hasta el COMMIT. SQLite ya serializa las escrituras.
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('jobs'))")
+    cur.execute(f"""
+        INSERT INTO jobs (id, owner_email, kind, status, params, total)
+        SELECT {ph}, {ph}, {ph}, 'queued', {ph}, {ph}
+        WHERE (SELECT COUNT(*) FROM jobs WHERE owner_email = {ph} AND status IN ('queued', 'running')) < {ph}
+          AND (SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')) < {ph}
+    """, (job_id, owner_email, kind, params, total, owner_email, max_per_owner, max_total))
+    limit = None
+    if cur.rowcount == 0:
+        cur.execute(f"SELECT COUNT(*) AS active FROM jobs WHERE owner_email = {ph} AND status IN ('queued', 'running')",
+                    (owner_email,))
+        limit = "owner" if cur.fetchone()["active"] >= max_per_owner else "total"
+    conn.commit()
+    cur.close()
+    conn.close()
+    return limit
+
+def get_job(job_id):
+    """Obtiene un trabajo por su ID."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if IS_PRODUCTION:
+        cur.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
+    else:
+        cur.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+    job = cur.fetchone()
+    cur.close()
+    conn.close()
+    return job
+
+def update_job(job_id, **fields):
+    """Actualiza columnas de un trabajo (status, progress, artifact_path, error) y su marca de tiempo."""
+    allowed = ("status", "progress", "total", "artifact_path", "error")
+    columns = [name for name in fields if name in allowed]
+    ph = "%s" if IS_PRODUCTION else "?"
+    assignments = [f"{name} = {ph}" for name in columns] + ["updated_at = CURRENT_TIMESTAMP"]
+    if fields.get("status") in ("done", "failed"):
+        assignments.append("finished_at = CURRENT_TIMESTAMP")
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE id = {ph}",
+                [fields[name] for name in columns] + [job_id])
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def fail_stale_jobs(stale_seconds):
+    """Marca como fallidos los trabajos activos que no reportan avance hace `stale_seconds`.
+
+    El corte se calcula en SQL, con el mismo reloj que llenó updated_at.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if IS_PRODUCTION:
+        cur.execute("""
+            UPDATE jobs SET status = 'failed', error = 'El proceso de trabajo dejó de responder.',
+            finished_at = CURRENT_TIMESTAMP
+            WHERE status IN ('queued', 'running') AND updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+        """, (stale_seconds,))
+    else:
+        cur.execute("""
+            UPDATE jobs SET status = 'failed', error = 'El proceso de trabajo dejó de responder.',
+            finished_at = CURRENT_TIMESTAMP
+            WHERE status IN ('queued', 'running') AND updated_at < datetime('now', '-' || ? || ' seconds')
+        """, (stale_seconds,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def expire_finished_jobs(retention_seconds):
+    """Marca como expirados los trabajos terminados hace más de `retention_seconds` y devuelve sus artefactos."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    if IS_PRODUCTION:
+        cur.execute("""
+            UPDATE jobs SET status = 'expired', artifact_path = NULL
+            FROM (
+                SELECT id, artifact_path FROM jobs
+                WHERE status IN ('done', 'failed') AND finished_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+                FOR UPDATE
+            ) old
+            WHERE jobs.id = old.id
+            RETURNING old.id, old.artifact_path
+        """, (retention_seconds,))
+        expired = cur.fetchall()
+    else:
+        # Un solo corte para el SELECT y el UPDATE, así coinciden las filas
+        cur.execute("SELECT datetime('now', '-' || ? || ' seconds') AS cutoff", (retention_seconds,))
+        cutoff = cur.fetchone()["cutoff"]
+        cur.execute("""
+            SELECT id, artifact_path FROM jobs
+            WHERE status IN ('done', 'failed') AND finished_at < ?
+        """, (cutoff,))
+        expired = cur.fetchall()
+        if expired:
+            cur.execute("""
+                UPDATE jobs SET status = 'expired', artifact_path = NULL
+                WHERE status IN ('done', 'failed') AND finished_at < ?
+            """, (cutoff,))
+    conn.commit()
+    cur.close()
+    conn.close()
+    return expired
+
+# ---- Subidas de fotos en segundo plano (ver uploads.py) ----
+def create_photo_upload(pet_id, folder, spool_path, spool_host):
+    """Registra una subida pendiente y reemplaza las que la mascota aún tenía en cola.
+
+    `spool_host` es la instancia en cuyo disco quedó el archivo. Devuelve
+    (id, rutas de los archivos reemplazados que están en esa misma
+    instancia, para borrarlos).
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    try:
+        cur.execute(f"SELECT spool_path, spool_host FROM photo_uploads WHERE pet_id = {ph} AND status = 'pending'", (pet_id,))
+        pending = cur.fetchall()
+        replaced = [row["spool_path"] for row in pending if row["spool_host"] == spool_host]
+        if pending:
+            cur.execute(f"""
+                UPDATE photo_uploads SET status = 'superseded', updated_at = CURRENT_TIMESTAMP
+                WHERE pet_id = {ph} AND status = 'pending'
+            """, (pet_id,))
+        if IS_PRODUCTION:
+            cur.execute(
+                "INSERT INTO photo_uploads (pet_id, folder, spool_path, spool_host) VALUES (%s, %s, %s, %s) RETURNING id",
+                (pet_id, folder, spool_path, spool_host)
+            )
+            upload_id = cur.fetchone()["id"]
+        else:
+            cur.execute(
+                "INSERT INTO photo_uploads (pet_id, folder, spool_path, spool_host) VALUES (?, ?, ?, ?)",
+                (pet_id, folder, spool_path, spool_host)
+            )
+            upload_id = cur.lastrowid
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return upload_id, replaced
+
+def claim_photo_upload(spool_host, now, stale_before):
+    """Toma la siguiente subida de la instancia `spool_host` lista para intentar, o None.
+
+    Solo esa instancia tiene el archivo en disco. Antes devuelve a la cola
+    las suyas que quedaron "uploading" desde `stale_before` (el proceso murió
+    a mitad de la subida). El UPDATE condicional evita que dos workers tomen
+    la misma.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    cur.execute(f"""
+        UPDATE photo_uploads SET status = 'pending'
+        WHERE spool_host = {ph} AND status = 'uploading' AND updated_at < {ph}
+    """, (spool_host, stale_before))
+    conn.commit()
+    claimed = None
+    while claimed is None:
+        cur.execute(f"""
+            SELECT * FROM photo_uploads
+            WHERE spool_host = {ph} AND status = 'pending' AND next_attempt_at <= {ph}
+            ORDER BY next_attempt_at
+            LIMIT 1
+        """, (spool_host, now))
+        upload = cur.fetchone()
+        if not upload:
+            break
+        cur.execute(f"""
+            UPDATE photo_uploads SET status = 'uploading', attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE id = {ph} AND status = 'pending'
+        """, (upload["id"],))
+        if cur.rowcount > 0:
+            claimed = dict(upload, attempts=upload["attempts"] + 1)
+        conn.commit()
+    cur.close()
+    conn.close()
+    return claimed
+
+def complete_photo_upload(upload_id, pet_id, url, variants=None):
+    """Marca la subida como hecha y pone la foto (y sus versiones, en JSON) en la mascota.
+
+    Si mientras tanto se encoló una foto más nueva para la misma mascota, no
+    la pisa. Devuelve True si actualizó photo_url.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    try:
+        cur.execute(f"""
+            UPDATE photo_uploads SET status = 'done', url = {ph}, error = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = {ph}
+        """, (url, upload_id))
+        cur.execute(f"""
+            UPDATE pets SET photo_url = {ph}, photo_variants = {ph}
+            WHERE id = {ph} AND NOT EXISTS (
+                SELECT 1 FROM photo_uploads
+                WHERE pet_id = {ph} AND id > {ph} AND status IN ('pending', 'uploading', 'done')
+            )
+        """, (url, variants, pet_id, pet_id, upload_id))
+        patched = cur.rowcount > 0
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+    return patched
+
+def update_photo_upload(upload_id, status, error=None, next_attempt_at=None):
+    """Devuelve la subida a la cola para reintentar (`pending`) o la da por fallida (`failed`)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    cur.execute(f"""
+        UPDATE photo_uploads SET status = {ph}, error = {ph},
+        next_attempt_at = COALESCE({ph}, next_attempt_at), updated_at = CURRENT_TIMESTAMP
+        WHERE id = {ph}
+    """, (status, error, next_attempt_at, upload_id))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def fail_abandoned_photo_uploads(updated_before):
+    """Da por fallidas las subidas sin avances desde la fecha dada, de cualquier instancia.
+
+    Son las de una instancia que ya no existe (su disco se perdió con ella):
+    nadie más puede procesarlas. Devuelve cuántas marcó.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    failed = 0
+    for status in ("pending", "uploading"):
+        cur.execute(f"""
+            UPDATE photo_uploads SET status = 'failed', error = 'Archivo perdido: la instancia que lo recibió ya no está',
+            updated_at = CURRENT_TIMESTAMP
+            WHERE status = {ph} AND updated_at < {ph}
+        """, (status, updated_before))
+        failed += cur.rowcount
+    conn.commit()
+    cur.close()
+    conn.close()
+    return failed
+
+def delete_finished_photo_uploads(updated_before):
+    """Borra el registro de subidas terminadas antes de la fecha dada."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    cur.execute(f"""
+        DELETE FROM photo_uploads
+        WHERE status IN ('done', 'failed', 'superseded') AND updated_at < {ph}
+    """, (updated_before,))
+    deleted = cur.rowcount
+    conn.commit()
+    cur.close()
+    conn.close()
+    return deleted
+
+def get_pets_without_variants(after_id, limit):
+    """Mascotas con foto pero sin versiones, en orden de id a partir de `after_id` (para el backfill)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    ph = "%s" if IS_PRODUCTION else "?"
+    cur.execute(f"""
+        SELECT id, photo_url, photo_variants FROM pets
+        WHERE id > {ph} AND photo_url IS NOT NULL AND photo_variants IS NULL
+        ORDER BY id
+        LIMIT {ph}
+    """, (after_id, limit))
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+def iter_photo_references():
+    """Recorre photo_url y photo_variants de todas las mascotas sin cargarlas juntas en memoria."""
+    yield from iter_query("SELECT photo_url, photo_variants FROM pets")
+
+def get_photo_upload_counts():
+    """Cantidad de subidas por estado."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT status, COUNT(*) AS total FROM photo_uploads GROUP BY status")
+    counts = {row["status"]: row["total"] for row in cur.fetchall()}
+    cur.close()
+    conn.close()
+    return counts
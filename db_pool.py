@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """No se pudo obtener una conexión del pool dentro del tiempo límite."""
+
+
+class ConnectionPool:
+    """Pool de conexiones acotado y seguro entre hilos.
+
+    - Nunca abre más de `max_size` conexiones a la vez.
+    - Si el pool está lleno, el hilo espera hasta `timeout` segundos.
+    - Antes de entregar una conexión que estuvo inactiva más de
+      `healthcheck_interval` segundos, verifica que siga viva.
+    - Las conexiones que superan `max_lifetime` se reciclan.
+    """
+
+    def __init__(self, connect, ping, reset, max_size=10, timeout=10.0,
+                 healthcheck_interval=30.0, max_lifetime=3600.0):
+        self._connect = connect
+        self._ping = ping
+        self._reset = reset
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self.max_lifetime = max_lifetime
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, created_at, last_used_at)
+        self._created_at = {}  # id(conn) -> created_at
+        self._pid = os.getpid()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+
+        # Estadísticas
+        self._checkouts = 0
+        self._timeouts = 0
+        self._connections_created = 0
+        self._connections_discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # -------------------------------------------------
+    # API PÚBLICA
+    # -------------------------------------------------
+    def getconn(self):
+        """Obtiene una conexión del pool, esperando si es necesario."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            self._check_fork()
+            while True:
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                    self._in_use += 1
+                    break
+                if self._size < self.max_size:
+                    # Reservar el cupo antes de conectar fuera del lock
+                    self._size += 1
+                    self._in_use += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"Pool agotado: {self._in_use}/{self.max_size} conexiones en uso tras {self.timeout}s"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        try:
+            if conn is None:
+                conn = self._new_connection()
+            elif not self._is_usable(conn, created_at, last_used):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._connections_discarded += 1
+                conn = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - started
+        with self._cond:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        """Devuelve una conexión al pool (o la descarta si quedó inservible)."""
+        if os.getpid() != self._pid:
+            # La conexión pertenece al proceso padre; no tocarla
+            return
+        if not discard:
+            try:
+                self._reset(conn)
+            except Exception as e:
+                print(f"⚠️ Conexión descartada al devolverla al pool: {e}")
+                discard = True
+        if discard:
+            self._close_quietly(conn)
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._size -= 1
+                self._connections_discarded += 1
+                self._created_at.pop(id(conn), None)
+            else:
+                created_at = self._created_at.get(id(conn), time.monotonic())
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        """Devuelve un resumen del estado del pool."""
+        with self._cond:
+            avg_wait = (self._wait_total / self._checkouts) if self._checkouts else 0.0
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "connections_created": self._connections_created,
+                "connections_discarded": self._connections_discarded,
+                "checkout_wait_avg_ms": round(avg_wait * 1000, 3),
+                "checkout_wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def closeall(self):
+        """Cierra todas las conexiones inactivas."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn, _, _ in idle:
+            self._close_quietly(conn)
+
+    # -------------------------------------------------
+    # INTERNOS
+    # -------------------------------------------------
+    def _check_fork(self):
+        # Tras un fork, las conexiones heredadas comparten socket con el
+        # proceso padre: se olvidan sin cerrarlas y se empieza de cero.
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._created_at.clear()
+            self._size = 0
+            self._in_use = 0
+            self._waiting = 0
+
+    def _new_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._connections_created += 1
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _is_usable(self, conn, created_at, last_used):
+        now = time.monotonic()
+        if self.max_lifetime and now - created_at > self.max_lifetime:
+            return False
+        if now - last_used > self.healthcheck_interval:
+            try:
+                self._ping(conn)
+            except Exception as e:
+                print(f"⚠️ Conexión inactiva no respondió al health check: {e}")
+                return False
+        return True
+
+    def _close_quietly(self, conn):
+        with self._cond:
+            self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Exportación completa de mascotas con sus vacunas y desparasitaciones.
+
+Recorre la base con un cursor del lado del servidor (ver
+database.iter_pets_with_history) y escribe a medida que llegan las filas,
+opcionalmente comprimiendo en gzip al vuelo: la memoria usada es la misma
+para mil mascotas que para millones. El panel de administración usa el
+mismo generador en /admin/export.<formato>.
+
+Formatos:
+    csv:    una fila por vacuna o desparasitación, con los datos de la
+            mascota repetidos (las mascotas sin registros salen en una fila
+            con las columnas del registro vacías). Los textos que una planilla
+            tomaría como fórmula (=, +, -, @) llevan un apóstrofo delante.
+    ndjson: una línea por mascota, con las listas "vaccines" y "deworming"
+Nunca se exporta registration_password.
+
+Uso:
+    python export_data.py csv -o mascotas.csv
+    python export_data.py ndjson --gzip -o mascotas.ndjson.gz
+    python export_data.py ndjson | jq .name      # sin -o escribe en stdout
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import zlib
+import argparse
+from io import StringIO
+
+# Asegurar que el script pueda importar database.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import iter_pets_with_history, EXPORT_PET_COLUMNS
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_CHUNK = 64 * 1024
+RECORD_COLUMNS = ("vaccine_name", "date_administered", "next_due_date", "veterinarian", "notes")
+CSV_COLUMNS = EXPORT_PET_COLUMNS + ("record_id", "type") + RECORD_COLUMNS
+BOOLEAN_COLUMNS = ("found", "is_registered")
+# Una celda que empieza así es una fórmula para Excel o Sheets; los textos
+# vienen de formularios públicos, así que se neutralizan con un apóstrofo
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _pet_values(pet):
+    # SQLite guarda los booleanos como 0/1
+    return {col: (bool(pet[col]) if col in BOOLEAN_COLUMNS and pet[col] is not None else pet[col])
+            for col in EXPORT_PET_COLUMNS}
+
+
+def _record_values(record):
+    values = {"id": record["id"], "type": record["type"] or "vaccine"}
+    values.update((col, record[col]) for col in RECORD_COLUMNS)
+    return values
+
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(pets):
+    """Texto CSV, un bloque por mascota."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    for item in pets:
+        buffer.seek(0)
+        buffer.truncate()
+        pet = _pet_values(item.pet)
+        pet_row = [_csv_cell(pet[col]) for col in EXPORT_PET_COLUMNS]
+        records = item.vaccines + item.deworming
+        if not records:
+            writer.writerow(pet_row + [None] * (len(CSV_COLUMNS) - len(pet_row)))
+        for record in records:
+            values = _record_values(record)
+            writer.writerow(pet_row + [values["id"], values["type"]] + [_csv_cell(values[col]) for col in RECORD_COLUMNS])
+        yield buffer.getvalue()
+
+
+def ndjson_lines(pets):
+    """Una línea JSON por mascota."""
+    for item in pets:
+        document = _pet_values(item.pet)
+        document["vaccines"] = [_record_values(record) for record in item.vaccines]
+        document["deworming"] = [_record_values(record) for record in item.deworming]
+        # default=str: fechas y timestamps de PostgreSQL en formato ISO
+        yield json.dumps(document, ensure_ascii=False, default=str) + "\n"
+
+
+def stream_export(file_format, compress=False, progress=None):
+    """Genera la exportación como bloques de bytes de unos EXPORT_CHUNK.
+
+    Con `compress` la salida es un archivo gzip completo. `progress`, si se
+    indica, recibe la cantidad de mascotas escritas hasta el momento.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {file_format} (usa csv o ndjson)")
+    lines = csv_lines if file_format == "csv" else ndjson_lines
+    # wbits 31: deflate con encabezado y cola gzip
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending = []
+    pending_size = 0
+    count = -1 if file_format == "csv" else 0  # sin contar el encabezado
+    for text in lines(iter_pets_with_history()):
+        data = text.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+        count += 1
+        if pending_size >= EXPORT_CHUNK:
+            yield b"".join(pending)
+            pending.clear()
+            pending_size = 0
+            if progress:
+                progress(count)
+    if compressor:
+        pending.append(compressor.flush())
+    if pending:
+        yield b"".join(pending)
+
+
+def export_filename(file_format, compress=False):
+    return f"mascotas_{time.strftime('%Y%m%d')}.{file_format}" + (".gz" if compress else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta todas las mascotas con su historial sanitario.")
+    parser.add_argument("format", choices=sorted(EXPORT_FORMATS), help="Formato de salida")
+    parser.add_argument("-o", "--output", help="Archivo de salida (por defecto stdout)")
+    parser.add_argument("--gzip", action="store_true", help="Comprimir la salida en gzip")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    last_report = [started]
+
+    def report(count):
+        now = time.monotonic()
+        if now - last_report[0] >= 1:
+            last_report[0] = now
+            print(f"   {count:,} mascotas exportadas...", file=sys.stderr)
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        for block in stream_export(args.format, compress=args.gzip, progress=report):
+            out.write(block)
+            written += len(block)
+    finally:
+        if args.output:
+            out.close()
+        else:
+            out.flush()
+    seconds = time.monotonic() - started
+    target = args.output or "stdout"
+    print(f"✅ {written / 1024 / 1024:,.1f} MiB escritos en {target} en {seconds:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import math
+
+# Grilla fija de 0.01° (~1.1 km de latitud). Cada punto cae en una celda
+# identificada por un entero: fila * GRID_COLUMNS + columna. Las celdas de
+# una misma fila son consecutivas, así que un rectángulo se cubre con un
+# rango de celdas por fila y el índice sobre la columna resuelve cada rango.
+GRID_CELLS_PER_DEGREE = 100
+GRID_COLUMNS = 360 * GRID_CELLS_PER_DEGREE
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+
+def grid_cell(lat, lng):
+    """Celda de la grilla para un punto. Debe coincidir con la fórmula SQL de la migración 0006."""
+    row = math.floor((lat + 90) * GRID_CELLS_PER_DEGREE)
+    column = math.floor((lng + 180) * GRID_CELLS_PER_DEGREE)
+    return row * GRID_COLUMNS + column
+
+
+def bounding_box(lat, lng, radius_km):
+    """(lat_min, lat_max, lng_min, lng_max) que contiene el círculo de radio `radius_km`."""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    # Cerca de los polos el círculo abarca todas las longitudes
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+    dlng = 180.0 if cos_lat < 1e-6 else min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return (max(lat - dlat, -90.0), min(lat + dlat, 90.0),
+            max(lng - dlng, -180.0), min(lng + dlng, 180.0))
+
+
+def cell_ranges(box):
+    """Rangos (primera, última) de celdas que cubren un rectángulo, uno por fila de la grilla.
+
+    No cruza el antimeridiano: el rectángulo se recorta a [-180, 180].
+    """
+    lat_min, lat_max, lng_min, lng_max = box
+    first_row = math.floor((lat_min + 90) * GRID_CELLS_PER_DEGREE)
+    last_row = math.floor((lat_max + 90) * GRID_CELLS_PER_DEGREE)
+    first_column = math.floor((lng_min + 180) * GRID_CELLS_PER_DEGREE)
+    last_column = math.floor((lng_max + 180) * GRID_CELLS_PER_DEGREE)
+    return [(row * GRID_COLUMNS + first_column, row * GRID_COLUMNS + last_column)
+            for row in range(first_row, last_row + 1)]
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distancia sobre la esfera terrestre, en kilómetros."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,48 @@
+import os
+
+# Servidor de producción: gunicorn con varios procesos y varios hilos por proceso.
+#     gunicorn app:app            (lee este archivo automáticamente)
+#
+# La app se importa una sola vez en el proceso maestro (preload_app) y los
+# workers se crean con fork: ensure_schema(), las plantillas y los módulos se
+# cargan una vez, y la memoria que no se modifica queda compartida.
+#
+# Reinicios sin cortar peticiones:
+#     kill -HUP <pid del maestro>   workers nuevos, los viejos terminan lo que tienen en curso
+#     kill -USR2 <pid del maestro>  nuevo maestro con el código nuevo (luego -TERM al viejo)
+# Con preload_app, HUP reutiliza el código ya cargado en el maestro: para
+# desplegar código nuevo hace falta USR2 o un reinicio completo.
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+# Reciclar cada worker tras unas miles de peticiones (con azar para que no
+# se reinicien todos a la vez) acota cualquier crecimiento de memoria
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "200"))
+accesslog = "-"
+errorlog = "-"
+forwarded_allow_ips = "*"
+
+
+def when_ready(server):
+    # El maestro abrió conexiones al importar la app (ensure_schema): se cierran
+    # para no mantenerlas ocupadas y para que ningún worker herede su socket
+    from database import get_pool
+    get_pool().closeall()
+    # En cada worker, el pool y los hilos de fondo (avistamientos, fotos, QR
+    # masivos) detectan el cambio de pid y se rehacen solos al primer uso
+    server.log.info("🚀 App cargada, creando %s workers x %s hilos", workers, threads)
+
+
+def worker_exit(server, worker):
+    # Guardar los avistamientos que siguen en memoria antes de que el worker muera
+    try:
+        from sightings import flush_sightings
+        flush_sightings()
+    except Exception as e:
+        server.log.error("❌ No se pudieron guardar los avistamientos pendientes: %r", e)
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Importación masiva de usuarios, mascotas y vacunas desde CSV o JSON.
+
+Lee el archivo de a poco (sirve para archivos más grandes que la memoria),
+valida cada fila y escribe por lotes, cada lote en su propia transacción
+(COPY en PostgreSQL, executemany en SQLite). Las contraseñas se hashean en
+paralelo en varios procesos. Las filas con errores no detienen la
+importación: se guardan con el motivo en un CSV de rechazadas.
+
+Formatos: .csv (con encabezados), .json (lista de objetos) y .ndjson/.jsonl
+(un objeto por línea). Columnas de cada tipo:
+    users:    email, password (o password_hash ya generado), is_admin, is_active
+    pets:     id (si falta se genera), name, owner_email, breed, description,
+              owner_name, owner_phone, photo_url, city, address, is_registered, found
+    vaccines: pet_id, vaccine_name, date_administered, next_due_date,
+              veterinarian, notes, type (vaccine | deworming)
+Los usuarios y mascotas que ya existen (mismo correo o ID) se saltan; las
+mascotas sin ID no se pueden reconocer, así que reimportarlas las duplica.
+Las vacunas de mascotas que no existen se rechazan: importar primero las
+mascotas. La base debe estar migrada (python migrate.py).
+
+Uso:
+    python import_data.py users usuarios.csv
+    python import_data.py pets mascotas.csv --chunk 5000
+    python import_data.py vaccines vacunas.ndjson --rejects vacunas_rechazadas.csv
+    python import_data.py pets mascotas.json --dry-run      # solo valida
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+# Asegurar que el script pueda importar database.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.security import generate_password_hash
+from database import bulk_insert, get_existing_pet_ids
+from qr_bulk import new_pet_id
+
+IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "5000"))
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+PET_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")  # el mismo que aceptan las rutas /qr/<id>
+HASH_PATTERN = re.compile(r"^(scrypt|pbkdf2)[:$]")
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+TRUE_VALUES = {"1", "true", "t", "si", "sí", "s", "yes", "y", "x"}
+FALSE_VALUES = {"0", "false", "f", "no", "n"}
+RECORD_TYPES = {"vaccine": "vaccine", "vacuna": "vaccine",
+                "deworming": "deworming", "desparasitacion": "deworming", "desparasitación": "deworming"}
+MAX_TEXT_LENGTH = 2000
+REDACTED_COLUMNS = {"password", "password_hash"}
+
+
+class RowError(Exception):
+    """La fila no se puede importar; el mensaje se guarda en el CSV de rechazadas."""
+
+
+# -------------------------------------------------
+# LECTURA
+# -------------------------------------------------
+def read_csv(f):
+    reader = csv.DictReader(f)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(f):
+    for line_number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, RowError(f"JSON inválido: {e.msg}")
+
+
+_WHITESPACE = re.compile(r"[\s,]*")
+
+
+def read_json_array(f, block_size=1 << 16):
+    """Objetos de una lista JSON, decodificados de a uno sin cargar el archivo entero."""
+    decoder = json.JSONDecoder()
+    buffer, position, number, started = "", 0, 0, False
+    for block in iter(lambda: f.read(block_size), ""):
+        buffer = buffer[position:] + block
+        position = 0
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position >= len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("El archivo JSON debe ser una lista de objetos")
+                started, position = True, position + 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # objeto cortado al final del bloque: leer más
+            number += 1
+            yield number, item
+    if buffer[position:].strip():
+        raise ValueError("El archivo JSON está incompleto o mal formado")
+
+
+def read_rows(path, file_format=None):
+    """(número de línea u objeto, fila como dict) de cada registro del archivo."""
+    file_format = file_format or os.path.splitext(path)[1].lower().lstrip(".")
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if file_format == "csv":
+            yield from read_csv(f)
+        elif file_format in ("ndjson", "jsonl"):
+            yield from read_ndjson(f)
+        elif file_format == "json":
+            # Un .json con un objeto por línea también se acepta
+            first = f.read(1)
+            while first.isspace():
+                first = f.read(1)
+            f.seek(0)
+            yield from (read_json_array(f) if first == "[" else read_ndjson(f))
+        else:
+            raise ValueError(f"Formato no soportado: {file_format} (usa csv, json o ndjson)")
+
+
+# -------------------------------------------------
+# VALIDACIÓN
+# -------------------------------------------------
+def _text(row, name, required=False):
+    value = row.get(name)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"Falta {name}")
+    if len(value) > MAX_TEXT_LENGTH:
+        raise RowError(f"{name} supera {MAX_TEXT_LENGTH} caracteres")
+    return value or None
+
+
+def _bool(row, name, default):
+    value = row.get(name)
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"{name} no es sí/no: {value}")
+
+
+def _email(row, name):
+    # En minúsculas, como los busca la app: A@B.co y a@b.co son el mismo usuario
+    email = _text(row, name, required=True).lower()
+    if not EMAIL_PATTERN.match(email):
+        raise RowError(f"{name} no es un correo válido: {email}")
+    return email
+
+
+def _date(row, name, required=False):
+    value = _text(row, name, required)
+    if value is None:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise RowError(f"{name} no es una fecha válida (AAAA-MM-DD): {value}")
+
+
+def validate_user(row, seen):
+    email = _email(row, "email")
+    if email in seen:
+        raise RowError("Correo repetido en el archivo")
+    password_hash = _text(row, "password_hash")
+    if password_hash and not HASH_PATTERN.match(password_hash):
+        raise RowError("password_hash no tiene el formato de werkzeug")
+    password = None if password_hash else _text(row, "password", required=True)
+    seen.add(email)
+    # La contraseña va en lugar del hash: se reemplaza al hashear el lote
+    return [email, password_hash or password, _bool(row, "is_admin", False), _bool(row, "is_active", True)], \
+        password_hash is None
+
+
+def validate_pet(row, seen):
+    pet_id = _text(row, "id")
+    if pet_id is not None:
+        if not PET_ID_PATTERN.match(pet_id):
+            raise RowError(f"ID inválido (letras, números, - y _): {pet_id}")
+        if pet_id in seen:
+            raise RowError("ID repetido en el archivo")
+        seen.add(pet_id)
+    return [pet_id, _text(row, "name", required=True), _text(row, "breed"), _text(row, "description"),
+            _text(row, "owner_name"), _email(row, "owner_email"), _text(row, "owner_phone"),
+            _text(row, "photo_url"), _text(row, "city"), _text(row, "address"),
+            _bool(row, "is_registered", True), _bool(row, "found", False),
+            # Con la fecha ya puesta, SQLite no dispara un UPDATE por fila para completarla
+            datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")], pet_id is None
+
+
+def validate_vaccine(row, seen):
+    record_type = (_text(row, "type") or "vaccine").lower()
+    if record_type not in RECORD_TYPES:
+        raise RowError(f"type debe ser vaccine o deworming: {record_type}")
+    return [_text(row, "pet_id", required=True), _text(row, "vaccine_name", required=True),
+            _date(row, "date_administered", required=True), _date(row, "next_due_date"),
+            _text(row, "veterinarian"), _text(row, "notes"), RECORD_TYPES[record_type]], False
+
+
+KINDS = {
+    "users": ("users", ("email", "password_hash", "is_admin", "is_active"), validate_user),
+    "pets": ("pets", ("id", "name", "breed", "description", "owner_name", "owner_email", "owner_phone",
+                      "photo_url", "city", "address", "is_registered", "found", "updated_at"), validate_pet),
+    "vaccines": ("vaccines", ("pet_id", "vaccine_name", "date_administered", "next_due_date",
+                              "veterinarian", "notes", "type"), validate_vaccine),
+}
+
+
+# -------------------------------------------------
+# PREPARACIÓN DE CADA LOTE
+# -------------------------------------------------
+def _hash(password, method):
+    return generate_password_hash(password, method) if method else generate_password_hash(password)
+
+
+def hash_passwords(batch, pool, workers, method):
+    """Reemplaza las contraseñas en claro del lote por su hash, en paralelo."""
+    pending = [values for _, values, needs_hash, _ in batch if needs_hash]
+    if not pending:
+        return
+    chunksize = max(1, len(pending) // (workers * 4))
+    for values, password_hash in zip(pending, pool.map(_hash, [v[1] for v in pending], repeat(method),
+                                                       chunksize=chunksize)):
+        values[1] = password_hash
+
+
+def assign_pet_ids(batch, seen):
+    """Genera IDs para las mascotas que no traen uno, sin chocar con los existentes."""
+    pending = [values for _, values, needs_id, _ in batch if needs_id]
+    while pending:
+        for values in pending:
+            values[0] = new_pet_id()
+            while values[0] in seen:
+                values[0] = new_pet_id()
+            seen.add(values[0])
+        taken = get_existing_pet_ids([values[0] for values in pending])
+        pending = [values for values in pending if values[0] in taken]
+
+
+def drop_missing_pets(batch, rejected):
+    """Saca del lote las vacunas de mascotas que no existen."""
+    existing = get_existing_pet_ids({values[0] for _, values, _, _ in batch})
+    kept = []
+    for item in batch:
+        if item[1][0] in existing:
+            kept.append(item)
+        else:
+            rejected.append((item[0], f"La mascota {item[1][0]} no existe", item[3]))
+    return kept
+
+
+# -------------------------------------------------
+# IMPORTACIÓN
+# -------------------------------------------------
+class RejectsFile:
+    """CSV de filas rechazadas (línea, motivo, fila original). Se crea con el primer rechazo."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, line, error, row):
+        if self._writer is None:
+            self._file = open(self.path, "w", encoding="utf-8", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["linea", "motivo", "fila"])
+        data = row if isinstance(row, dict) else None
+        if data:
+            # Las contraseñas no se copian al CSV de rechazadas
+            data = {key: ("***" if str(key).strip().lower() in REDACTED_COLUMNS and value else value)
+                    for key, value in data.items()}
+        self._writer.writerow([line, error, json.dumps(data, ensure_ascii=False, default=str) if data else ""])
+        self.count += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+def import_file(kind, path, chunk_size=IMPORT_CHUNK_SIZE, file_format=None, rejects_path=None,
+                workers=None, hash_method=None, dry_run=False):
+    """Importa `path` y devuelve un resumen con lo leído, importado, existente y rechazado."""
+    table, columns, validate = KINDS[kind]
+    rejects = RejectsFile(rejects_path or f"{path}.rechazados.csv")
+    stats = {"read": 0, "imported": 0, "existing": 0, "rejected": 0}
+    seen = set()
+    started = last_report = time.monotonic()
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if kind == "users" and not dry_run else None
+
+    def flush(batch):
+        rejected = []
+        if kind == "users":
+            if pool:
+                hash_passwords(batch, pool, workers, hash_method)
+        elif kind == "pets":
+            assign_pet_ids(batch, seen)
+        elif kind == "vaccines":
+            batch = drop_missing_pets(batch, rejected)
+        if batch and not dry_run:
+            try:
+                inserted = bulk_insert(table, columns, [values for _, values, _, _ in batch])
+                stats["imported"] += inserted
+                stats["existing"] += len(batch) - inserted
+            except Exception as e:
+                # El lote entero se deshizo: sus filas van a rechazadas con el error de la base
+                print(f"❌ Lote de {len(batch)} filas rechazado: {e}")
+                rejected.extend((line, f"Error de la base de datos: {e}", row) for line, _, _, row in batch)
+        elif dry_run:
+            stats["imported"] += len(batch)
+        for line, error, row in rejected:
+            rejects.write(line, error, row)
+        stats["rejected"] += len(rejected)
+
+    try:
+        batch = []
+        for line, row in read_rows(path, file_format):
+            stats["read"] += 1
+            try:
+                if isinstance(row, RowError):
+                    raise row
+                if not isinstance(row, dict):
+                    raise RowError("Se esperaba un objeto con columnas")
+                values, pending = validate(row, seen)
+                batch.append((line, values, pending, row))
+            except RowError as e:
+                rejects.write(line, str(e), row if isinstance(row, dict) else None)
+                stats["rejected"] += 1
+            if len(batch) >= chunk_size:
+                flush(batch)
+                batch = []
+                now = time.monotonic()
+                if now - last_report >= 1:
+                    last_report = now
+                    print(f"   {stats['read']:,} leídas, {stats['imported']:,} importadas, "
+                          f"{stats['rejected']:,} rechazadas ({stats['read'] / (now - started):,.0f} filas/s)")
+        if batch:
+            flush(batch)
+    finally:
+        if pool:
+            pool.shutdown()
+        rejects.close()
+    stats["seconds"] = time.monotonic() - started
+    stats["rejects_path"] = rejects.path if rejects.count else None
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa usuarios, mascotas o vacunas desde CSV o JSON.")
+    parser.add_argument("kind", choices=sorted(KINDS), help="Qué se importa")
+    parser.add_argument("path", help="Archivo .csv, .json o .ndjson")
+    parser.add_argument("--format", choices=["csv", "json", "ndjson"], help="Si la extensión no lo indica")
+    parser.add_argument("--chunk", type=int, default=IMPORT_CHUNK_SIZE, help="Filas por transacción")
+    parser.add_argument("--rejects", help="CSV para las filas rechazadas (por defecto <archivo>.rechazados.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para hashear contraseñas")
+    parser.add_argument("--hash-method", default=None, help="Método de werkzeug (por defecto el de create_user.py)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo validar, sin escribir en la base")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"❌ Error: No existe el archivo {args.path}")
+        sys.exit(1)
+    try:
+        stats = import_file(args.kind, args.path, chunk_size=max(1, args.chunk), file_format=args.format,
+                            rejects_path=args.rejects, workers=args.workers, hash_method=args.hash_method,
+                            dry_run=args.dry_run)
+    except (ValueError, OSError) as e:
+        print(f"❌ Error al leer {args.path}: {e}")
+        sys.exit(1)
+
+    rate = stats["read"] / stats["seconds"] if stats["seconds"] else 0
+    verb = "válidas" if args.dry_run else "importadas"
+    print(f"✅ {stats['read']:,} filas leídas en {stats['seconds']:.1f} s ({rate:,.0f} filas/s)")
+    print(f"   {stats['imported']:,} {verb}, {stats['existing']:,} ya existían, {stats['rejected']:,} rechazadas")
+    if stats["rejects_path"]:
+        print(f"⚠️ Filas rechazadas y el motivo en: {stats['rejects_path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Trabajos en segundo plano para tiradas grandes de QR.
+
+La app registra el trabajo en la tabla `jobs` y lanza este mismo script
+como un proceso local independiente, que genera el archivo y va
+reportando su avance. Uso manual:
+    python jobs.py run <job_id>     # Ejecuta un trabajo (lo usa la app)
+    python jobs.py cleanup          # Borra artefactos vencidos
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import create_job, get_job, update_job, fail_stale_jobs, expire_finished_jobs
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+JOBS_DIR = os.environ.get("QR_JOBS_DIR", os.path.join(BASE_DIR, "job_artifacts"))
+JOBS_MAX_QUANTITY = int(os.environ.get("QR_JOBS_MAX", "50000"))
+JOBS_MAX_PER_USER = int(os.environ.get("QR_JOBS_MAX_PER_USER", "1"))
+# Trabajos activos en todo el servidor: corren en la misma máquina que la web
+JOBS_MAX_ACTIVE = int(os.environ.get("QR_JOBS_MAX_ACTIVE", "2"))
+# Procesos de dibujo por trabajo y prioridad del proceso (nice): que una
+# tirada grande no le quite CPU a los workers web
+JOBS_WORKERS = int(os.environ.get("QR_JOBS_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+JOBS_NICE = int(os.environ.get("QR_JOBS_NICE", "10"))
+JOBS_RETENTION_HOURS = float(os.environ.get("QR_JOBS_RETENTION_HOURS", "24"))
+# Un trabajo activo que no reporta avance en este tiempo se da por muerto
+JOBS_STALE_SECONDS = int(os.environ.get("QR_JOBS_STALE_SECONDS", "600"))
+PROGRESS_INTERVAL = 1.0
+
+ARTIFACTS = {
+    "zip": ("application/zip", "zip", "QR_vacios_{quantity}_unidades.zip"),
+    "pdf": ("application/pdf", "pdf", "QR_vacios_{quantity}_unidades.pdf"),
+    "svg": ("application/zip", "zip", "QR_vacios_{quantity}_unidades_hojas_svg.zip"),
+}
+
+
+class JobLimitError(Exception):
+    """El usuario o el servidor ya tienen el máximo de trabajos activos."""
+
+
+# Procesos lanzados por este worker web; se recogen con poll() para no dejar zombis
+_children = []
+
+
+def _reap_children():
+    _children[:] = [child for child in _children if child.poll() is None]
+
+
+def submit_qr_job(owner_email, quantity, output, base_url, page_size="A4", columns=4, rows=5):
+    """Registra un trabajo de generación masiva y lanza el proceso que lo ejecuta."""
+    cleanup_jobs()
+    _reap_children()
+    job_id = uuid.uuid4().hex
+    params = json.dumps({
+        "quantity": quantity,
+        "output": output,
+        "base_url": base_url,
+        "page_size": page_size,
+        "columns": columns,
+        "rows": rows,
+    })
+    limit = create_job(job_id, owner_email, "qr_bulk", params, quantity, JOBS_MAX_PER_USER, JOBS_MAX_ACTIVE)
+    if limit == "owner":
+        raise JobLimitError(f"Ya tienes {JOBS_MAX_PER_USER} trabajo(s) en curso. Espera a que termine.")
+    if limit:
+        raise JobLimitError("El servidor está procesando otras tiradas grandes. Intenta de nuevo en unos minutos.")
+    _children.append(subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "run", job_id],
+        start_new_session=True
+    ))
+    return job_id
+
+
+def job_status(job):
+    """Resumen público de un trabajo para el endpoint de estado."""
+    return {
+        "id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "total": job["total"],
+        "error": job["error"],
+        "download_url": f"/jobs/{job['id']}/download" if job["status"] == "done" else None,
+    }
+
+
+def artifact_info(job):
+    """(mimetype, nombre de descarga) del archivo generado por un trabajo."""
+    params = json.loads(job["params"])
+    mimetype, _, filename = ARTIFACTS[params["output"]]
+    return mimetype, filename.format(quantity=params["quantity"])
+
+
+def cleanup_jobs():
+    """Marca trabajos colgados como fallidos y borra los artefactos vencidos."""
+    fail_stale_jobs(JOBS_STALE_SECONDS)
+    removed = 0
+    for job in expire_finished_jobs(JOBS_RETENTION_HOURS * 3600):
+        if job["artifact_path"]:
+            try:
+                os.remove(job["artifact_path"])
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def run_job(job_id):
+    """Ejecuta un trabajo de generación masiva (en el proceso de trabajo)."""
+    # Importación diferida: solo el proceso de trabajo necesita el motor de dibujo
+    from qr_bulk import create_placeholder_pets, stream_tags_zip
+    from qr_sheets import stream_tags_pdf, stream_tags_svg_zip
+
+    job = get_job(job_id)
+    if not job or job["status"] != "queued":
+        print(f"⚠️ Trabajo {job_id} inexistente o ya procesado.")
+        return
+    params = json.loads(job["params"])
+    # Antes de crear el pool de dibujo: sus procesos heredan la prioridad
+    os.nice(JOBS_NICE)
+    update_job(job_id, status="running")
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    path = os.path.join(JOBS_DIR, f"{job_id}.{ARTIFACTS[params['output']][1]}")
+    tmp_path = f"{path}.tmp"
+    last_report = [0.0]
+
+    def report(done):
+        now = time.monotonic()
+        if now - last_report[0] >= PROGRESS_INTERVAL or done == params["quantity"]:
+            last_report[0] = now
+            update_job(job_id, progress=done)
+
+    try:
+        pet_ids = create_placeholder_pets(params["quantity"])
+        if params["output"] == "pdf":
+            stream = stream_tags_pdf(pet_ids, params["base_url"], params["page_size"],
+                                     params["columns"], params["rows"], progress=report, workers=JOBS_WORKERS)
+        elif params["output"] == "svg":
+            stream = stream_tags_svg_zip(pet_ids, params["base_url"], params["page_size"],
+                                         params["columns"], params["rows"], progress=report, workers=JOBS_WORKERS)
+        else:
+            stream = stream_tags_zip(pet_ids, params["base_url"], progress=report, workers=JOBS_WORKERS)
+        with open(tmp_path, "wb") as f:
+            for chunk in stream:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        update_job(job_id, status="done", progress=params["quantity"], artifact_path=path)
+        print(f"✅ Trabajo {job_id} terminado: {path}")
+    except Exception as e:
+        print(f"❌ Error en trabajo {job_id}: {repr(e)}")
+        update_job(job_id, status="failed", error="Error al generar los QR.")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trabajos en segundo plano de Pet Rescue QR.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Ejecuta un trabajo")
+    run_parser.add_argument("job_id")
+    subparsers.add_parser("cleanup", help="Borra artefactos vencidos y marca trabajos colgados")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        run_job(args.job_id)
+    else:
+        removed = cleanup_jobs()
+        print(f"✅ Limpieza completa: {removed} artefacto(s) eliminados.")
+
+
+if __name__ == "__main__":
+    main()
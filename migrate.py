@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Migraciones versionadas del esquema de Pet Rescue QR.
+
+Cada archivo migrations/<motor>/NNNN_nombre.sql se aplica una sola vez, en
+orden, dentro de una transacción, y queda registrado en la tabla
+schema_version. Uso:
+    python migrate.py            # Aplica las migraciones pendientes
+    python migrate.py status     # Muestra la versión actual y las pendientes
+"""
+
+import os
+import re
+import sys
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import IS_PRODUCTION, get_db_connection
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations", "postgres" if IS_PRODUCTION else "sqlite")
+MIGRATION_FILE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+# En producción las migraciones se aplican antes del despliegue (render.yaml);
+# en desarrollo se aplican solas al arrancar.
+AUTO_MIGRATE = os.environ.get("DB_AUTO_MIGRATE", "0" if IS_PRODUCTION else "1") == "1"
+# Clave del advisory lock de PostgreSQL que serializa migraciones concurrentes
+MIGRATION_LOCK_ID = 724011
+
+
+class SchemaOutdatedError(RuntimeError):
+    """La base de datos tiene migraciones pendientes y no se aplican solas."""
+
+
+def available_migrations():
+    """Lista ordenada de (versión, nombre, ruta) de los archivos de migración."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    migrations.sort()
+    return migrations
+
+
+def latest_version():
+    migrations = available_migrations()
+    return migrations[-1][0] if migrations else 0
+
+
+def current_version():
+    """Versión aplicada en la base de datos (0 si nunca se migró). Una sola consulta."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MAX(version) AS version FROM schema_version")
+        row = cur.fetchone()
+        return row["version"] or 0
+    except Exception:
+        # La tabla aún no existe; el pool deshace la transacción fallida al devolver la conexión
+        return 0
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _ensure_version_table(conn, cur):
+    timestamp_type = "TIMESTAMP" if IS_PRODUCTION else "DATETIME"
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at {timestamp_type} DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def _applied_version(cur):
+    cur.execute("SELECT MAX(version) AS version FROM schema_version")
+    return cur.fetchone()["version"] or 0
+
+
+def apply_migrations():
+    """Aplica las migraciones pendientes. Devuelve la lista de versiones aplicadas."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    applied = []
+    try:
+        _ensure_version_table(conn, cur)
+        if IS_PRODUCTION:
+            # Varias instancias pueden arrancar a la vez: solo una migra
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            version = _applied_version(cur)
+            for number, name, path in available_migrations():
+                if number <= version:
+                    continue
+                with open(path, encoding="utf-8") as f:
+                    sql = f.read()
+                print(f"🔧 Aplicando migración {number:04d}_{name}...")
+                try:
+                    if IS_PRODUCTION:
+                        cur.execute(sql)
+                        cur.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)", (number, name))
+                        conn.commit()
+                    else:
+                        # executescript confirma lo pendiente antes de empezar, así que la
+                        # transacción se abre dentro del propio script
+                        conn.executescript(
+                            f"BEGIN IMMEDIATE;\n{sql}\n"
+                            f"INSERT INTO schema_version (version, name) VALUES ({number}, '{name}');\n"
+                            "COMMIT;"
+                        )
+                except Exception:
+                    conn.rollback()
+                    raise
+                applied.append(number)
+        finally:
+            if IS_PRODUCTION:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+    return applied
+
+
+def ensure_schema():
+    """Comprobación de arranque: una consulta si el esquema está al día.
+
+    Si hay migraciones pendientes las aplica (DB_AUTO_MIGRATE=1) o se niega
+    a arrancar con un esquema desactualizado.
+    """
+    version = current_version()
+    latest = latest_version()
+    if version >= latest:
+        return version
+    if not AUTO_MIGRATE:
+        raise SchemaOutdatedError(
+            f"Esquema en versión {version}, se requiere {latest}. Ejecuta: python migrate.py"
+        )
+    apply_migrations()
+    return latest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de Pet Rescue QR.")
+    parser.add_argument("command", nargs="?", choices=["up", "status"], default="up",
+                        help="up: aplica las pendientes (por defecto); status: solo informa")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        version = current_version()
+        pending = [m for m in available_migrations() if m[0] > version]
+        print(f"📋 Versión actual: {version} (última disponible: {latest_version()})")
+        for number, name, _ in pending:
+            print(f"   Pendiente: {number:04d}_{name}")
+        return
+
+    try:
+        applied = apply_migrations()
+    except Exception as e:
+        print(f"❌ Error al migrar: {e}")
+        sys.exit(1)
+    if applied:
+        print(f"✅ {len(applied)} migración(es) aplicada(s). Versión actual: {applied[-1]}")
+    else:
+        print("✅ El esquema ya está al día.")
+
+
+if __name__ == "__main__":
+    main()
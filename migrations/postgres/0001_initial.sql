@@ -0,0 +1,54 @@
+-- Esquema base: mascotas, usuarios y vacunas/desparasitaciones.
+-- Usa IF NOT EXISTS para adoptar bases creadas por el antiguo init_db().
+
+CREATE TABLE IF NOT EXISTS pets (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    breed TEXT,
+    description TEXT,
+    owner_name TEXT,
+    owner_email TEXT NOT NULL,
+    owner_phone TEXT,
+    photo_url TEXT,
+    city TEXT,
+    address TEXT,
+    found BOOLEAN DEFAULT FALSE,
+    is_registered BOOLEAN DEFAULT FALSE,
+    registration_password TEXT
+);
+
+-- Columnas que init_db() agregaba en caliente a bases anteriores
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS owner_name TEXT;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS owner_phone TEXT;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS photo_url TEXT;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS city TEXT;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS address TEXT;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS found BOOLEAN DEFAULT FALSE;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS is_registered BOOLEAN DEFAULT FALSE;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS registration_password TEXT;
+
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    is_admin BOOLEAN DEFAULT FALSE,
+    is_active BOOLEAN DEFAULT TRUE,
+    session_token TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS session_token TEXT;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS is_active BOOLEAN DEFAULT TRUE;
+
+CREATE TABLE IF NOT EXISTS vaccines (
+    id SERIAL PRIMARY KEY,
+    pet_id TEXT NOT NULL,
+    vaccine_name TEXT NOT NULL,
+    date_administered DATE NOT NULL,
+    next_due_date DATE,
+    veterinarian TEXT,
+    notes TEXT,
+    type TEXT DEFAULT 'vaccine'
+);
+
+ALTER TABLE vaccines ADD COLUMN IF NOT EXISTS type TEXT DEFAULT 'vaccine';
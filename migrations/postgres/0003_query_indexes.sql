@@ -0,0 +1,12 @@
+-- Índices para los accesos reales (ver benchmarks/check_query_plans.py).
+
+-- Mascotas de un dueño: my-pets, my-pets-qr, qr-login
+CREATE INDEX IF NOT EXISTS idx_pets_owner_email ON pets (owner_email);
+
+-- Historial de una mascota por tipo, ordenado por fecha: ficha pública, vacunas, desparasitaciones
+CREATE INDEX IF NOT EXISTS idx_vaccines_pet_type_date ON vaccines (pet_id, type, date_administered);
+
+-- Trabajos: límite por usuario y limpieza de colgados / vencidos
+CREATE INDEX IF NOT EXISTS idx_jobs_owner_status ON jobs (owner_email, status);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_finished ON jobs (status, finished_at);
@@ -0,0 +1,35 @@
+-- Versión de cada mascota para ETag / Last-Modified en las páginas públicas.
+-- Sube con cualquier cambio en la mascota o en sus vacunas/desparasitaciones.
+
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION pets_bump_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    NEW.updated_at := CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS pets_bump_version ON pets;
+-- Solo si la sentencia no cambió la versión por su cuenta
+CREATE TRIGGER pets_bump_version BEFORE UPDATE ON pets
+FOR EACH ROW WHEN (NEW.version = OLD.version)
+EXECUTE FUNCTION pets_bump_version();
+
+CREATE OR REPLACE FUNCTION vaccines_bump_pet() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE pets SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = OLD.pet_id;
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.pet_id IS DISTINCT FROM OLD.pet_id) THEN
+        UPDATE pets SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.pet_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS vaccines_bump_pet ON vaccines;
+CREATE TRIGGER vaccines_bump_pet AFTER INSERT OR UPDATE OR DELETE ON vaccines
+FOR EACH ROW EXECUTE FUNCTION vaccines_bump_pet();
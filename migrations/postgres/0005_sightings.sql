@@ -0,0 +1,11 @@
+-- Avistamientos reportados desde la página pública (/report).
+
+CREATE TABLE IF NOT EXISTS sightings (
+    id BIGSERIAL PRIMARY KEY,
+    pet_id TEXT NOT NULL,
+    lat DOUBLE PRECISION NOT NULL,
+    lng DOUBLE PRECISION NOT NULL,
+    reported_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_sightings_pet_reported ON sightings (pet_id, reported_at);
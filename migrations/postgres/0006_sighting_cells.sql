@@ -0,0 +1,9 @@
+-- Celda de grilla de cada avistamiento para búsquedas por cercanía (ver geo.py).
+-- cell = fila * 36000 + columna, con celdas de 0.01°.
+
+ALTER TABLE sightings ADD COLUMN IF NOT EXISTS cell INTEGER;
+UPDATE sightings SET cell = FLOOR((lat + 90) * 100)::INTEGER * 36000 + FLOOR((lng + 180) * 100)::INTEGER
+WHERE cell IS NULL;
+
+-- lat/lng en el índice: el filtro fino del rectángulo se resuelve sin leer la tabla
+CREATE INDEX IF NOT EXISTS idx_sightings_cell ON sightings (cell, lat, lng);
@@ -0,0 +1,31 @@
+-- Búsqueda de texto en mascotas (ver search.py). Los índices son de
+-- expresión sobre las columnas de pets, así que PostgreSQL los mantiene al
+-- día en cada alta, edición y borrado sin columnas ni triggers extra.
+
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- unaccent() es STABLE (depende del diccionario); fijarlo lo hace usable en índices
+CREATE OR REPLACE FUNCTION pets_search_unaccent(value TEXT) RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, lower(value))
+$$;
+
+-- Documento de búsqueda con pesos: A id y nombre, B raza y ciudad, C dueño, D descripción.
+-- El correo se parte en palabras para que "juan gmail" lo encuentre, igual que en SQLite.
+CREATE OR REPLACE FUNCTION pets_search_document(
+    pet_id TEXT, name TEXT, breed TEXT, description TEXT, city TEXT, owner_name TEXT, owner_email TEXT
+) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT setweight(to_tsvector('simple'::regconfig, coalesce(pets_search_unaccent(concat_ws(' ', pet_id, name)), '')), 'A')
+        || setweight(to_tsvector('simple'::regconfig, coalesce(pets_search_unaccent(concat_ws(' ', breed, city)), '')), 'B')
+        || setweight(to_tsvector('simple'::regconfig, coalesce(pets_search_unaccent(
+               concat_ws(' ', owner_name, translate(owner_email, '@.', '  '))), '')), 'C')
+        || setweight(to_tsvector('simple'::regconfig, coalesce(pets_search_unaccent(description), '')), 'D')
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_pets_search ON pets
+USING GIN (pets_search_document(id, name, breed, description, city, owner_name, owner_email));
+
+-- Nombres mal escritos ("firulais" / "firulai"): similitud por trigramas
+CREATE INDEX IF NOT EXISTS idx_pets_name_trgm ON pets USING GIN (pets_search_unaccent(name) gin_trgm_ops);
@@ -0,0 +1,3 @@
+-- Versiones redimensionadas de la foto (ver photo_variants.py), como JSON:
+-- {"thumb": {"url": ..., "width": ..., "height": ...}, "card": {...}, "hero": {...}}
+ALTER TABLE pets ADD COLUMN IF NOT EXISTS photo_variants TEXT;
@@ -0,0 +1,39 @@
+-- Esquema base: mascotas, usuarios y vacunas/desparasitaciones.
+-- Usa IF NOT EXISTS para adoptar bases creadas por el antiguo init_db().
+
+CREATE TABLE IF NOT EXISTS pets (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    breed TEXT,
+    description TEXT,
+    owner_name TEXT,
+    owner_email TEXT NOT NULL,
+    owner_phone TEXT,
+    photo_url TEXT,
+    city TEXT,
+    address TEXT,
+    found BOOLEAN DEFAULT 0,
+    is_registered BOOLEAN DEFAULT 0,
+    registration_password TEXT
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL,
+    is_admin BOOLEAN DEFAULT 0,
+    is_active BOOLEAN DEFAULT 1,
+    session_token TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS vaccines (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pet_id TEXT NOT NULL,
+    vaccine_name TEXT NOT NULL,
+    date_administered TEXT NOT NULL,
+    next_due_date TEXT,
+    veterinarian TEXT,
+    notes TEXT,
+    type TEXT DEFAULT 'vaccine'
+);
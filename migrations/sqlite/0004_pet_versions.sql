@@ -0,0 +1,35 @@
+-- Versión de cada mascota para ETag / Last-Modified en las páginas públicas.
+-- Sube con cualquier cambio en la mascota o en sus vacunas/desparasitaciones.
+
+ALTER TABLE pets ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+-- SQLite no admite un DEFAULT no constante al agregar columnas
+ALTER TABLE pets ADD COLUMN updated_at DATETIME;
+UPDATE pets SET updated_at = CURRENT_TIMESTAMP;
+
+CREATE TRIGGER IF NOT EXISTS pets_set_updated_at AFTER INSERT ON pets
+WHEN NEW.updated_at IS NULL
+BEGIN
+    UPDATE pets SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
+
+-- Solo si la sentencia no cambió la versión por su cuenta (evita bucles)
+CREATE TRIGGER IF NOT EXISTS pets_bump_version AFTER UPDATE ON pets
+WHEN NEW.version = OLD.version AND OLD.updated_at IS NOT NULL
+BEGIN
+    UPDATE pets SET version = OLD.version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS vaccines_bump_pet_insert AFTER INSERT ON vaccines
+BEGIN
+    UPDATE pets SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = NEW.pet_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS vaccines_bump_pet_update AFTER UPDATE ON vaccines
+BEGIN
+    UPDATE pets SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id IN (OLD.pet_id, NEW.pet_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS vaccines_bump_pet_delete AFTER DELETE ON vaccines
+BEGIN
+    UPDATE pets SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = OLD.pet_id;
+END;
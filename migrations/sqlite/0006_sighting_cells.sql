@@ -0,0 +1,9 @@
+-- Celda de grilla de cada avistamiento para búsquedas por cercanía (ver geo.py).
+-- cell = fila * 36000 + columna, con celdas de 0.01°. Los operandos son
+-- positivos, así que CAST equivale a floor().
+
+ALTER TABLE sightings ADD COLUMN cell INTEGER;
+UPDATE sightings SET cell = CAST((lat + 90) * 100 AS INTEGER) * 36000 + CAST((lng + 180) * 100 AS INTEGER);
+
+-- lat/lng en el índice: el filtro fino del rectángulo se resuelve sin leer la tabla
+CREATE INDEX IF NOT EXISTS idx_sightings_cell ON sightings (cell, lat, lng);
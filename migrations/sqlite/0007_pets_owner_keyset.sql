@@ -0,0 +1,5 @@
+-- Listados paginados de "mis mascotas": filtro por dueño y orden por id en el
+-- mismo índice, así cada página es un rango del índice sin ordenar en memoria.
+-- Reemplaza a idx_pets_owner_email, que es un prefijo de este.
+CREATE INDEX IF NOT EXISTS idx_pets_owner_id ON pets (owner_email, id);
+DROP INDEX IF EXISTS idx_pets_owner_email;
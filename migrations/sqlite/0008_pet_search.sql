@@ -0,0 +1,34 @@
+-- Búsqueda de texto en mascotas (ver search.py): índice FTS5 sobre la propia
+-- tabla pets (external content), sin duplicar el texto. Los triggers lo
+-- mantienen al día en cada alta, edición y borrado.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS pets_fts USING fts5(
+    id, name, breed, description, city, owner_name, owner_email,
+    content='pets', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS pets_fts_insert AFTER INSERT ON pets
+BEGIN
+    INSERT INTO pets_fts (rowid, id, name, breed, description, city, owner_name, owner_email)
+    VALUES (NEW.rowid, NEW.id, NEW.name, NEW.breed, NEW.description, NEW.city, NEW.owner_name, NEW.owner_email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS pets_fts_delete AFTER DELETE ON pets
+BEGIN
+    INSERT INTO pets_fts (pets_fts, rowid, id, name, breed, description, city, owner_name, owner_email)
+    VALUES ('delete', OLD.rowid, OLD.id, OLD.name, OLD.breed, OLD.description, OLD.city, OLD.owner_name, OLD.owner_email);
+END;
+
+-- Solo si cambia una columna indexada (no al subir version ni al marcar found)
+CREATE TRIGGER IF NOT EXISTS pets_fts_update
+AFTER UPDATE OF id, name, breed, description, city, owner_name, owner_email ON pets
+BEGIN
+    INSERT INTO pets_fts (pets_fts, rowid, id, name, breed, description, city, owner_name, owner_email)
+    VALUES ('delete', OLD.rowid, OLD.id, OLD.name, OLD.breed, OLD.description, OLD.city, OLD.owner_name, OLD.owner_email);
+    INSERT INTO pets_fts (rowid, id, name, breed, description, city, owner_name, owner_email)
+    VALUES (NEW.rowid, NEW.id, NEW.name, NEW.breed, NEW.description, NEW.city, NEW.owner_name, NEW.owner_email);
+END;
+
+INSERT INTO pets_fts (pets_fts) VALUES ('rebuild');
@@ -0,0 +1,22 @@
+-- Subidas de fotos en segundo plano (ver uploads.py): el formulario guarda
+-- el archivo en disco y un hilo lo sube al almacenamiento con reintentos.
+
+CREATE TABLE IF NOT EXISTS photo_uploads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pet_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    spool_path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    url TEXT,
+    error TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Siguiente subida lista, subidas colgadas y limpieza de terminadas
+CREATE INDEX IF NOT EXISTS idx_photo_uploads_status_next ON photo_uploads (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_photo_uploads_status_updated ON photo_uploads (status, updated_at);
+-- Subidas de una mascota: reemplazar pendientes y no pisar una foto más nueva
+CREATE INDEX IF NOT EXISTS idx_photo_uploads_pet ON photo_uploads (pet_id, id);
@@ -0,0 +1,10 @@
+-- El archivo de una subida pendiente está en el disco local de la instancia
+-- que atendió el formulario (PHOTO_SPOOL_DIR): solo esa instancia puede
+-- procesarla. spool_host la identifica y cada worker toma solo las suyas.
+-- Las filas anteriores quedan con NULL y las da por perdidas la limpieza
+-- de subidas abandonadas (ver uploads.py).
+ALTER TABLE photo_uploads ADD COLUMN spool_host TEXT;
+
+-- Reemplaza a idx_photo_uploads_status_next, que ahora se filtra por instancia
+CREATE INDEX IF NOT EXISTS idx_photo_uploads_host_status_next ON photo_uploads (spool_host, status, next_attempt_at);
+DROP INDEX IF EXISTS idx_photo_uploads_status_next;
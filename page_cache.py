@@ -0,0 +1,100 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# HTML ya renderizado de las páginas públicas de cada mascota (ficha, vacunas,
+# desparasitaciones, QR). Cada página se guarda junto a la versión de la
+# mascota con la que se renderizó y solo se sirve si esa versión sigue
+# siendo la actual, así que los cambios hechos desde otro worker también se
+# ven enseguida. invalidate_pet() libera la memoria antes de que venza el
+# TTL. PAGE_CACHE_TTL=0 la desactiva.
+PAGE_CACHE_TTL = float(os.environ.get("PAGE_CACHE_TTL", "300"))
+PAGE_CACHE_MAX_PETS = int(os.environ.get("PAGE_CACHE_MAX_PETS", "2000"))
+
+
+class PageCache:
+    """LRU por mascota: cada entrada guarda las páginas renderizadas de esa mascota."""
+
+    def __init__(self, ttl=300.0, max_pets=2000):
+        self.ttl = ttl
+        self.max_pets = max_pets
+        self._pets = OrderedDict()  # pet_id -> {ruta: (vence, versión, html)}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, pet_id, route, version):
+        """Devuelve (html o None, generación). La generación se pasa luego a put()."""
+        now = time.monotonic()
+        with self._lock:
+            pages = self._pets.get(pet_id)
+            entry = pages.get(route) if pages else None
+            if entry and entry[0] > now and entry[1] == version:
+                self._pets.move_to_end(pet_id)
+                self.hits += 1
+                return entry[2], self._generation
+            self.misses += 1
+            return None, self._generation
+
+    def put(self, pet_id, route, version, html, generation):
+        with self._lock:
+            # Si hubo una invalidación mientras se renderizaba, no guardar la versión vieja
+            if generation != self._generation:
+                return
+            pages = self._pets.setdefault(pet_id, {})
+            pages[route] = (time.monotonic() + self.ttl, version, html)
+            self._pets.move_to_end(pet_id)
+            while len(self._pets) > self.max_pets:
+                self._pets.popitem(last=False)
+
+    def invalidate(self, pet_id):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            self._pets.pop(pet_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "ttl": self.ttl,
+                "pets": len(self._pets),
+                "pages": sum(len(pages) for pages in self._pets.values()),
+                "max_pets": self.max_pets,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = PageCache(ttl=PAGE_CACHE_TTL, max_pets=PAGE_CACHE_MAX_PETS)
+
+
+def get_cached_page(pet_id, route, version):
+    return _cache.get(pet_id, route, version)
+
+
+def store_page(pet_id, route, version, html, generation):
+    _cache.put(pet_id, route, version, html, generation)
+
+
+def invalidate_pet(pet_id):
+    """Descarta las páginas cacheadas de una mascota tras modificarla."""
+    _cache.invalidate(pet_id)
+
+
+def page_cache_enabled():
+    return _cache.enabled
+
+
+def get_page_cache_stats():
+    return _cache.stats()
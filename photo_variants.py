@@ -0,0 +1,93 @@
+import os
+import uuid
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from pillow_heif import register_heif_opener
+
+# Las fotos de iPhone llegan en HEIC, que Pillow no abre por sí solo
+register_heif_opener()
+
+# Tamaños que se generan de cada foto al subirla (ver uploads.py). La foto se
+# decodifica una sola vez; todas las versiones salen de esos mismos píxeles y
+# se guardan sin metadatos (EXIF con ubicación GPS, modelo de cámara, etc.).
+#   thumb: miniatura cuadrada (tabla del panel, 40 px en pantallas 2x-4x)
+#   card:  tarjetas de "mis mascotas" y formularios de edición
+#   hero:  cabecera de la ficha pública
+# "full" reemplaza al original: mismo tamaño hasta PHOTO_FULL_MAX px, en JPEG
+# para que sirva en cualquier lugar (vista ampliada, redes sociales, correos).
+PHOTO_VARIANTS = {
+    "thumb": {"size": (160, 160), "crop": True},
+    "card": {"size": (480, 480), "crop": False},
+    "hero": {"size": (1200, 1200), "crop": False},
+}
+PHOTO_FULL_MAX = int(os.environ.get("PHOTO_FULL_MAX", "2048"))
+PHOTO_WEBP_QUALITY = int(os.environ.get("PHOTO_WEBP_QUALITY", "78"))
+PHOTO_JPEG_QUALITY = int(os.environ.get("PHOTO_JPEG_QUALITY", "85"))
+# Fotos de más de ~40 MP se rechazan en vez de intentar decodificarlas
+PHOTO_MAX_PIXELS = int(os.environ.get("PHOTO_MAX_PIXELS", "40000000"))
+
+
+class InvalidPhoto(Exception):
+    """El archivo no es una imagen que se pueda procesar."""
+
+
+def _open(path):
+    try:
+        image = Image.open(path)
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise InvalidPhoto(str(e)) from e
+    if image.width * image.height > PHOTO_MAX_PIXELS:
+        raise InvalidPhoto(f"Imagen demasiado grande: {image.width}x{image.height}")
+    # En JPEG el decodificador puede reducir 2x/4x/8x al leer: mucho más rápido
+    # que decodificar a tamaño completo y achicar después
+    image.draft("RGB", (PHOTO_FULL_MAX, PHOTO_FULL_MAX))
+    try:
+        image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidPhoto(str(e)) from e
+    # Aplicar la rotación de la cámara antes de descartar el EXIF que la indica
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+    return image
+
+
+def _flatten(image):
+    """JPEG no tiene transparencia: se pone sobre fondo blanco."""
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def make_variants(path, out_dir):
+    """Genera las versiones de una foto en `out_dir`.
+
+    Devuelve {nombre: {"path", "width", "height"}} con "full" (JPEG) y cada
+    entrada de PHOTO_VARIANTS (WebP). Lanza InvalidPhoto si no es una imagen.
+    """
+    image = _open(path)
+    os.makedirs(out_dir, exist_ok=True)
+    stem = uuid.uuid4().hex
+    results = {}
+
+    full = image.copy()
+    full.thumbnail((PHOTO_FULL_MAX, PHOTO_FULL_MAX), Image.Resampling.LANCZOS)
+    full_path = os.path.join(out_dir, f"{stem}_full.jpg")
+    _flatten(full).save(full_path, "JPEG", quality=PHOTO_JPEG_QUALITY, optimize=True, progressive=True)
+    results["full"] = {"path": full_path, "width": full.width, "height": full.height}
+
+    # De la más grande a la más chica, achicando cada una desde la anterior
+    source = full
+    for name, spec in sorted(PHOTO_VARIANTS.items(), key=lambda item: -item[1]["size"][0]):
+        if spec["crop"]:
+            variant = ImageOps.fit(source, spec["size"], Image.Resampling.LANCZOS)
+        else:
+            variant = source.copy()
+            variant.thumbnail(spec["size"], Image.Resampling.LANCZOS)
+            source = variant
+        variant_path = os.path.join(out_dir, f"{stem}_{name}.webp")
+        variant.save(variant_path, "WEBP", quality=PHOTO_WEBP_QUALITY, method=4)
+        results[name] = {"path": variant_path, "width": variant.width, "height": variant.height}
+    return results
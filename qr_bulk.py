@@ -0,0 +1,156 @@
+import os
+import uuid
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from database import get_existing_pet_ids, add_placeholder_pets, UNREGISTERED_EMAIL
+from qr_render import make_png, qr_matrix
+from zip_stream import ZipStreamWriter
+
+PLACEHOLDER_EMAIL = UNREGISTERED_EMAIL
+BULK_MAX = int(os.environ.get("QR_BULK_MAX", "10000"))
+# Procesos de dibujo por worker web; quedan vivos entre peticiones, así que
+# pocos. Los trabajos en segundo plano usan su propio límite (QR_JOBS_WORKERS)
+BULK_WORKERS = int(os.environ.get("QR_BULK_WORKERS", "2"))
+# Por debajo de este tamaño no compensa repartir el trabajo entre procesos
+BULK_INLINE_MAX = int(os.environ.get("QR_BULK_INLINE_MAX", "100"))
+RENDER_CHUNK = 100
+# Tamaño mínimo de cada bloque enviado al cliente al transmitir el ZIP
+STREAM_CHUNK = 64 * 1024
+
+_executor = None
+_executor_pid = None
+_executor_workers = None
+
+
+def _get_executor(workers):
+    global _executor, _executor_pid, _executor_workers
+    if _executor is None or _executor_pid != os.getpid() or _executor_workers != workers:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False)
+        # forkserver y no fork: los workers de gunicorn tienen hilos, y un
+        # fork con un lock tomado por otro hilo deja al hijo bloqueado
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["qr_bulk"])
+        _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        _executor_pid = os.getpid()
+        _executor_workers = workers
+    return _executor
+
+
+def new_pet_id():
+    return str(uuid.uuid4())[:8].upper()
+
+
+def create_placeholder_pets(quantity, owner_email=PLACEHOLDER_EMAIL, attempts=3):
+    """Crea `quantity` mascotas vacías con IDs únicos y devuelve sus IDs."""
+    for attempt in range(attempts):
+        pet_ids = set()
+        while len(pet_ids) < quantity:
+            pet_ids.update(new_pet_id() for _ in range(quantity - len(pet_ids)))
+            pet_ids -= get_existing_pet_ids(pet_ids)
+        pet_ids = sorted(pet_ids)
+        try:
+            add_placeholder_pets(pet_ids, owner_email)
+            return pet_ids
+        except Exception as e:
+            # Otra petición pudo insertar el mismo ID entre la verificación y el COPY
+            if attempt == attempts - 1:
+                raise
+            print(f"⚠️ Reintentando inserción masiva de QR: {e}")
+
+
+def _render_chunk(urls):
+    return [make_png(url) for url in urls]
+
+
+def _matrix_chunk(urls):
+    # Filas como cadenas "0101..." (1 = módulo oscuro): se serializan mucho más rápido que listas de bool
+    return [tuple("".join("1" if module else "0" for module in row) for row in qr_matrix(url, border=0))
+            for url in urls]
+
+
+def _parallel_map(chunk_fn, pet_ids, base_url, progress=None, workers=None):
+    """Aplica `chunk_fn` a las URLs de las etiquetas y genera (pet_id, resultado) en orden.
+
+    Solo se mantienen en vuelo unos pocos bloques a la vez, así que la
+    memoria no crece con la cantidad de etiquetas. Si se indica `progress`,
+    se llama con la cantidad de etiquetas listas tras cada bloque.
+    `workers` limita los procesos de dibujo (por defecto BULK_WORKERS).
+    """
+    workers = workers or BULK_WORKERS
+    done = 0
+    if len(pet_ids) <= BULK_INLINE_MAX or workers <= 1:
+        for start in range(0, len(pet_ids), RENDER_CHUNK):
+            chunk = pet_ids[start:start + RENDER_CHUNK]
+            yield from zip(chunk, chunk_fn([f"{base_url}{pet_id}" for pet_id in chunk]))
+            done += len(chunk)
+            if progress:
+                progress(done)
+        return
+
+    executor = _get_executor(workers)
+    chunks = (pet_ids[start:start + RENDER_CHUNK] for start in range(0, len(pet_ids), RENDER_CHUNK))
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(chunk_fn, [f"{base_url}{pet_id}" for pet_id in chunk])))
+            if len(pending) >= workers * 2:
+                done_chunk, future = pending.popleft()
+                yield from zip(done_chunk, future.result())
+                done += len(done_chunk)
+                if progress:
+                    progress(done)
+        while pending:
+            done_chunk, future = pending.popleft()
+            yield from zip(done_chunk, future.result())
+            done += len(done_chunk)
+            if progress:
+                progress(done)
+    finally:
+        # Si el consumidor abandona (p. ej. el cliente cortó la descarga)
+        for _, future in pending:
+            future.cancel()
+
+
+def render_tag_pngs(pet_ids, base_url, progress=None, workers=None):
+    """Genera (pet_id, png) en orden, repartiendo el dibujo entre procesos."""
+    return _parallel_map(_render_chunk, pet_ids, base_url, progress, workers)
+
+
+def render_tag_matrices(pet_ids, base_url, progress=None, workers=None):
+    """Genera (pet_id, filas) en orden; cada fila es una cadena con "1" en los módulos oscuros."""
+    return _parallel_map(_matrix_chunk, pet_ids, base_url, progress, workers)
+
+
+def stream_tags_zip(pet_ids, base_url, progress=None, workers=None):
+    """Genera un ZIP con un PNG por etiqueta, entregándolo por partes a medida que se dibuja.
+
+    Los PNG ya vienen comprimidos, así que se guardan sin comprimir.
+    El índice IDs_de_QR.txt se va escribiendo en un archivo temporal y se
+    agrega al final, de modo que la memoria no depende de la cantidad.
+    """
+    writer = ZipStreamWriter()
+    pending = []
+    pending_size = 0
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as manifest:
+        for pet_id, png in render_tag_pngs(pet_ids, base_url, progress, workers):
+            filename = f"QR_{pet_id}.png"
+            entry = writer.add_stored(filename, png)
+            manifest.write(f"{pet_id} -> {filename}\n")
+            pending.append(entry)
+            pending_size += len(entry)
+            if pending_size >= STREAM_CHUNK:
+                yield b"".join(pending)
+                pending.clear()
+                pending_size = 0
+        if pending:
+            yield b"".join(pending)
+        manifest.seek(0)
+        yield from writer.add_deflated(
+            "IDs_de_QR.txt",
+            (block.encode("utf-8") for block in iter(lambda: manifest.read(STREAM_CHUNK), ""))
+        )
+    yield from writer.finish()
@@ -0,0 +1,157 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+
+from qr_render import make_png
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Subir este valor cuando cambie la forma de dibujar los QR, para que las
+# imágenes cacheadas (en memoria, disco y navegadores) se regeneren.
+RENDER_VERSION = "2"
+
+MIMETYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+}
+
+
+class QRImageCache:
+    """Caché de dos niveles para imágenes QR: LRU en memoria + archivos en disco.
+
+    El disco también está acotado: cuando los archivos pasan de `max_bytes`
+    se borran los usados hace más tiempo (por fecha de modificación, que se
+    renueva en cada lectura) hasta quedar en el 90 %. Los workers comparten
+    la carpeta; cada uno lleva su propia estimación del total y la corrige
+    al recorrerla para recortar.
+    """
+
+    def __init__(self, max_entries=512, cache_dir=None, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._trim_lock = threading.Lock()
+        self._disk_bytes = 0
+        self.evicted = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._scan())
+
+    def get(self, key, ext):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        if not self.cache_dir:
+            return None
+        path = self._path(key, ext)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def put(self, key, ext, data):
+        self._remember(key, data)
+        if not self.cache_dir:
+            return
+        path = self._path(key, ext)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el QR en disco: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            over = self._disk_bytes > self.max_bytes
+        if over:
+            self._trim()
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _scan(self):
+        """(mtime, ruta, tamaño) de cada archivo de la carpeta."""
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue  # lo borró otro worker
+            yield stat.st_mtime, entry.path, stat.st_size
+
+    def _trim(self):
+        if not self._trim_lock.acquire(blocking=False):
+            return  # ya está recortando otro hilo
+        try:
+            files = sorted(self._scan())
+            total = sum(size for _, _, size in files)
+            target = self.max_bytes * 0.9
+            removed = 0
+            for _, path, size in files:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            with self._lock:
+                self._disk_bytes = total
+                self.evicted += removed
+        finally:
+            self._trim_lock.release()
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, f"{key}.{ext}")
+
+
+_cache = QRImageCache(
+    max_entries=int(os.environ.get("QR_CACHE_SIZE", "512")),
+    cache_dir=os.environ.get("QR_CACHE_DIR", os.path.join(BASE_DIR, "qr_cache")),
+    max_bytes=int(os.environ.get("QR_CACHE_DISK_MB", "64")) * 1024 * 1024
+)
+
+
+def cache_key(data, fmt, box_size, border):
+    """Clave de caché (y ETag) para un contenido y unas opciones de dibujo."""
+    raw = f"{RENDER_VERSION}|{fmt}|{box_size}|{border}|{data}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def render_qr(data, fmt="png", box_size=10, border=4):
+    """Dibuja un QR sin pasar por la caché."""
+    if fmt == "png":
+        return make_png(data, box_size, border)
+    buffered = BytesIO()
+    img = qrcode.make(data, box_size=box_size, border=border, image_factory=qrcode.image.svg.SvgPathImage)
+    img.save(buffered)
+    return buffered.getvalue()
+
+
+def get_qr_image(data, fmt="png", box_size=10, border=4):
+    """Devuelve (bytes, etag) del QR pedido, dibujándolo solo si no está en caché."""
+    key = cache_key(data, fmt, box_size, border)
+    image = _cache.get(key, fmt)
+    if image is None:
+        image = render_qr(data, fmt, box_size, border)
+        _cache.put(key, fmt, image)
+    return image, key[:32]
@@ -0,0 +1,64 @@
+import struct
+import zlib
+
+import qrcode
+from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
+
+ERROR_CORRECTION = {
+    "L": ERROR_CORRECT_L,
+    "M": ERROR_CORRECT_M,
+    "Q": ERROR_CORRECT_Q,
+    "H": ERROR_CORRECT_H,
+}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def qr_matrix(data, error_correction="M", border=4):
+    """Matriz de módulos del QR (lista de filas de bool, True = oscuro), con borde incluido."""
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECTION[error_correction], box_size=1, border=border)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _png_chunk(tag, payload):
+    return (struct.pack(">I", len(payload)) + tag + payload +
+            struct.pack(">I", zlib.crc32(tag + payload) & 0xFFFFFFFF))
+
+
+def render_png(matrix, box_size=10, compress_level=6):
+    """Escribe un PNG de 1 bit directamente a partir de la matriz, sin pasar por PIL.
+
+    Cada módulo se escala repitiendo bits con operaciones sobre cadenas
+    (en C), y cada fila escalada se repite `box_size` veces como bloque de
+    bytes; las filas de módulos idénticas se codifican una sola vez.
+    """
+    size = len(matrix) * box_size
+    dark = "0" * box_size   # 0 = negro en escala de grises de 1 bit
+    light = "1" * box_size
+    padding = "0" * (-size % 8)
+    row_bytes = (size + 7) // 8
+
+    encoded_rows = {}
+    raw = bytearray()
+    for row in matrix:
+        key = tuple(row)
+        block = encoded_rows.get(key)
+        if block is None:
+            bits = "".join([dark if module else light for module in row]) + padding
+            scanline = b"\x00" + int(bits, 2).to_bytes(row_bytes, "big")
+            block = scanline * box_size
+            encoded_rows[key] = block
+        raw += block
+
+    header = struct.pack(">IIBBBBB", size, size, 1, 0, 0, 0, 0)
+    return (PNG_SIGNATURE +
+            _png_chunk(b"IHDR", header) +
+            _png_chunk(b"IDAT", zlib.compress(bytes(raw), compress_level)) +
+            _png_chunk(b"IEND", b""))
+
+
+def make_png(data, box_size=10, border=4, error_correction="M"):
+    """Atajo: contenido -> bytes PNG (equivalente a qrcode.make(data) con PIL)."""
+    return render_png(qr_matrix(data, error_correction, border), box_size)
@@ -0,0 +1,208 @@
+import zlib
+import tempfile
+from xml.sax.saxutils import escape
+
+from qr_bulk import render_tag_matrices
+from zip_stream import ZipStreamWriter
+
+# Tamaños de página en puntos PostScript (1/72")
+PAGE_SIZES = {
+    "A4": (595.28, 841.89),
+    "LETTER": (612.0, 792.0),
+}
+
+MARGIN = 28.0        # ~1 cm
+QUIET_ZONE = 4       # Módulos de margen blanco alrededor de cada QR
+LABEL_FONT_SIZE = 9.0
+
+
+def _fmt(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _dark_runs(row):
+    """Tramos horizontales de módulos oscuros: (columna inicial, largo)."""
+    runs = []
+    start = row.find("1")
+    while start != -1:
+        end = row.find("0", start)
+        if end == -1:
+            end = len(row)
+        runs.append((start, end - start))
+        start = row.find("1", end)
+    return runs
+
+
+def _rectangles(rows):
+    """Rectángulos (x, y, ancho, alto) que cubren los módulos oscuros.
+
+    Los tramos idénticos en filas consecutivas se funden en un solo
+    rectángulo más alto: menos operadores y sin costuras entre filas.
+    """
+    open_runs = {}  # (inicio, largo) -> fila donde empezó
+    for i, row in enumerate(rows):
+        runs = set(_dark_runs(row))
+        for run in [run for run in open_runs if run not in runs]:
+            start, length = run
+            top = open_runs.pop(run)
+            yield start, top, length, i - top
+        for run in runs:
+            open_runs.setdefault(run, i)
+    for (start, length), top in open_runs.items():
+        yield start, top, length, len(rows) - top
+
+
+class SheetLayout:
+    """Geometría de una hoja: grilla de `columns` x `rows` etiquetas con el ID debajo de cada QR."""
+
+    def __init__(self, page_size="A4", columns=4, rows=5):
+        self.width, self.height = PAGE_SIZES[page_size.upper()]
+        self.columns = columns
+        self.rows = rows
+        self.per_page = columns * rows
+        self.cell_width = (self.width - 2 * MARGIN) / columns
+        self.cell_height = (self.height - 2 * MARGIN) / rows
+        self.label_height = LABEL_FONT_SIZE * 1.6
+        # Lado del QR (incluida la zona blanca) dentro de la celda
+        self.qr_side = min(self.cell_width, self.cell_height - self.label_height) * 0.95
+        if self.qr_side <= 0:
+            raise ValueError("La grilla no cabe en la página.")
+
+    def place(self, index, modules):
+        """Para la etiqueta `index` de la página: (x, y_superior, tamaño de módulo, x_centro, y_etiqueta).
+
+        Coordenadas con origen arriba a la izquierda; cada formato las adapta.
+        """
+        row, column = divmod(index, self.columns)
+        cell_x = MARGIN + column * self.cell_width
+        cell_y = MARGIN + row * self.cell_height
+        module = self.qr_side / (modules + 2 * QUIET_ZONE)
+        pad_y = (self.cell_height - self.label_height - self.qr_side) / 2
+        qr_x = cell_x + (self.cell_width - self.qr_side) / 2 + QUIET_ZONE * module
+        qr_y = cell_y + pad_y + QUIET_ZONE * module
+        center_x = cell_x + self.cell_width / 2
+        label_y = qr_y + modules * module + QUIET_ZONE * module * 0.5 + LABEL_FONT_SIZE
+        return qr_x, qr_y, module, center_x, label_y
+
+
+def _paginate(tags, per_page):
+    page = []
+    for tag in tags:
+        page.append(tag)
+        if len(page) == per_page:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+# -------------------------------------------------
+# PDF
+# -------------------------------------------------
+def _pdf_page_content(layout, page):
+    ops = []
+    for index, (pet_id, rows) in enumerate(page):
+        qr_x, qr_y, module, center_x, label_y = layout.place(index, len(rows))
+        # Sistema de coordenadas en unidades de módulo, con el eje y hacia abajo
+        ops.append(f"q {_fmt(module)} 0 0 {_fmt(-module)} {_fmt(qr_x)} {_fmt(layout.height - qr_y)} cm")
+        for x, y, width, height in _rectangles(rows):
+            ops.append(f"{x} {y} {width} {height} re")
+        ops.append("f Q")
+        # Courier: cada carácter mide 0.6 em, así que el centrado es exacto
+        text_x = center_x - len(pet_id) * 0.6 * LABEL_FONT_SIZE / 2
+        label = pet_id.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+        ops.append(f"BT /F1 {_fmt(LABEL_FONT_SIZE)} Tf {_fmt(text_x)} {_fmt(layout.height - label_y)} Td ({label}) Tj ET")
+    return "\n".join(ops).encode("latin-1")
+
+
+def stream_tags_pdf(pet_ids, base_url, page_size="A4", columns=4, rows=5, progress=None, workers=None):
+    """Genera un PDF vectorial de varias páginas con una grilla de QR y el ID de cada uno.
+
+    Se transmite página a página: los offsets de cada objeto se anotan al
+    escribirlo y la tabla xref va al final.
+    """
+    layout = SheetLayout(page_size, columns, rows)
+    offsets = {}
+    position = 0
+
+    def emit(data):
+        nonlocal position
+        position += len(data)
+        return data
+
+    def obj(number, body):
+        offsets[number] = position
+        return emit(f"{number} 0 obj\n".encode("latin-1") + body + b"\nendobj\n")
+
+    # 1 = catálogo, 2 = árbol de páginas (se escribe al final), 3 = fuente
+    yield emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    yield obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold >>")
+
+    next_number = 4
+    kids = []
+    media_box = f"[0 0 {_fmt(layout.width)} {_fmt(layout.height)}]"
+    for page in _paginate(render_tag_matrices(pet_ids, base_url, progress, workers), layout.per_page):
+        content = zlib.compress(_pdf_page_content(layout, page), 6)
+        content_number, page_number = next_number, next_number + 1
+        next_number += 2
+        yield obj(content_number,
+                  f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode("latin-1") +
+                  content + b"\nendstream")
+        yield obj(page_number, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox {media_box} "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_number} 0 R >>"
+        ).encode("latin-1"))
+        kids.append(f"{page_number} 0 R")
+
+    yield obj(2, f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode("latin-1"))
+
+    xref_offset = position
+    lines = [f"xref\n0 {next_number}\n", "0000000000 65535 f \n"]
+    lines.extend(f"{offsets[number]:010d} 00000 n \n" for number in range(1, next_number))
+    lines.append(f"trailer\n<< /Size {next_number} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+    yield "".join(lines).encode("latin-1")
+
+
+# -------------------------------------------------
+# SVG
+# -------------------------------------------------
+def _svg_page(layout, page):
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{_fmt(layout.width)}pt" height="{_fmt(layout.height)}pt" '
+        f'viewBox="0 0 {_fmt(layout.width)} {_fmt(layout.height)}">',
+        '<rect width="100%" height="100%" fill="#fff"/>',
+    ]
+    for index, (pet_id, rows) in enumerate(page):
+        qr_x, qr_y, module, center_x, label_y = layout.place(index, len(rows))
+        path = "".join(f"M{x} {y}h{width}v{height}h-{width}z" for x, y, width, height in _rectangles(rows))
+        parts.append(
+            f'<path transform="translate({_fmt(qr_x)} {_fmt(qr_y)}) scale({_fmt(module)})" '
+            f'shape-rendering="crispEdges" d="{path}"/>'
+        )
+        parts.append(
+            f'<text x="{_fmt(center_x)}" y="{_fmt(label_y)}" font-family="Courier, monospace" '
+            f'font-weight="bold" font-size="{_fmt(LABEL_FONT_SIZE)}" text-anchor="middle">{escape(pet_id)}</text>'
+        )
+    parts.append("</svg>\n")
+    return "\n".join(parts).encode("utf-8")
+
+
+def stream_tags_svg_zip(pet_ids, base_url, page_size="A4", columns=4, rows=5, progress=None, workers=None):
+    """Genera un ZIP con una hoja SVG por página, más el índice IDs_de_QR.txt."""
+    layout = SheetLayout(page_size, columns, rows)
+    writer = ZipStreamWriter()
+    page_number = 0
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as manifest:
+        for page in _paginate(render_tag_matrices(pet_ids, base_url, progress, workers), layout.per_page):
+            page_number += 1
+            filename = f"Hoja_QR_{page_number:04d}.svg"
+            yield from writer.add_deflated(filename, [_svg_page(layout, page)])
+            for pet_id, _ in page:
+                manifest.write(f"{pet_id} -> {filename}\n")
+        manifest.seek(0)
+        yield from writer.add_deflated(
+            "IDs_de_QR.txt",
+            (block.encode("utf-8") for block in iter(lambda: manifest.read(64 * 1024), ""))
+        )
+    yield from writer.finish()
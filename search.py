@@ -0,0 +1,66 @@
+import re
+import unicodedata
+
+from database import Page, search_pets_by_owner, search_pets_index, search_pets_similar
+
+# Búsqueda de mascotas por nombre, raza, descripción, ciudad, dueño, correo
+# e ID. Cada palabra se busca como prefijo ("fir" encuentra "Firulais") y
+# todas deben aparecer. Se apoya en FTS5 (SQLite) o en un índice tsvector
+# (PostgreSQL), mantenidos por la base de datos en cada escritura.
+#
+# Los resultados se ordenan por relevancia, así que se pagina por posición:
+# la base ya tiene que puntuar las coincidencias para saber cuáles van
+# primero, y no hay una clave estable sobre la que avanzar. Con palabras muy
+# comunes solo se puntúan SEARCH_MAX_CANDIDATES coincidencias (las más
+# recientes en SQLite); escribir más palabras acota la búsqueda.
+SEARCH_MAX_TOKENS = 8
+SEARCH_MIN_TOKEN_LENGTH = 2
+SEARCH_MAX_RESULTS = 1000  # hasta dónde se puede paginar (menos que SEARCH_MAX_CANDIDATES)
+SEARCH_MAX_PER_PAGE = 100
+SEARCH_MAX_CANDIDATES = 2000
+SEARCH_SIMILARITY_FALLBACK = True
+
+_TOKEN = re.compile(r"[^\W_]+")
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def normalize_query(text):
+    """Palabras de la búsqueda en minúsculas y sin tildes, como las guarda el índice."""
+    text = unicodedata.normalize("NFKD", text or "").lower()
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = []
+    for token in _TOKEN.findall(text):
+        if len(token) >= SEARCH_MIN_TOKEN_LENGTH and token not in tokens:
+            tokens.append(token)
+    return tokens[:SEARCH_MAX_TOKENS]
+
+
+def search_pets(text, offset=0, per_page=20):
+    """Página de resultados para `text`. Devuelve un Page cuyos cursores son posiciones.
+
+    Si la búsqueda exacta no encuentra nada, en PostgreSQL se prueba con
+    nombres parecidos (errores de tipeo) en la primera página.
+    """
+    tokens = normalize_query(text)
+    offset = max(0, min(int(offset), SEARCH_MAX_RESULTS))
+    per_page = max(1, min(int(per_page), SEARCH_MAX_PER_PAGE))
+    if not tokens:
+        return Page(items=[], per_page=per_page)
+
+    if _EMAIL.match(text.strip()):
+        # Un correo completo se busca tal cual en el índice de dueños: partido en
+        # palabras ("correo", "com") coincidiría con casi todas las filas
+        rows = search_pets_by_owner(text.strip().lower(), per_page + 1, offset)
+    else:
+        rows = search_pets_index(tokens, per_page + 1, offset, max_candidates=SEARCH_MAX_CANDIDATES)
+        if not rows and offset == 0 and SEARCH_SIMILARITY_FALLBACK:
+            rows = search_pets_similar(" ".join(tokens), per_page)
+
+    has_more = len(rows) > per_page and offset + per_page < SEARCH_MAX_RESULTS
+    rows = rows[:per_page]
+    return Page(
+        items=rows,
+        per_page=per_page,
+        next_cursor=offset + per_page if has_more else None,
+        prev_cursor=max(0, offset - per_page) if offset > 0 else None,
+    )
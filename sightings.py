@@ -0,0 +1,182 @@
+import os
+import time
+import atexit
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from database import add_sightings, get_sightings_in_box
+from geo import bounding_box, cell_ranges, haversine_km
+
+# Los reportes de /report se encolan en memoria y un hilo los guarda por
+# lotes: la petición no espera a la base de datos. Un reporte de la misma
+# mascota en la misma celda (~100 m) dentro de la ventana se descarta.
+SIGHTINGS_FLUSH_INTERVAL = float(os.environ.get("SIGHTINGS_FLUSH_INTERVAL", "2"))
+SIGHTINGS_BATCH_SIZE = int(os.environ.get("SIGHTINGS_BATCH_SIZE", "200"))
+SIGHTINGS_MAX_PENDING = int(os.environ.get("SIGHTINGS_MAX_PENDING", "10000"))
+SIGHTINGS_DEDUP_SECONDS = float(os.environ.get("SIGHTINGS_DEDUP_SECONDS", "300"))
+SIGHTINGS_DEDUP_CELL = float(os.environ.get("SIGHTINGS_DEDUP_CELL", "0.001"))  # grados (~111 m de latitud)
+NEARBY_MAX_RADIUS_KM = 50.0
+NEARBY_MAX_LIMIT = 200
+NEARBY_FIRST_RING_KM = 1.0
+NEARBY_MAX_ROWS = int(os.environ.get("NEARBY_MAX_ROWS", "20000"))
+
+
+class SightingBuffer:
+    """Cola de avistamientos con escritura diferida por lotes y deduplicación."""
+
+    def __init__(self, flush_interval=2.0, batch_size=200, max_pending=10000,
+                 dedup_seconds=300.0, dedup_cell=0.001, writer=add_sightings):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.dedup_seconds = dedup_seconds
+        self.dedup_cell = dedup_cell
+        self.writer = writer
+        self._pending = deque()
+        self._recent = {}  # (pet_id, celda) -> momento del último reporte aceptado
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self.accepted = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed_flushes = 0
+
+    def add(self, pet_id, lat, lng):
+        """Encola un avistamiento. Devuelve False si era un duplicado o la cola está llena."""
+        now = time.monotonic()
+        key = (pet_id, round(lat / self.dedup_cell), round(lng / self.dedup_cell))
+        reported_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            self._ensure_thread()
+            last = self._recent.get(key)
+            if last is not None and now - last < self.dedup_seconds:
+                self.deduplicated += 1
+                return False
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            self._recent[key] = now
+            self._pending.append((pet_id, lat, lng, reported_at))
+            self.accepted += 1
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+        return True
+
+    def flush(self):
+        """Guarda todo lo pendiente. Si la base falla, el lote vuelve a la cola."""
+        while True:
+            with self._lock:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            if not batch:
+                return
+            try:
+                self.writer(batch)
+            except Exception as e:
+                print(f"❌ Error al guardar {len(batch)} avistamiento(s): {repr(e)}")
+                with self._lock:
+                    self.failed_flushes += 1
+                    room = max(0, self.max_pending - len(self._pending))
+                    self._pending.extendleft(reversed(batch[:room]))
+                    self.dropped += len(batch) - room
+                return
+            with self._lock:
+                self.written += len(batch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "accepted": self.accepted,
+                "deduplicated": self.deduplicated,
+                "dropped": self.dropped,
+                "written": self.written,
+                "failed_flushes": self.failed_flushes,
+            }
+
+    def _ensure_thread(self):
+        # Se llama con el lock tomado. Tras un fork el hilo del padre no existe en el hijo.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        if self._pid is not None and self._pid != os.getpid():
+            self._pending.clear()
+            self._recent.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="sightings-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                self._forget_old(time.monotonic())
+            self.flush()
+
+    def _forget_old(self, now):
+        for key in [k for k, last in self._recent.items() if now - last >= self.dedup_seconds]:
+            del self._recent[key]
+
+
+_buffer = SightingBuffer(
+    flush_interval=SIGHTINGS_FLUSH_INTERVAL,
+    batch_size=SIGHTINGS_BATCH_SIZE,
+    max_pending=SIGHTINGS_MAX_PENDING,
+    dedup_seconds=SIGHTINGS_DEDUP_SECONDS,
+    dedup_cell=SIGHTINGS_DEDUP_CELL,
+)
+# Al apagar el proceso, guardar lo que quede en la cola
+atexit.register(_buffer.flush)
+
+
+def record_sighting(pet_id, lat, lng):
+    return _buffer.add(pet_id, lat, lng)
+
+
+def flush_sightings():
+    _buffer.flush()
+
+
+def get_sightings_stats():
+    return _buffer.stats()
+
+
+def find_nearby(lat, lng, radius_km=2.0, limit=50, hours=None, lost_only=True, city=None, per_pet=True):
+    """Avistamientos a menos de `radius_km` de un punto, del más cercano al más lejano.
+
+    El rectángulo que envuelve el círculo se resuelve en SQL con el índice de
+    celdas; aquí solo se calcula la distancia exacta de esos candidatos. Con
+    `per_pet` se devuelve un solo avistamiento por mascota (el más cercano).
+
+    La consulta trae como mucho NEARBY_MAX_ROWS candidatos sin orden, así
+    que se empieza por un círculo de NEARBY_FIRST_RING_KM y se duplica el
+    radio hasta juntar `limit` resultados o llegar a `radius_km`: con
+    `limit` resultados dentro de un círculo completo, los más cercanos son
+    exactos. Devuelve (resultados, truncated); truncated indica que el
+    círculo donde se paró tenía más candidatos que NEARBY_MAX_ROWS y que
+    puede faltar alguno cercano.
+    """
+    since = None
+    if hours:
+        since = (datetime.now(timezone.utc) - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
+    ring_km = min(radius_km, NEARBY_FIRST_RING_KM)
+    while True:
+        box = bounding_box(lat, lng, ring_km)
+        rows = get_sightings_in_box(cell_ranges(box), box, since=since, lost_only=lost_only, city=city,
+                                    max_rows=NEARBY_MAX_ROWS)
+        truncated = len(rows) >= NEARBY_MAX_ROWS
+        results = []
+        for row in rows:
+            distance = haversine_km(lat, lng, row["lat"], row["lng"])
+            if distance <= ring_km:
+                results.append((distance, row))
+        results.sort(key=lambda item: item[0])
+        if per_pet:
+            seen = set()
+            results = [item for item in results if not (item[1]["pet_id"] in seen or seen.add(item[1]["pet_id"]))]
+        if truncated or len(results) >= limit or ring_km >= radius_km:
+            return results[:limit], truncated
+        ring_km = min(ring_km * 2, radius_km)
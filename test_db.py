@@ -4,7 +4,8 @@ from database import init_db, add_pet, get_pet
 init_db()
 
 # Registra una mascota de prueba
-add_pet("TEST123", "Max", "Golden", "Pelaje dorado, collar azul", "dueño@example.com")
+add_pet("TEST123", "Max", "Golden", "Pelaje dorado, collar azul", "Dueño de prueba", "dueño@example.com",
+        "3001234567", None, "Bogotá", "Calle 1 # 2-3")
 
 # Búscala
 pet = get_pet("TEST123")
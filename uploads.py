@@ -0,0 +1,327 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+import requests
+import cloudinary.uploader
+import cloudinary.exceptions
+from werkzeug.utils import secure_filename
+
+from database import (create_photo_upload, claim_photo_upload, complete_photo_upload, update_photo_upload,
+                      fail_abandoned_photo_uploads, delete_finished_photo_uploads, get_photo_upload_counts,
+                      get_pets_without_variants)
+from page_cache import invalidate_pet
+from photo_variants import make_variants, InvalidPhoto
+from blobs import BlobStorage, gc_blobs
+
+# Las fotos de los formularios no se suben durante la petición: se guardan
+# en PHOTO_SPOOL_DIR, se registran en photo_uploads y un hilo por proceso
+# genera sus versiones (photo_variants.py) y las sube al almacenamiento con
+# reintentos. Al terminar actualiza pets.photo_url y pets.photo_variants.
+# Las subidas pendientes sobreviven a un reinicio: quedan en la tabla y
+# cualquier worker de la misma instancia las retoma. El archivo está en el
+# disco local, así que cada fila lleva la instancia que lo guardó
+# (spool_host) y las demás no la tocan. Si esa instancia desaparece, la
+# limpieza horaria da sus subidas por fallidas tras PHOTO_UPLOAD_RETENTION_HOURS.
+#
+# Fotos subidas antes de que existieran las versiones, y limpieza de los
+# archivos locales que ya ninguna mascota usa (ver blobs.py):
+#     python uploads.py backfill
+#     python uploads.py gc --dry-run
+IS_PRODUCTION = os.environ.get("RENDER") is not None
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PHOTO_STORAGE = os.environ.get("PHOTO_STORAGE", "cloudinary" if IS_PRODUCTION else "local")
+PHOTO_SPOOL_DIR = os.environ.get("PHOTO_SPOOL_DIR", os.path.join(BASE_DIR, "upload_spool"))
+PHOTO_SPOOL_HOST = os.environ.get("PHOTO_SPOOL_HOST") or os.environ.get("RENDER_INSTANCE_ID") or socket.gethostname()
+PHOTO_LOCAL_DIR = os.environ.get("PHOTO_LOCAL_DIR", os.path.join(BASE_DIR, "media"))
+PHOTO_LOCAL_URL = "/media/"
+PHOTO_UPLOAD_POLL_SECONDS = float(os.environ.get("PHOTO_UPLOAD_POLL_SECONDS", "5"))
+PHOTO_UPLOAD_MAX_ATTEMPTS = int(os.environ.get("PHOTO_UPLOAD_MAX_ATTEMPTS", "5"))
+PHOTO_UPLOAD_RETRY_SECONDS = float(os.environ.get("PHOTO_UPLOAD_RETRY_SECONDS", "15"))  # se duplica en cada intento
+PHOTO_UPLOAD_STALE_SECONDS = int(os.environ.get("PHOTO_UPLOAD_STALE_SECONDS", "600"))
+PHOTO_UPLOAD_RETENTION_HOURS = float(os.environ.get("PHOTO_UPLOAD_RETENTION_HOURS", "72"))
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif", ".bmp"}
+
+
+class PhotoRejected(Exception):
+    """El almacenamiento rechazó el archivo (no es una imagen válida): no tiene sentido reintentar."""
+
+
+class CloudinaryStorage:
+    """Sube a Cloudinary (configurado en app.py con las variables CLOUDINARY_*)."""
+
+    def save(self, path, folder):
+        try:
+            result = cloudinary.uploader.upload(path, folder=folder, resource_type="image")
+        except cloudinary.exceptions.BadRequest as e:
+            raise PhotoRejected(str(e)) from e
+        return result.get("secure_url")
+
+
+def get_storage(kind=PHOTO_STORAGE):
+    if kind == "cloudinary":
+        return CloudinaryStorage()
+    if kind == "local":
+        return BlobStorage(PHOTO_LOCAL_DIR, PHOTO_LOCAL_URL)
+    raise ValueError(f"PHOTO_STORAGE desconocido: {kind}")
+
+
+def _utc_timestamp(delta=timedelta(0)):
+    return (datetime.now(timezone.utc) + delta).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class UploadWorker:
+    """Hilo que sube las fotos pendientes de photo_uploads, una a la vez."""
+
+    def __init__(self, storage, spool_dir, spool_host, poll_interval=5.0, max_attempts=5, retry_seconds=15.0,
+                 stale_seconds=600, retention_hours=72.0):
+        self.storage = storage
+        self.spool_dir = spool_dir
+        self.spool_host = spool_host
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.stale_seconds = stale_seconds
+        self.retention_hours = retention_hours
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self._last_cleanup = None
+        self.queued = 0
+        self.uploaded = 0
+        self.retried = 0
+        self.failed = 0
+
+    def enqueue(self, pet_id, file, folder):
+        """Guarda el archivo del formulario en disco y lo encola. Devuelve el id de la subida."""
+        extension = os.path.splitext(secure_filename(file.filename or ""))[1].lower()
+        if extension not in IMAGE_EXTENSIONS:
+            extension = ""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}{extension}")
+        file.save(path)
+        try:
+            upload_id, replaced = create_photo_upload(pet_id, folder, path, self.spool_host)
+        except Exception:
+            _remove(path)
+            raise
+        for old_path in replaced:
+            _remove(old_path)
+        with self._lock:
+            self.queued += 1
+            self._ensure_thread()
+            self._wakeup.notify()
+        return upload_id
+
+    def start(self):
+        with self._lock:
+            self._ensure_thread()
+
+    def process_pending(self):
+        """Sube todo lo que esté listo. Devuelve cuántas subidas intentó."""
+        attempted = 0
+        while True:
+            upload = claim_photo_upload(self.spool_host, _utc_timestamp(),
+                                        _utc_timestamp(timedelta(seconds=-self.stale_seconds)))
+            if not upload:
+                return attempted
+            attempted += 1
+            self._process(upload)
+
+    def _process(self, upload):
+        path = upload["spool_path"]
+        files = {}
+        try:
+            files = make_variants(path, self.spool_dir)
+            variants = {}
+            for name, info in files.items():
+                variants[name] = {"url": self.storage.save(info["path"], upload["folder"]),
+                                  "width": info["width"], "height": info["height"]}
+        except Exception as e:
+            # Un archivo que falta se reintenta: puede ser un disco lento o
+            # montado tarde; si no aparece, se descarta al agotar los intentos
+            permanent = isinstance(e, (PhotoRejected, InvalidPhoto))
+            if permanent or upload["attempts"] >= self.max_attempts:
+                print(f"📷 Subida {upload['id']} de la mascota {upload['pet_id']} descartada: {repr(e)}")
+                update_photo_upload(upload["id"], "failed", error=str(e)[:500])
+                _remove(path)
+                with self._lock:
+                    self.failed += 1
+            else:
+                delay = self.retry_seconds * 2 ** (upload["attempts"] - 1)
+                print(f"📷 Subida {upload['id']} falló (intento {upload['attempts']}), reintento en {delay:.0f} s: {repr(e)}")
+                update_photo_upload(upload["id"], "pending", error=str(e)[:500],
+                                    next_attempt_at=_utc_timestamp(timedelta(seconds=delay)))
+                with self._lock:
+                    self.retried += 1
+            return
+        finally:
+            for info in files.values():
+                _remove(info["path"])
+        url = variants.pop("full")["url"]
+        if complete_photo_upload(upload["id"], upload["pet_id"], url, json.dumps(variants)):
+            invalidate_pet(upload["pet_id"])
+        _remove(path)
+        with self._lock:
+            self.uploaded += 1
+
+    def stats(self):
+        with self._lock:
+            local = {
+                "storage": type(self.storage).__name__,
+                "spool_host": self.spool_host,
+                "queued": self.queued,
+                "uploaded": self.uploaded,
+                "retried": self.retried,
+                "failed": self.failed,
+                "deduplicated": getattr(self.storage, "deduplicated", 0),
+                "worker_alive": self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            }
+        local["by_status"] = get_photo_upload_counts()
+        return local
+
+    def _ensure_thread(self):
+        # Se llama con el lock tomado. Tras un fork el hilo del padre no existe en el hijo.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="photo-uploads", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.process_pending()
+                self._cleanup()
+            except Exception as e:
+                print(f"❌ Error en el worker de fotos: {repr(e)}")
+            with self._lock:
+                self._wakeup.wait(self.poll_interval)
+
+    def _cleanup(self):
+        now = datetime.now(timezone.utc)
+        if self._last_cleanup and now - self._last_cleanup < timedelta(hours=1):
+            return
+        self._last_cleanup = now
+        cutoff = _utc_timestamp(timedelta(hours=-self.retention_hours))
+        abandoned = fail_abandoned_photo_uploads(cutoff)
+        if abandoned:
+            print(f"📷 {abandoned} subida(s) de instancias que ya no existen dadas por fallidas")
+        delete_finished_photo_uploads(cutoff)
+        # Archivos de subidas reemplazadas desde otra instancia o de filas ya descartadas
+        oldest = time.time() - self.retention_hours * 3600
+        try:
+            entries = list(os.scandir(self.spool_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < oldest:
+                _remove(entry.path)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_worker = UploadWorker(
+    get_storage(),
+    PHOTO_SPOOL_DIR,
+    PHOTO_SPOOL_HOST,
+    poll_interval=PHOTO_UPLOAD_POLL_SECONDS,
+    max_attempts=PHOTO_UPLOAD_MAX_ATTEMPTS,
+    retry_seconds=PHOTO_UPLOAD_RETRY_SECONDS,
+    stale_seconds=PHOTO_UPLOAD_STALE_SECONDS,
+    retention_hours=PHOTO_UPLOAD_RETENTION_HOURS,
+)
+
+
+def enqueue_photo(pet_id, file, folder):
+    return _worker.enqueue(pet_id, file, folder)
+
+
+def start_upload_worker():
+    _worker.start()
+
+
+def get_upload_stats():
+    return _worker.stats()
+
+
+def _fetch_original(url, path):
+    """Copia la foto actual de una mascota a `path` (URL remota, /media/ local o /static/)."""
+    if url.startswith(PHOTO_LOCAL_URL):
+        shutil.copyfile(os.path.join(PHOTO_LOCAL_DIR, url[len(PHOTO_LOCAL_URL):]), path)
+    elif url.startswith("/"):
+        shutil.copyfile(os.path.join(BASE_DIR, url.lstrip("/")), path)
+    else:
+        with requests.get(url, stream=True, timeout=30) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(64 * 1024):
+                    f.write(chunk)
+
+
+def backfill_variants(batch=100, limit=None):
+    """Encola y procesa las fotos que aún no tienen versiones. Devuelve cuántas encoló."""
+    os.makedirs(PHOTO_SPOOL_DIR, exist_ok=True)
+    queued, after_id = 0, ""
+    while limit is None or queued < limit:
+        pets = get_pets_without_variants(after_id, batch)
+        if not pets:
+            break
+        after_id = pets[-1]["id"]
+        for pet in pets:
+            path = os.path.join(PHOTO_SPOOL_DIR, f"{uuid.uuid4().hex}{os.path.splitext(pet['photo_url'])[1][:5]}")
+            try:
+                _fetch_original(pet["photo_url"], path)
+            except Exception as e:
+                print(f"⚠️ No se pudo descargar la foto de {pet['id']}: {repr(e)}")
+                _remove(path)
+                continue
+            create_photo_upload(pet["id"], "pet_rescue_qr/variants", path, PHOTO_SPOOL_HOST)
+            queued += 1
+            if limit is not None and queued >= limit:
+                break
+        # Procesar en este mismo proceso, por tandas, sin esperar al hilo de la app
+        _worker.process_pending()
+    return queued
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Subidas de fotos de Pet Rescue QR.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Genera las versiones de las fotos que no las tienen")
+    backfill_parser.add_argument("--batch", type=int, default=100)
+    backfill_parser.add_argument("--limit", type=int, default=None, help="Máximo de fotos a procesar")
+    gc_parser = subparsers.add_parser("gc", help="Borra las fotos locales que ninguna mascota usa")
+    gc_parser.add_argument("--grace-hours", type=float, default=None,
+                           help="No borrar archivos más nuevos que esto (por defecto BLOB_GC_GRACE_HOURS)")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Solo informar, sin borrar")
+    args = parser.parse_args()
+
+    if args.command == "gc":
+        options = {} if args.grace_hours is None else {"grace_hours": args.grace_hours}
+        summary = gc_blobs(PHOTO_LOCAL_DIR, dry_run=args.dry_run, **options)
+        verb = "se borrarían" if args.dry_run else "borrados"
+        print(f"🧹 {summary['blobs']} archivos ({summary['bytes'] / 1e6:.1f} MB), {summary['referenced']} en uso "
+              f"({summary['shared']} compartidos por varias referencias), {summary['kept_recent']} recientes sin uso.")
+        print(f"✅ {summary['removed']} {verb}, {summary['reclaimed_bytes'] / 1e6:.1f} MB liberados.")
+        return
+
+    queued = backfill_variants(batch=args.batch, limit=args.limit)
+    print(f"✅ Backfill completo: {queued} foto(s) procesadas.")
+    print(get_upload_stats())
+
+
+if __name__ == "__main__":
+    main()
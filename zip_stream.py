@@ -0,0 +1,118 @@
+import struct
+import tempfile
+import time
+import zlib
+
+# Firmas del formato ZIP (APPNOTE.TXT)
+LOCAL_HEADER = 0x04034B50
+DATA_DESCRIPTOR = 0x08074B50
+CENTRAL_HEADER = 0x02014B50
+ZIP64_END = 0x06064B50
+ZIP64_LOCATOR = 0x07064B50
+END_OF_CENTRAL_DIR = 0x06054B50
+
+STORED = 0
+DEFLATED = 8
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class ZipStreamWriter:
+    """Escribe un ZIP como una secuencia de bloques de bytes, sin buscar hacia atrás.
+
+    A diferencia de zipfile, el directorio central no se guarda en memoria:
+    cada registro se vuelca a un archivo temporal y se copia al final, así
+    que la memoria usada no depende de la cantidad de entradas.
+    """
+
+    def __init__(self):
+        self._offset = 0
+        self._count = 0
+        self._central = tempfile.TemporaryFile()
+        self._dos_time, self._dos_date = _dos_datetime(time.time())
+
+    def add_stored(self, name, data):
+        """Agrega una entrada sin comprimir y devuelve los bytes a emitir."""
+        crc = zlib.crc32(data) & 0xFFFFFFFF
+        name_bytes = name.encode("utf-8")
+        header = struct.pack(
+            "<IHHHHHIIIHH", LOCAL_HEADER, 20, FLAG_UTF8, STORED,
+            self._dos_time, self._dos_date, crc, len(data), len(data), len(name_bytes), 0
+        ) + name_bytes
+        self._record(name_bytes, FLAG_UTF8, STORED, crc, len(data), len(data))
+        self._offset += len(header) + len(data)
+        return header + data
+
+    def add_deflated(self, name, chunks):
+        """Agrega una entrada comprimida a partir de bloques de bytes; genera los bytes a emitir."""
+        name_bytes = name.encode("utf-8")
+        flags = FLAG_UTF8 | FLAG_DATA_DESCRIPTOR
+        header = struct.pack(
+            "<IHHHHHIIIHH", LOCAL_HEADER, 20, flags, DEFLATED,
+            self._dos_time, self._dos_date, 0, 0, 0, len(name_bytes), 0
+        ) + name_bytes
+        entry_offset = self._offset
+        self._offset += len(header)
+        yield header
+
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        crc = 0
+        size = 0
+        compressed_size = 0
+        for chunk in chunks:
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            compressed = compressor.compress(chunk)
+            if compressed:
+                compressed_size += len(compressed)
+                yield compressed
+        compressed = compressor.flush()
+        compressed_size += len(compressed)
+        crc &= 0xFFFFFFFF
+        descriptor = struct.pack("<IIII", DATA_DESCRIPTOR, crc, compressed_size, size)
+        self._offset += compressed_size + len(descriptor)
+        self._record(name_bytes, flags, DEFLATED, crc, compressed_size, size, entry_offset)
+        yield compressed + descriptor
+
+    def finish(self):
+        """Emite el directorio central y el cierre del archivo."""
+        central_offset = self._offset
+        central_size = self._central.tell()
+        self._central.seek(0)
+        for block in iter(lambda: self._central.read(64 * 1024), b""):
+            yield block
+        self._central.close()
+
+        tail = b""
+        if self._count >= 0xFFFF or central_offset >= 0xFFFFFFFF:
+            zip64_end_offset = central_offset + central_size
+            tail += struct.pack(
+                "<IQHHIIQQQQ", ZIP64_END, 44, 45, 45, 0, 0,
+                self._count, self._count, central_size, central_offset
+            )
+            tail += struct.pack("<IIQI", ZIP64_LOCATOR, 0, zip64_end_offset, 1)
+        tail += struct.pack(
+            "<IHHHHIIH", END_OF_CENTRAL_DIR, 0, 0,
+            min(self._count, 0xFFFF), min(self._count, 0xFFFF),
+            min(central_size, 0xFFFFFFFF), min(central_offset, 0xFFFFFFFF), 0
+        )
+        yield tail
+
+    def _record(self, name_bytes, flags, method, crc, compressed_size, size, offset=None):
+        if offset is None:
+            offset = self._offset
+        if offset >= 0xFFFFFFFF or compressed_size >= 0xFFFFFFFF:
+            raise ValueError("El ZIP supera 4 GB; divide la generación en lotes más pequeños.")
+        self._central.write(struct.pack(
+            "<IHHHHHHIIIHHHHHII", CENTRAL_HEADER, 20, 20, flags, method,
+            self._dos_time, self._dos_date, crc, compressed_size, size,
+            len(name_bytes), 0, 0, 0, 0, 0, offset
+        ) + name_bytes)
+        self._count += 1